@@ -0,0 +1,149 @@
+"""
+Synthetic vendor delivery generator for the ingestion benchmarks.
+
+Creates frame sequences laid out like the ingest_workspace template
+('{project_root}/vault/to_mvl/{vendor}/{date}/{scene}/{shot}/{resolution}') and
+named so that extract_scene_shot_from_path and the sequence regex used by
+get_files_and_sequences pick them up, plus a matching shot mapping CSV.
+
+Example:
+    python benchmarks/generate_delivery.py --root /tmp/bench --shots 4 --frames 200 --size 4194304
+"""
+import os
+import csv
+import struct
+import argparse
+
+EXR_MAGIC = b"\x76\x2f\x31\x01"
+
+
+def parse_gaps(gaps):
+    """
+    Parses a gap spec like '1005,1010-1012' into a set of frame numbers.
+    """
+    frames = set()
+    for part in filter(None, (gaps or "").split(",")):
+        if "-" in part:
+            start, end = map(int, part.split("-"))
+            frames.update(range(start, end + 1))
+        else:
+            frames.add(int(part))
+    return frames
+
+
+def _attribute(name, attr_type, value):
+    return name.encode() + b"\0" + attr_type.encode() + b"\0" + struct.pack("<i", len(value)) + value
+
+
+def build_exr_header(width, height, comment=""):
+    """
+    Builds a valid uncompressed, scanline OpenEXR header with B, G, R half channels.
+    The scanline offset table is not included.
+    """
+    channels = b"".join(name + b"\0" + struct.pack("<iB3xii", 1, 0, 1, 1) for name in (b"B", b"G", b"R")) + b"\0"
+    window = struct.pack("<4i", 0, 0, width - 1, height - 1)
+    header = EXR_MAGIC + struct.pack("<i", 2)
+    header += _attribute("channels", "chlist", channels)
+    header += _attribute("compression", "compression", b"\0")
+    header += _attribute("dataWindow", "box2i", window)
+    header += _attribute("displayWindow", "box2i", window)
+    header += _attribute("lineOrder", "lineOrder", b"\0")
+    header += _attribute("pixelAspectRatio", "float", struct.pack("<f", 1.0))
+    header += _attribute("screenWindowCenter", "v2f", struct.pack("<2f", 0.0, 0.0))
+    header += _attribute("screenWindowWidth", "float", struct.pack("<f", 1.0))
+    if comment:
+        header += _attribute("comments", "string", comment.encode())
+    return header + b"\0"
+
+
+def write_frame(path, size, seed, resolution="4448x3096"):
+    """
+    Writes a frame with a valid OpenEXR header and offset table so header
+    inspection accepts it. The remaining bytes are filler, unique per frame so
+    deduplicating stores do not collapse the delivery. The frame is grown if
+    size is too small for the header.
+    """
+    width, height = map(int, resolution.split("x"))
+    header = build_exr_header(width, height, comment=f"mvl benchmark frame {seed}")
+    data_start = len(header) + height * 8
+    size = max(size, data_start + height)
+    step = (size - data_start) // height
+    table = struct.pack(f"<{height}Q", *(data_start + line * step for line in range(height)))
+    seed_bytes = seed.to_bytes(8, "little")
+    block = (seed_bytes * (4096 // len(seed_bytes)))
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(table)
+        remaining = size - data_start
+        while remaining > 0:
+            chunk = block[:remaining]
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def generate_delivery(root, project="gen63", vendor="bench", date="20250101", scene="48",
+                      shots=1, frames=100, size=1024 * 1024, start_frame=1001, gaps=None,
+                      resolution="4448x3096", extension="exr"):
+    """
+    Generates a synthetic delivery and its shot mapping CSV.
+
+    Args:
+        root (str): Project root to create the delivery under.
+        shots (int): Number of shots in the scene, one sequence each.
+        frames (int): Frames per sequence, before gaps are removed.
+        size (int): Size of each frame in bytes.
+        gaps (str or set): Frames to leave out, e.g. '1005,1010-1012'.
+
+    Returns:
+        dict: 'sources' (list of sequence folders), 'csv_path' and 'frame_count'.
+    """
+    if not isinstance(gaps, set):
+        gaps = parse_gaps(gaps)
+
+    sources = []
+    mapping = []
+    frame_count = 0
+    for index in range(1, shots + 1):
+        shot = f"{index * 10:02d}"
+        shot_dir = os.path.join(root, "vault", "to_mvl", vendor, date, scene, f"{scene}_{shot}", resolution)
+        os.makedirs(shot_dir, exist_ok=True)
+        for frame in range(start_frame, start_frame + frames):
+            if frame in gaps:
+                continue
+            name = f"plate_{project}_{scene}_{shot}_{frame}.{extension}"
+            write_frame(os.path.join(shot_dir, name), size, index * 1000000 + frame, resolution)
+            frame_count += 1
+        sources.append(shot_dir)
+        mapping.append([f"{scene}/{shot}", f"{project}_{scene}_{index * 10:04d}", "main_plate_v001"])
+
+    csv_path = os.path.join(root, "vault", "to_mvl", vendor, date, scene, "shot_folders_to_be_renamed.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(mapping)
+
+    return {"sources": sources, "csv_path": csv_path, "frame_count": frame_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic vendor delivery for benchmarking.")
+    parser.add_argument("--root", required=True, help="Project root to create the delivery under.")
+    parser.add_argument("--project", default="gen63")
+    parser.add_argument("--vendor", default="bench")
+    parser.add_argument("--date", default="20250101")
+    parser.add_argument("--scene", default="48")
+    parser.add_argument("--shots", type=int, default=1)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="Frame size in bytes.")
+    parser.add_argument("--gaps", default="", help="Frames to leave out, e.g. '1005,1010-1012'.")
+    parser.add_argument("--resolution", default="4448x3096")
+    args = parser.parse_args()
+
+    delivery = generate_delivery(
+        args.root, project=args.project, vendor=args.vendor, date=args.date, scene=args.scene,
+        shots=args.shots, frames=args.frames, size=args.size, gaps=args.gaps, resolution=args.resolution
+    )
+    print(f"Generated {delivery['frame_count']} frames in {len(delivery['sources'])} sequences")
+    print(f"Shot mapping: {delivery['csv_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Ingestion benchmark suite.
+
+Generates a synthetic delivery, times the main ingest stages and stores the
+results as JSON so runs can be compared between commits offline.
+
+Example:
+    python benchmarks/run_benchmarks.py run --frames 200 --size 4194304
+    python benchmarks/run_benchmarks.py compare results/a.json results/b.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+# Always benchmark the checkout, not an installed package.
+sys.path.insert(0, os.path.join(REPO_ROOT, "python"))
+sys.path.insert(0, BENCH_DIR)
+
+from generate_delivery import generate_delivery  # noqa: E402
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                             check=True, capture_output=True, text=True)
+        return out.stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def timeit(func, repeat, setup=None):
+    """
+    Runs func repeat times and returns timing stats in seconds.
+    setup() is called before each run, outside the timed region, and its
+    return value is passed to func.
+    """
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state) if setup else func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "max": max(timings),
+    }
+
+
+class StubResizeOperation:
+    """
+    Stands in for ProxyGenerationOperation without oiiotool: reads the whole
+    source and writes a small proxy. Module level so process pools can pickle it.
+    """
+    def execute(self, input_path, output_path, resolution):
+        with open(input_path, "rb") as f:
+            data = f.read()
+        with open(output_path, "wb") as f:
+            f.write(data[:65536])
+
+
+def run(args):
+    from mvl_ingestion.ingestion_utils import logger, get_files_and_sequences, read_csv
+    from mvl_ingestion.ingestion_operations import CopyFileOperation
+    from mvl_ingestion.ingestion_builder import SequenceBuilder
+    from mvl_ingestion.ingestion_processor import MVLIngestionProcessor
+
+    logger.setLevel(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="mvl_bench_", dir=args.workdir)
+    results = {}
+    try:
+        delivery = generate_delivery(
+            os.path.join(workdir, "project"), shots=args.shots, frames=args.frames,
+            size=args.size, gaps=args.gaps
+        )
+        sources = delivery["sources"]
+        csv_path = delivery["csv_path"]
+        _, sequences = get_files_and_sequences(sources[0])
+        frames = sequences[0]["paths"]
+        stub_resizer = StubResizeOperation()
+
+        def fresh_dir():
+            return tempfile.mkdtemp(dir=workdir)
+
+        results["get_files_and_sequences"] = timeit(lambda: get_files_and_sequences(sources), args.repeat)
+
+        def mapping_lookup():
+            mapping = read_csv(csv_path)
+            for seq_key in list(mapping.keys()):
+                next(key for key in mapping if key.strip() == seq_key)
+        results["read_csv_mapping_lookup"] = timeit(mapping_lookup, args.repeat)
+
+        copy_op = CopyFileOperation()
+
+        def copy_frames(dest):
+            for index, src in enumerate(frames):
+                copy_op.execute(src, os.path.join(dest, f"frame_{index:04d}.exr"), True)
+        results["copy_file_operation"] = timeit(copy_frames, args.repeat, setup=fresh_dir)
+
+        def proxies(dest):
+            builder = SequenceBuilder(sequences[0], copy_op, stub_resizer, None)
+            builder.copied_paths = frames
+            builder.out_paths = {"proxy_path": dest}
+            try:
+                builder.generate_proxies("jpeg", "2K_DCP")
+            finally:
+                builder.executors.shutdown()
+        results["proxy_generation_stub"] = timeit(proxies, args.repeat, setup=fresh_dir)
+
+        def execute(dest):
+            for source in sources:
+                processor = MVLIngestionProcessor(argparse.Namespace(
+                    gui=False, input=source, output=dest, project="gen63", input_date=None,
+                    vendor="bench", scene=None, shot=None, resolution="4448x3096", force=True,
+                    proxy="jpeg", use_proxy=True, proxy_res="2K_DCP", mov=False, csv_path=csv_path
+                ))
+                processor.proxy_op = stub_resizer
+                processor.execute()
+        results["ingestion_processor_execute"] = timeit(execute, args.repeat, setup=fresh_dir)
+
+        total_bytes = delivery["frame_count"] * args.size
+        for name in ("copy_file_operation", "proxy_generation_stub"):
+            results[name]["mb_per_s"] = len(frames) * args.size / results[name]["median"] / 1e6
+        results["ingestion_processor_execute"]["mb_per_s"] = total_bytes / results["ingestion_processor_execute"]["median"] / 1e6
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "params": {k: getattr(args, k) for k in ("shots", "frames", "size", "gaps", "repeat")},
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{time.strftime('%Y%m%d_%H%M%S')}_{report['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in results.items():
+        print(f"{name:32s} median {stats['median'] * 1000:10.2f} ms  min {stats['min'] * 1000:10.2f} ms")
+    print(f"Results written to {output}")
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    if baseline["params"] != candidate["params"]:
+        print(f"Warning: parameters differ: {baseline['params']} vs {candidate['params']}")
+
+    regressions = 0
+    print(f"{'benchmark':32s} {baseline['revision']:>12s} {candidate['revision']:>12s}   change")
+    for name, stats in baseline["results"].items():
+        if name not in candidate["results"]:
+            continue
+        before = stats["median"]
+        after = candidate["results"][name]["median"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:32s} {before * 1000:10.2f}ms {after * 1000:10.2f}ms {change:+8.1%}{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MVL ingestion benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmark suite.")
+    run_parser.add_argument("--shots", type=int, default=2)
+    run_parser.add_argument("--frames", type=int, default=100)
+    run_parser.add_argument("--size", type=int, default=1024 * 1024, help="Frame size in bytes.")
+    run_parser.add_argument("--gaps", default="", help="Frames to leave out, e.g. '1005,1010-1012'.")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--workdir", default=None, help="Where to generate the delivery (default: system temp).")
+    run_parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/).")
+    run_parser.add_argument("--keep", action="store_true", help="Keep the generated delivery and outputs.")
+
+    compare_parser = sub.add_parser("compare", help="Compare two result files.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown flagged as regression.")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
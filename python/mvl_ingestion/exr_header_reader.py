@@ -0,0 +1,223 @@
+import os
+import struct
+import concurrent.futures
+
+EXR_MAGIC = 20000630
+READ_SIZE = 64 * 1024
+MAX_HEADER_SIZE = 16 * 1024 * 1024
+
+TILED_FLAG = 0x200
+NON_IMAGE_FLAG = 0x800
+MULTIPART_FLAG = 0x1000
+
+COMPRESSION_NAMES = {
+    0: "none", 1: "rle", 2: "zips", 3: "zip", 4: "piz", 5: "pxr24",
+    6: "b44", 7: "b44a", 8: "dwaa", 9: "dwab", 10: "htj2k256", 11: "htj2k32",
+}
+# Scanlines stored per chunk, used to size the offset table.
+LINES_PER_CHUNK = {
+    "none": 1, "rle": 1, "zips": 1, "zip": 16, "piz": 32, "pxr24": 16,
+    "b44": 32, "b44a": 32, "dwaa": 32, "dwab": 256, "htj2k256": 256, "htj2k32": 32,
+}
+PIXEL_TYPES = {0: "uint", 1: "half", 2: "float"}
+LINE_ORDERS = {0: "increasing_y", 1: "decreasing_y", 2: "random_y"}
+
+
+def _read_cstring(buf, pos):
+    end = buf.find(b"\0", pos)
+    if end < 0:
+        raise IndexError("string extends past buffer")
+    return buf[pos:end].decode("latin-1"), end + 1
+
+
+def _parse_channels(value):
+    channels = []
+    pos = 0
+    while pos < len(value) and value[pos] != 0:
+        name, pos = _read_cstring(value, pos)
+        pixel_type, _linear, x_sampling, y_sampling = struct.unpack_from("<iB3xii", value, pos)
+        pos += 16
+        channels.append({
+            "name": name,
+            "type": PIXEL_TYPES.get(pixel_type, str(pixel_type)),
+            "sampling": [x_sampling, y_sampling],
+        })
+    return channels
+
+
+def _parse_attribute(attr_type, value):
+    if attr_type == "box2i":
+        return list(struct.unpack("<4i", value))
+    if attr_type == "chlist":
+        return _parse_channels(value)
+    if attr_type == "compression":
+        return COMPRESSION_NAMES.get(value[0], str(value[0]))
+    if attr_type == "lineOrder":
+        return LINE_ORDERS.get(value[0], str(value[0]))
+    if attr_type == "int":
+        return struct.unpack("<i", value)[0]
+    if attr_type == "float":
+        return struct.unpack("<f", value)[0]
+    if attr_type == "v2f":
+        return list(struct.unpack("<2f", value))
+    if attr_type == "string":
+        return value.decode("utf-8", "replace")
+    if attr_type == "tiledesc":
+        x_size, y_size, mode = struct.unpack("<IIB", value)
+        return {"x_size": x_size, "y_size": y_size, "mode": mode}
+    return None
+
+
+def _parse_header(buf):
+    """
+    Parses the magic, version and first part header from buf.
+
+    Returns:
+        tuple: (header dict, offset just past the header attributes)
+
+    Raises:
+        ValueError: if buf is not an OpenEXR file.
+        IndexError/struct.error: if buf does not hold the complete header yet.
+    """
+    magic, version = struct.unpack_from("<ii", buf, 0)
+    if magic != EXR_MAGIC:
+        raise ValueError("not an OpenEXR file")
+
+    header = {
+        "version": version & 0xFF,
+        "tiled": bool(version & TILED_FLAG),
+        "deep": bool(version & NON_IMAGE_FLAG),
+        "multipart": bool(version & MULTIPART_FLAG),
+        "attributes": {},
+        "raw_attributes": {},
+    }
+    pos = 8
+    while True:
+        if buf[pos] == 0:
+            pos += 1
+            break
+        name, pos = _read_cstring(buf, pos)
+        attr_type, pos = _read_cstring(buf, pos)
+        (size,) = struct.unpack_from("<i", buf, pos)
+        pos += 4
+        if pos + size > len(buf):
+            raise IndexError("header extends past buffer")
+        header["raw_attributes"][name] = (attr_type, bytes(buf[pos:pos + size]))
+        value = _parse_attribute(attr_type, buf[pos:pos + size])
+        if value is not None:
+            header["attributes"][name] = value
+        pos += size
+    return header, pos
+
+
+def read_exr_header(path):
+    """
+    Reads the header and scanline offset table of an OpenEXR file, without the pixel data.
+
+    Returns:
+        dict: 'data_window', 'display_window' ([xmin, ymin, xmax, ymax]), 'width', 'height',
+              'channels', 'compression', 'line_order', 'tiled', 'multipart', 'deep',
+              'file_size', 'truncated' and 'raw_attributes' ({name: (type, bytes)} of
+              every attribute of the first part).
+
+    Raises:
+        ValueError: if the file is not a valid OpenEXR file.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        read_size = READ_SIZE
+        while True:
+            f.seek(0)
+            buf = f.read(read_size)
+            try:
+                header, header_end = _parse_header(buf)
+                break
+            except (IndexError, struct.error):
+                if len(buf) < read_size or read_size >= MAX_HEADER_SIZE:
+                    raise ValueError(f"incomplete OpenEXR header ({len(buf)} bytes)")
+                read_size *= 4
+
+        attributes = header.pop("attributes")
+        for required in ("dataWindow", "displayWindow", "channels", "compression"):
+            if required not in attributes:
+                raise ValueError(f"missing required attribute '{required}'")
+
+        data_window = attributes["dataWindow"]
+        width = data_window[2] - data_window[0] + 1
+        height = data_window[3] - data_window[1] + 1
+        header.update({
+            "data_window": data_window,
+            "display_window": attributes["displayWindow"],
+            "width": width,
+            "height": height,
+            "channels": attributes["channels"],
+            "compression": attributes["compression"],
+            "line_order": attributes.get("lineOrder"),
+            "file_size": file_size,
+            "truncated": False,
+        })
+
+        # Truncation check: every chunk offset of a single-part scanline file must
+        # point inside the file, and the last chunk must end within it.
+        if not header["tiled"] and not header["multipart"] and not header["deep"]:
+            lines = LINES_PER_CHUNK.get(header["compression"], 1)
+            chunk_count = (height + lines - 1) // lines
+            f.seek(header_end)
+            table = f.read(chunk_count * 8)
+            if len(table) < chunk_count * 8:
+                header["truncated"] = True
+            else:
+                offsets = struct.unpack(f"<{chunk_count}Q", table)
+                header["truncated"] = max(offsets) >= file_size or min(offsets) < header_end
+                if not header["truncated"]:
+                    f.seek(max(offsets))
+                    chunk = f.read(8)
+                    header["truncated"] = (len(chunk) < 8
+                                           or max(offsets) + 8 + struct.unpack("<ii", chunk)[1] > file_size)
+    return header
+
+
+def _inspect_frame(path):
+    try:
+        return path, read_exr_header(path), None
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def inspect_sequence(paths, expected_resolution=None, max_workers=16):
+    """
+    Reads the headers of all frames in parallel and compares them with the first
+    readable frame and with the resolution parsed from the delivery path.
+
+    Returns:
+        tuple: (reference header or None, list of problem strings)
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_inspect_frame, paths))
+
+    problems = []
+    reference = None
+    for path, header, error in results:
+        name = os.path.basename(path)
+        if error:
+            problems.append(f"{name}: unreadable header ({error})")
+            continue
+        if header["truncated"]:
+            problems.append(f"{name}: truncated file ({header['file_size']} bytes)")
+        if reference is None:
+            reference = header
+            resolution = f"{header['width']}x{header['height']}"
+            if expected_resolution and resolution != expected_resolution:
+                problems.append(f"{name}: resolution {resolution} does not match delivery folder {expected_resolution}")
+            continue
+        if header["data_window"] != reference["data_window"]:
+            problems.append(f"{name}: data window {header['data_window']} differs from {reference['data_window']}")
+        if header["display_window"] != reference["display_window"]:
+            problems.append(f"{name}: display window {header['display_window']} differs from {reference['display_window']}")
+        channels = [c["name"] for c in header["channels"]]
+        reference_channels = [c["name"] for c in reference["channels"]]
+        if channels != reference_channels:
+            problems.append(f"{name}: channels {channels} differ from {reference_channels}")
+        if header["compression"] != reference["compression"]:
+            problems.append(f"{name}: compression {header['compression']} differs from {reference['compression']}")
+    return reference, problems
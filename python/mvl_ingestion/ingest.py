@@ -1,7 +1,11 @@
 
+import sys
 import argparse
-from mvl_ingestion.ingestion_processor import MVLIngestionProcessor
-from mvl_ingestion.ingestion_utils import logger, ingestion_args, get_supported_proxy_resolutions
+from mvl_ingestion.ingestion_processor import MVLIngestionProcessor, PreflightError
+from mvl_ingestion.ingestion_batch import run_batch_file
+from mvl_ingestion.ingestion_coordinator import run_worker
+from mvl_ingestion.ingestion_logging import setup_logging
+from mvl_ingestion.ingestion_utils import logger, ingestion_args, ingestion_worker_args, get_supported_proxy_resolutions
 
 
 def add_arguments_from_keys(parser, keys):
@@ -50,6 +54,7 @@ def parse_arguments():
 
 			Example:
 			ingest --project gen63 --vendor from_da --input_date 2025-07-15 --scene SC_48 --shot SH_14
+			ingest --batch jobs.yaml --output /mnt/projects
 		"""
 	)
      
@@ -60,14 +65,65 @@ def parse_arguments():
 		help=f"Preset resolution name from YAML. Options: {', '.join(get_supported_proxy_resolutions())}"
 	)
 	args = parser.parse_args()
+	if not args.input and not args.batch:
+		parser.error("--input is required unless --batch is given")
 	return args
 
+def parse_worker_arguments(argv):
+	"""
+	Parses the arguments of `ingest worker`.
+	"""
+	parser = argparse.ArgumentParser(
+		prog="ingest worker",
+		description="""
+			Claims sequences from a shared queue filled with `ingest --queue` and ingests them.
+			Start one or more workers per host; a dead worker's sequences are reclaimed by
+			the others once its lease expires.
+
+			Example:
+			ingest worker --queue J:/gen63/.mvl_queue/turnover.db --slots 2
+		"""
+	)
+	add_arguments_from_keys(parser, ingestion_worker_args())
+	return parser.parse_args(argv)
+
+def worker_main(argv):
+	args = parse_worker_arguments(argv)
+	setup_logging(logger, frame_detail=args.log_frames)
+	ok = run_worker(
+		args.queue,
+		slots=args.slots,
+		lease=args.lease,
+		max_attempts=args.max_attempts,
+		executors=args.executors or None,
+		poll=args.poll,
+		wait=args.wait,
+		report=args.report or None
+	)
+	if not ok:
+		sys.exit(1)
+
 def main():
+	if len(sys.argv) > 1 and sys.argv[1] == "worker":
+		worker_main(sys.argv[2:])
+		return
+
 	args = parse_arguments()
+	setup_logging(logger, frame_detail=args.log_frames)
     
 	logger.info(f"args : {args}")
+	if args.batch:
+		results = run_batch_file(args.batch, vars(args))
+		if any(result["status"] == "failed" for result in results):
+			sys.exit(1)
+		return
+
 	processor = MVLIngestionProcessor(args)
-	processor.execute()
+	try:
+		processor.execute()
+	except PreflightError as e:
+		logger.error(str(e))
+		sys.exit(1)
 
 if __name__=="__main__":
     main()
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import statistics
+import threading
+
+from mvl_ingestion.ingestion_utils import logger
+
+
+def get_tuning_path():
+    """
+    Per-user (and so per-host) store of the concurrency chosen for each
+    source/destination pair; the best setting depends on this host's links.
+    """
+    return os.path.join(os.path.expanduser("~"), ".mvl_ingestion", "tuning.json")
+
+
+def storage_root(path):
+    """
+    Returns the drive (Windows) or mount point (POSIX) that path lives on.
+    """
+    path = os.path.abspath(path)
+    drive, _ = os.path.splitdrive(path)
+    if drive:
+        return drive.upper()
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def get_tuning_key(source, destination):
+    return f"{storage_root(source)} -> {storage_root(destination)}"
+
+
+class ConcurrencyGate:
+    """
+    Counting semaphore whose limit can change while tasks are running.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def try_acquire(self):
+        with self._cond:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self, *_):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def set_limit(self, limit):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+
+class ConcurrencyTuner:
+    """
+    AIMD tuner for the number of tasks a stage runs at once, within [minimum, maximum],
+    comparing throughput per busy second and median latency window by window.
+    """
+    def __init__(self, stage, gate, minimum, maximum, window=8, min_seconds=0.5, tolerance=0.05):
+        self.stage = stage
+        self.gate = gate
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.min_seconds = min_seconds
+        self.tolerance = tolerance
+        self.adjustments = 0
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._active = 0
+        # Only time with tasks in flight counts, so waiting on the previous stage does not look slow.
+        self._busy = 0.0  # busy seconds of the current window, up to _busy_since
+        self._busy_since = None
+        self._previous = None  # (throughput, latency)
+        self._best = (0.0, gate.limit)
+
+    @property
+    def limit(self):
+        return self.gate.limit
+
+    @property
+    def best_limit(self):
+        """
+        The limit of the fastest window, remembered for the next run.
+        """
+        return self._best[1]
+
+    def task_started(self):
+        with self._lock:
+            if not self._active:
+                self._busy_since = time.perf_counter()
+            self._active += 1
+
+    def task_finished(self, latency=None):
+        """
+        Records a finished task; latency is None for tasks that failed.
+        """
+        with self._lock:
+            now = time.perf_counter()
+            self._active -= 1
+            self._busy += now - self._busy_since
+            self._busy_since = now
+            if latency is None:
+                return
+            self._latencies.append(latency)
+            if len(self._latencies) < max(self.window, 2 * self.gate.limit) or self._busy < self.min_seconds:
+                return
+            throughput = len(self._latencies) / self._busy
+            latency = statistics.median(self._latencies)
+            self._latencies = []
+            self._busy = 0.0
+            self._adjust(throughput, latency)
+
+    def _adjust(self, throughput, latency):
+        limit = self.gate.limit
+        if throughput > self._best[0]:
+            self._best = (throughput, limit)
+
+        new_limit = limit
+        if self._previous is None:
+            new_limit = limit + 1
+        else:
+            previous_throughput, previous_latency = self._previous
+            if throughput > previous_throughput * (1 + self.tolerance):
+                new_limit = limit + 1
+            elif throughput < previous_throughput * (1 - self.tolerance) or latency > previous_latency * 1.5:
+                # A congested filer queues requests instead of serving them faster.
+                new_limit = min(limit - 1, int(limit * 0.75))
+            else:
+                new_limit = limit + 1
+        new_limit = max(self.minimum, min(self.maximum, new_limit))
+        self._previous = (throughput, latency)
+        if new_limit != limit:
+            self.adjustments += 1
+            logger.debug(f"[AUTOTUNE] {self.stage}: {throughput:.1f} tasks/s, median {latency:.3f}s "
+                         f"at {limit} workers -> {new_limit}")
+            self.gate.set_limit(new_limit)
+
+
+class TuningStore:
+    """
+    JSON file of {key: {stage: workers}} remembered between runs.
+    """
+    def __init__(self, path=None):
+        self.path = path or get_tuning_path()
+        self.data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable tuning file {self.path}: {e}")
+
+    def get(self, key, stage):
+        return self.data.get(key, {}).get(stage)
+
+    def update(self, key, settings):
+        self.data.setdefault(key, {}).update(settings)
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to save tuning file {self.path}: {e}")
@@ -0,0 +1,192 @@
+import os
+import csv
+import time
+import concurrent.futures
+
+import yaml
+
+from mvl_ingestion.ingestion_utils import logger, ingestion_args
+from mvl_ingestion.ingestion_metrics import metrics
+
+# Manifest column names that differ from the CLI destinations.
+JOB_KEY_ALIASES = {
+    "date": "input_date",
+    "proxy-res": "proxy_res",
+}
+
+
+def default_args():
+    """
+    Returns the CLI defaults from parser_template.yaml as a dict keyed by dest,
+    so batch jobs given as plain dicts only need the fields that differ.
+    """
+    defaults = {}
+    for arg in ingestion_args():
+        dest = arg.get("dest") or arg["name"].lstrip("-").replace("-", "_")
+        action = arg.get("action")
+        if action == "store_true":
+            defaults[dest] = False
+        elif action == "store_false":
+            defaults[dest] = True
+        else:
+            defaults[dest] = arg.get("default")
+    return defaults
+
+
+def normalize_job(job):
+    normalized = {}
+    for key, value in job.items():
+        if value is None or value == "":
+            continue
+        key = key.strip().lstrip("-")
+        normalized[JOB_KEY_ALIASES.get(key, key.replace("-", "_"))] = value
+    return normalized
+
+
+def load_jobs(path):
+    """
+    Loads a YAML (list of jobs, or 'jobs' and 'defaults') or CSV (one job per row) manifest.
+
+    Returns:
+        tuple: (list of job dicts, dict of defaults)
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            return [dict(row) for row in csv.DictReader(f)], {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = yaml.safe_load(f) or []
+    if isinstance(manifest, dict):
+        return manifest.get("jobs") or [], manifest.get("defaults") or {}
+    return manifest, {}
+
+
+def _job_result(index, args):
+    return {
+        "job": index,
+        "input": args.get("input"),
+        "scene": args.get("scene"),
+        "shot": args.get("shot"),
+        "vendor": args.get("vendor"),
+        "date": args.get("input_date"),
+        "status": "pending",
+        "files": 0,
+        "sequences": 0,
+        "frames": 0,
+        "seconds": 0.0,
+        "errors": [],
+    }
+
+
+def _job_priority(processor, sequences):
+    """
+    Priority a job is submitted with: its own, or that of its most urgent sequence.
+    """
+    priority = int(getattr(processor.args, "priority", 0) or 0)
+    return max([priority] + [seq["priority"] for seq in sequences if "priority" in seq])
+
+
+def run_batch(jobs, defaults=None):
+    """
+    Ingests many jobs in one process, on one global pool and the same per-stage executors.
+
+    Args:
+        jobs (list): Job dicts; keys are CLI destinations (input, scene, shot, vendor, date, ...).
+        defaults (dict): Values applied to every job before its own keys.
+
+    Returns:
+        list: One result dict per job with status, counts, duration and errors.
+    """
+    from mvl_ingestion.ingestion_processor import MVLIngestionProcessor
+
+    base = default_args()
+    base.update(normalize_job(defaults or {}))
+    base.pop("batch", None)
+
+    results = []
+    processors = []
+    for index, job in enumerate(jobs):
+        args = dict(base, **normalize_job(job))
+        result = _job_result(index, args)
+        results.append(result)
+        try:
+            processors.append((result, MVLIngestionProcessor(args)))
+        except (Exception, SystemExit) as e:
+            result["status"] = "failed"
+            result["errors"].append(f"setup: {e}")
+            logger.error(f"[BATCH] job {index} ({args.get('input')}): {e}")
+
+    if not processors:
+        logger.error("[BATCH] No job could be set up.")
+        return results
+
+    started = {}
+    with processors[0][1].instrumented():
+        executors = processors[0][1].create_executors()
+        scratch = processors[0][1].create_scratch()
+        with executors, concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
+            job_futures = {}
+            discovered = []
+            for result, processor in processors:
+                started[result["job"]] = time.time()
+                if getattr(processor.args, "watch", False) or getattr(processor.args, "egress", False):
+                    result["status"] = "failed"
+                    result["errors"].append("watch and egress are not supported in batch mode")
+                    continue
+                try:
+                    files, sequences = processor.discover()
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["errors"].append(f"discover: {e}")
+                    continue
+                result["files"] = len(files)
+                result["sequences"] = len(sequences)
+                result["frames"] = sum(len(seq["paths"]) for seq in sequences)
+                if not files and not sequences:
+                    result["status"] = "failed"
+                    result["errors"].append(f"nothing to ingest in {processor.resolved_source}")
+                    continue
+                if getattr(processor.args, "queue", None):
+                    processor.enqueue(files, sequences)
+                    result["status"] = "queued"
+                    continue
+                discovered.append((result, processor, files, sequences))
+
+            # Urgent jobs get their sequences in first; their frames also jump the stage queues.
+            for result, processor, files, sequences in sorted(discovered, key=lambda item: -_job_priority(item[1], item[3])):
+                for future in processor.submit(executor, executors, files, sequences, scratch):
+                    job_futures[future] = result
+
+            for future in concurrent.futures.as_completed(job_futures):
+                result = job_futures[future]
+                try:
+                    future.result()
+                except (Exception, SystemExit) as e:
+                    result["errors"].append(str(e) or type(e).__name__)
+                result["seconds"] = round(time.time() - started[result["job"]], 3)
+        if scratch:
+            scratch.close()
+
+        for result in results:
+            if result["status"] == "pending":
+                result["status"] = "failed" if result["errors"] else "ok"
+        metrics.set_info(batch=results)
+
+    failed = sum(1 for r in results if r["status"] == "failed")
+    logger.info(f"[BATCH] {len(results) - failed}/{len(results)} jobs succeeded or queued")
+    for result in results:
+        if result["status"] == "failed":
+            logger.error(f"[BATCH] job {result['job']} ({result['input']}): {'; '.join(result['errors'])}")
+    return results
+
+
+def run_batch_file(path, defaults=None):
+    """
+    Loads a YAML or CSV manifest and runs it, see run_batch. Defaults given here
+    (e.g. the CLI arguments) are overridden by the manifest's own defaults.
+    """
+    jobs, manifest_defaults = load_jobs(path)
+    merged = dict(defaults or {})
+    merged.update(manifest_defaults)
+    logger.info(f"[BATCH] {len(jobs)} jobs loaded from {path}")
+    return run_batch(jobs, merged)
@@ -3,9 +3,20 @@ import sys
 import re
 import time
 import threading
+import collections
 import concurrent.futures
+from contextlib import contextmanager
 
-from mvl_ingestion.ingestion_utils import logger, generate_sequence_output_paths, get_resolution_string
+from mvl_ingestion.ingestion_utils import logger, generate_sequence_output_paths, get_resolution_string, release_version
+from mvl_ingestion.ingestion_metrics import metrics
+from mvl_ingestion.ingestion_executor import StageExecutors, CopyTask, ProxyTask, MovTask
+from mvl_ingestion.ingestion_graph import DerivativeGraph, file_identity
+from mvl_ingestion.ingestion_prefetch import Prefetcher
+from mvl_ingestion.ingestion_scratch import StageCopyOperation
+from mvl_ingestion.ingestion_operations import LOSSLESS_COMPRESSIONS
+
+STAGE_COPY = StageCopyOperation("bytes_staged")
+PUSH_COPY = StageCopyOperation("bytes_pushed")
 
 def print_slow(text, delay=0.03):
     for c in text:
@@ -27,14 +38,44 @@ def spinner(msg, stop_event):
         idx += 1
     sys.stdout.write("✔️\n")
 
+def summarize(outcomes):
+    """
+    Formats per-frame outcomes as ': 10 copied, 2 skipped' for a summary line.
+    """
+    counts = collections.Counter(outcome for outcome in outcomes if outcome)
+    if not counts:
+        return ""
+    return ": " + ", ".join(f"{count} {outcome.replace('_', ' ')}" for outcome, count in counts.most_common())
+
+def get_proxy_path(exr_path, proxy_dir, proxy_res, proxy_fmt):
+    """
+    Returns the proxy path for a copied plate, with the resolution in the name replaced.
+    """
+    filename_with_proxy_res = re.sub(r'\d{3,5}x\d{3,5}', proxy_res, os.path.basename(exr_path))
+    return os.path.join(proxy_dir, filename_with_proxy_res.replace('.exr', f'.{proxy_fmt}'))
+
 class SequenceBuilder:
-    def __init__(self, sequence, copy_op, proxy_op, mov_op):
+    def __init__(self, sequence, copy_op, proxy_op, mov_op, executors=None, scratch=None, on_plan=None):
         self.sequence = sequence  # dict with 'paths' key
         self.copy_op = copy_op
         self.proxy_op = proxy_op
         self.mov_op = mov_op
         self.copied_paths = []
         self.out_paths = {}
+        self.name = sequence.get('base_name') if isinstance(sequence, dict) else None
+        self.prefetch = {}  # --prefetch settings, taken from the metadata in copy_sequence
+        self.priority = 0  # the sequence's own priority or --priority, set in copy_sequence
+        # Optional ScratchSpace: plates are staged locally, derivatives built there, then pushed.
+        self.scratch = scratch
+        self.staging = None
+        # Called with the output paths once planned, before anything is copied.
+        self.on_plan = on_plan
+        self._plate_tasks = []
+        # Executors shared across builders of a run; created on demand otherwise.
+        self.executors = executors
+        self._owns_executors = executors is None
+        if self._owns_executors:
+            self.executors = StageExecutors()
 
     def copy_sequence(self, metadata):
         copied = []
@@ -46,24 +87,112 @@ class SequenceBuilder:
         
         frame_counter = start_frame
         tasks = []
-        num_workers = os.cpu_count() or 4  # Fallback to 4 if detection fails
 
-        self.out_paths = generate_sequence_output_paths(self.sequence, metadata)
+        with metrics.span("plan", sequence=self.name):
+            self.out_paths = generate_sequence_output_paths(self.sequence, metadata)
+        if self.on_plan:
+            self.on_plan(self.out_paths)
         print_slow("[COPY] Copying exrs...", 0.02)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-            for src, dest in self.out_paths.get('plate_path').items():
-                tasks.append(executor.submit(self.copy_op.execute, src, dest, overwrite))
-                copied.append(dest)
-               
-            # Wait for all copies to finish
-            for task in concurrent.futures.as_completed(tasks):
-                task.result()
+        for src, dest in self.out_paths.get('plate_path').items():
+            tasks.append(CopyTask(src, dest, overwrite))
+            copied.append(dest)
+        self.prefetch = {key: metadata[key] for key in ('prefetch', 'prefetch_mb') if key in metadata}
+        self.priority = int(self.sequence.get('priority', metadata.get('priority')) or 0)
+        if self.scratch:
+            self.staging = self.scratch.reserve(self.name, sum(os.path.getsize(task.src) for task in tasks))
+        if self.staging:
+            self._stage(tasks)
+            return
+        self._sample_recompression(tasks)
+        with metrics.span("copy", sequence=self.name), self._prefetching([task.src for task in tasks]) as callbacks:
+            outcomes = self.executors.get("copy").run(self.copy_op, tasks, "copy_frame", priority=self.priority, sequence=self.name, **callbacks)
+        metrics.incr("frames", len(copied), sequence=self.name)
         self.copied_paths = copied
 
         folder_name = os.path.dirname(dest)
-        logger.info(f"Copy complete for sequence in folder: {folder_name} ({len(self.copied_paths)} files)")
+        logger.info(f"Copy complete for sequence in folder: {folder_name} ({len(self.copied_paths)} files{summarize(outcomes)})")
+        self._compare_recompression(tasks, outcomes)
 
-    def generate_proxies(self, proxy_fmt, proxy_res_fmt):
+    def _stage(self, tasks):
+        """
+        Copies the plates into the scratch area; they reach the destination in push().
+        """
+        local_tasks = [CopyTask(task.src, self.staging.local(task.dst), True) for task in tasks]
+        with metrics.span("stage", sequence=self.name), self._prefetching([task.src for task in tasks]) as callbacks:
+            self.executors.get("copy").run(STAGE_COPY, local_tasks, "stage_frame", priority=self.priority, sequence=self.name, **callbacks)
+        self._plate_tasks = tasks
+        self.copied_paths = [task.dst for task in local_tasks]
+        logger.info(f"Staged {len(tasks)} frames of {self.name} in {self.staging.path}")
+
+    def _working_path(self, destination):
+        """
+        Where a derivative is written: in the scratch area when staging, else at its destination.
+        """
+        return self.staging.local(destination) if self.staging else destination
+
+    def push(self):
+        """
+        Moves the staged plates and derivatives to the destination in one bulk transfer.
+        """
+        if not self.staging:
+            return
+        # Plates are pushed from the staged copy: each source frame is read once.
+        plates = [CopyTask(self.staging.local(task.dst), task.dst, task.overwrite) for task in self._plate_tasks]
+        derivatives = [CopyTask(local, destination, True) for local, destination in self.staging.pushes]
+        self._sample_recompression(plates)
+        with metrics.span("push", sequence=self.name):
+            outcomes = self.executors.get("copy").run(self.copy_op, plates, "copy_frame", priority=self.priority, sequence=self.name)
+            self.executors.get("copy").run(PUSH_COPY, derivatives, "push_frame", priority=self.priority, sequence=self.name)
+        # Counted once, when the plates reach the destination.
+        metrics.incr("frames", len(plates), sequence=self.name)
+        self.copied_paths = [task.dst for task in plates]
+
+        folder_name = os.path.dirname(self.copied_paths[-1])
+        logger.info(f"Copy complete for sequence in folder: {folder_name} ({len(self.copied_paths)} files{summarize(outcomes)}, "
+                    f"{len(derivatives)} derivatives pushed from scratch)")
+        self._compare_recompression(plates, outcomes)
+
+    def _sample_recompression(self, tasks):
+        """
+        With --recompress, the pixels of the first and last frame are always verified.
+        """
+        if tasks and hasattr(self.copy_op, "sample"):
+            self.copy_op.sample([tasks[0].src, tasks[-1].src])
+
+    def _compare_recompression(self, tasks, outcomes):
+        """
+        With --recompress, logs the size saved and the decode speed of the first recompressed frame.
+        """
+        recompressed = [task for task, outcome in zip(tasks, outcomes) if outcome == "recompressed"]
+        if not recompressed or not hasattr(self.copy_op, "compare"):
+            return
+        source_bytes = sum(os.path.getsize(task.src) for task in recompressed)
+        output_bytes = sum(os.path.getsize(task.dst) for task in recompressed)
+        saved = 1 - output_bytes / source_bytes if source_bytes else 0
+        message = (f"Recompressed {len(recompressed)} frames of {self.name} to {self.copy_op.compression}: "
+                   f"{source_bytes / 1024 ** 2:.1f} MB -> {output_bytes / 1024 ** 2:.1f} MB ({saved:.0%} saved)")
+        comparison = self.copy_op.compare(recompressed[0].src, recompressed[0].dst, sequence=self.name)
+        if comparison:
+            message += f", decode {comparison['source_seconds']:.3f}s -> {comparison['output_seconds']:.3f}s per frame"
+        elif self.copy_op.compression in LOSSLESS_COMPRESSIONS:
+            every = self.copy_op.verify_every
+            message += f", pixels verified on {'every frame' if every == 1 else f'the first, last and 1 in {every} frames'}"
+        logger.info(message)
+
+    @contextmanager
+    def _prefetching(self, paths):
+        """
+        Prefetches paths ahead of a stage; yields the callbacks for
+        StageExecutor.run that move the prefetch window.
+        """
+        prefetcher = Prefetcher.from_metadata(self.prefetch)
+        if prefetcher is None or not paths:
+            yield {}
+            return
+        with prefetcher.run(paths):
+            yield {"on_start": prefetcher.started}
+
+    def generate_proxies(self, proxy_fmt, proxy_res_fmt, rebuild=False):
         if not self.copied_paths:
             return
         
@@ -71,45 +200,121 @@ class SequenceBuilder:
         normalized_path = os.path.normpath(proxy_dir)
         if proxy_dir and not os.path.exists(normalized_path):
             os.makedirs(normalized_path)  # creates the directory and any intermediate folders
+        if self.staging:
+            os.makedirs(self.staging.local(normalized_path), exist_ok=True)
 
         # Get proxy res
         proxy_res= get_resolution_string(proxy_res_fmt) 
+        params = {'tool': 'oiiotool', 'resolution': proxy_res, 'format': proxy_fmt}
+        graph = DerivativeGraph(normalized_path)
 
         print_slow("[PROXY] Generating proxies...", 0.02)
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = []
-            for exr_path in self.copied_paths:
-                filename_with_proxy_res = re.sub(r'\d{3,5}x\d{3,5}', proxy_res, os.path.basename(exr_path))
-                proxy_path = os.path.join(normalized_path, filename_with_proxy_res.replace('.exr', f'.{proxy_fmt}'))
-                futures.append(executor.submit(self.proxy_op.execute, os.path.normpath(exr_path), proxy_path, proxy_res))
-            for future in concurrent.futures.as_completed(futures):
-                future.result()
-        
-        logger.info(f"Proxy generation completed for sequence in folder: {normalized_path}")
+        tasks = []
+        inputs = []
+        reasons = collections.Counter()
+        for exr_path in self.copied_paths:
+            proxy_path = get_proxy_path(exr_path, normalized_path, proxy_res, proxy_fmt)
+            frame_inputs = [file_identity(exr_path)]
+            reason = "rebuild requested" if rebuild else graph.outdated(proxy_path, frame_inputs, params)
+            if reason is None:
+                continue
+            reasons[reason] += 1
+            tasks.append(ProxyTask(os.path.normpath(exr_path), self._working_path(proxy_path), proxy_res))
+            inputs.append((proxy_path, frame_inputs))
+        up_to_date = len(self.copied_paths) - len(tasks)
+        metrics.incr("derivatives_up_to_date", up_to_date, kind="proxy")
+        for reason, count in reasons.items():
+            metrics.incr("derivatives_built", count, kind="proxy", reason=reason)
+
+        with metrics.span("proxy", sequence=self.name), self._prefetching([task.src for task in tasks]) as callbacks:
+            results = self.executors.get("derive").run(self.proxy_op, tasks, "proxy_frame", priority=self.priority, sequence=self.name, **callbacks)
+        failed = 0
+        for task, (proxy_path, frame_inputs), result in zip(tasks, inputs, results):
+            if result is False:
+                failed += 1
+                continue
+            graph.record(proxy_path, frame_inputs, params)
+            if self.staging:
+                self.staging.pushes.append((task.dst, proxy_path))
+        if tasks:
+            graph.save()
+
+        rebuilt = f"; rebuilt: {summarize(reasons.elements())[2:]}" if reasons else ""
+        logger.info(f"Proxy generation completed for sequence in folder: {normalized_path} "
+                    f"({len(tasks) - failed} generated, {failed} failed, {up_to_date} up to date{rebuilt})")
 
     def generate_mov(self, metadata):
         if not self.copied_paths:
             logger.info(f"No file seqeuence found.")
             return
-        seq_path = self.copied_paths[0].replace('1001', '%04d')  # adjust as needed
+        first_dir, first_name = os.path.split(self.copied_paths[0])
+        seq_path = os.path.join(first_dir, first_name.replace('1001', '%04d'))  # adjust as needed
         mov_path = os.path.join(self.out_paths.get('movie_path'), os.path.basename(seq_path).replace('exr', 'mov'))
-        # Check if the file exists and `--force` flag is not set
-        if os.path.exists(mov_path) and not metadata.get('force'):
+        task = MovTask(seq_path, self._working_path(mov_path), {'vendor': metadata.get('vendor')})
+        inputs = [file_identity(path) for path in self.copied_paths]
+        params = {'fps': 24, 'pattern': os.path.basename(seq_path), 'overlay': task.metadata}
+        graph = DerivativeGraph(self.out_paths.get('movie_path'))
+
+        reason = "rebuild requested" if metadata.get('rebuild') else graph.outdated(mov_path, inputs, params)
+        if reason is None:
+            metrics.incr("derivatives_up_to_date", kind="mov")
+            logger.info(f"Movie at {mov_path} is up to date, skipping. Use --rebuild to regenerate it.")
+            return
+        # Check if the file exists and `--force` flag is not set (movies built before build records existed)
+        if os.path.exists(mov_path) and not graph.has_record(mov_path) and not metadata.get('force'):
             logger.info(f"Movie already exists at {mov_path}, skipping. Use --force to overwrite the file.")
-        else:
-            print_slow("[MOV] Generating Dailies...", 0.02)
-            self.mov_op.execute(seq_path, mov_path, metadata)
+            return
+
+        print_slow("[MOV] Generating Dailies...", 0.02)
+        os.makedirs(os.path.dirname(task.output_mov), exist_ok=True)
+        logger.info(f"Building movie {os.path.basename(mov_path)} ({reason})")
+        metrics.incr("derivatives_built", kind="mov", reason=reason)
+        result, = self.executors.get("encode").run(self.mov_op, [task], "mov", priority=self.priority, sequence=self.name)
+        if result is not False:
+            graph.record(mov_path, inputs, params)
+            graph.save()
+            if self.staging:
+                self.staging.pushes.append((task.output_mov, mov_path))
+
+    def _release_version(self, metadata):
+        """
+        Gives back the plate version reserved for this build if it failed before writing a plate.
+        Kept when it was given (--plate_version) or recorded for retries by a queue worker (on_plan).
+        """
+        plate_dir = self.out_paths.get('plate_dir') if self.out_paths else None
+        if not plate_dir or (metadata or {}).get('plate_version') or self.on_plan:
+            return
+        plate_dir = os.path.normpath(plate_dir)
+        if release_version(os.path.dirname(plate_dir), os.path.basename(plate_dir)):
+            logger.info(f"Removed the empty plate version {plate_dir} of the failed build")
 
     def build(self, parallel_proxy=False, metadata= None):
-        self.copy_sequence(metadata)
-        if metadata.get('proxy_format') and parallel_proxy:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                executor.submit(self.generate_proxies, metadata.get('proxy_format'))
-                executor.submit(self.generate_mov)
-        else:
-            if metadata.get('use_proxy'):
-                proxy_fmt = metadata.get('proxy', 'jpeg')
-                proxy_res = metadata.get('proxy_res', "2K_DCP")
-                self.generate_proxies(proxy_fmt=proxy_fmt, proxy_res_fmt = proxy_res)
-            if metadata.get('mov'):
-                self.generate_mov(metadata)
\ No newline at end of file
+        try:
+            self._build(parallel_proxy, metadata)
+        finally:
+            if self._owns_executors:
+                self.executors.shutdown()
+
+    def _build(self, parallel_proxy=False, metadata= None):
+        try:
+            self.copy_sequence(metadata)
+            if metadata.get('proxy_format') and parallel_proxy:
+                with concurrent.futures.ThreadPoolExecutor() as executor:
+                    executor.submit(self.generate_proxies, metadata.get('proxy_format'))
+                    executor.submit(self.generate_mov)
+            else:
+                if metadata.get('use_proxy'):
+                    proxy_fmt = metadata.get('proxy', 'jpeg')
+                    proxy_res = metadata.get('proxy_res', "2K_DCP")
+                    self.generate_proxies(proxy_fmt=proxy_fmt, proxy_res_fmt = proxy_res, rebuild=metadata.get('rebuild', False))
+                if metadata.get('mov'):
+                    self.generate_mov(metadata)
+            self.push()
+        except BaseException:
+            self._release_version(metadata)
+            raise
+        finally:
+            # Staged files are removed on success and failure alike.
+            if self.staging:
+                self.staging.release()
+                self.staging = None
\ No newline at end of file
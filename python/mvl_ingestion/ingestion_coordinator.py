@@ -0,0 +1,598 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from mvl_ingestion.ingestion_utils import logger
+from mvl_ingestion.ingestion_metrics import metrics
+from mvl_ingestion.ingestion_executor import StageExecutors, parse_executor_overrides
+
+DEFAULT_LEASE = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+# Leases are compared against wall-clock time on every host (and against file
+# mtimes set by the file server for FileCoordinator), so workers need clocks
+# kept in sync with NTP. Lease lengths of a minute leave plenty of margin.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL,
+    priority INTEGER NOT NULL DEFAULT 0
+)
+"""
+# File queue names start with 5000 - priority, so higher priorities sort first.
+PRIORITY_BASE = 5000
+NO_MIN_PRIORITY = -(2 ** 31)
+
+
+def task_priority(payload):
+    sequence = payload.get("sequence") or {}
+    return int(sequence.get("priority", payload.get("job", {}).get("priority")) or 0)
+
+
+def get_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def task_key(kind, paths):
+    """
+    Stable id of a unit of work, so enqueueing the same delivery twice does not
+    ingest it twice.
+    """
+    return hashlib.sha1(json.dumps([kind, sorted(paths)]).encode("utf-8")).hexdigest()[:20]
+
+
+def create_coordinator(path, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Returns a SQLiteCoordinator for .db/.sqlite paths, a FileCoordinator for directories.
+    """
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteCoordinator(path, lease=lease, max_attempts=max_attempts)
+    return FileCoordinator(path, lease=lease, max_attempts=max_attempts)
+
+
+class SQLiteCoordinator:
+    """
+    Work queue in a SQLite database on the shared project root.
+    """
+    def __init__(self, path, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = os.path.abspath(path)
+        self.root = os.path.dirname(self.path)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(self.root, exist_ok=True)
+        with self._transaction() as db:
+            db.execute(SCHEMA)
+            columns = [row[1] for row in db.execute("PRAGMA table_info(tasks)")]
+            if "priority" not in columns:
+                # Queues created before priorities existed.
+                db.execute("ALTER TABLE tasks ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Rollback journal, not WAL: WAL needs shared memory and does not work across hosts.
+            db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connect()
+        # Claims are serialized by SQLite's file lock.
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def enqueue(self, tasks):
+        """
+        Adds (task_id, payload) pairs; ids already in the queue are ignored.
+
+        Returns:
+            int: Number of tasks added.
+        """
+        added = 0
+        now = time.time()
+        with self._transaction() as db:
+            for task_id, payload in tasks:
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO tasks (id, payload, updated, priority) VALUES (?, ?, ?, ?)",
+                    (task_id, json.dumps(payload), now, task_priority(payload)))
+                added += cursor.rowcount
+        return added
+
+    def _reclaim(self, db, now):
+        expired = db.execute(
+            "SELECT id, worker FROM tasks WHERE state = 'leased' AND lease_expires < ?", (now,)).fetchall()
+        for task_id, worker in expired:
+            logger.warning(f"[QUEUE] Lease of {worker} on {task_id} expired, reclaiming")
+        db.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = 'lease of ' || worker || ' expired', worker = NULL, updated = ? "
+            "WHERE state = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now, now))
+        return len(expired)
+
+    def claim(self, worker, min_priority=None):
+        """
+        Leases the oldest pending task of the highest priority (at least min_priority) to worker.
+
+        Returns:
+            tuple: (task_id, payload) or None if nothing is pending.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            reclaimed = self._reclaim(db, now)
+            if reclaimed:
+                metrics.incr("queue_reclaimed", reclaimed)
+            row = db.execute(
+                "SELECT id, payload FROM tasks WHERE state = 'pending' AND priority >= ? "
+                "ORDER BY priority DESC, rowid LIMIT 1",
+                (NO_MIN_PRIORITY if min_priority is None else min_priority,)).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated = ? WHERE id = ?",
+                (worker, now + self.lease, now, row[0]))
+        return row[0], json.loads(row[1])
+
+    def heartbeat(self, worker, task_ids):
+        """
+        Extends the leases worker holds.
+
+        Returns:
+            list: Task ids whose lease was lost (expired and reclaimed by another worker).
+        """
+        lost = []
+        now = time.time()
+        with self._transaction() as db:
+            for task_id in task_ids:
+                cursor = db.execute(
+                    "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                    (now + self.lease, now, task_id, worker))
+                if not cursor.rowcount:
+                    lost.append(task_id)
+        return lost
+
+    def update(self, worker, task_id, payload):
+        """
+        Replaces the payload of a task worker holds, so a retry sees what it recorded.
+
+        Returns:
+            bool: False if the lease was lost.
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET payload = ?, updated = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                (json.dumps(payload), time.time(), task_id, worker))
+        return bool(cursor.rowcount)
+
+    def complete(self, worker, task_id):
+        """
+        Returns:
+            bool: False if the lease was lost (the task was reclaimed or failed meanwhile).
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET state = 'done', lease_expires = NULL, error = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND state = 'leased'",
+                (time.time(), task_id, worker))
+        return bool(cursor.rowcount)
+
+    def fail(self, worker, task_id, error):
+        """
+        Returns the task to the queue, or marks it failed after max_attempts.
+        """
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker = NULL, lease_expires = NULL, error = ?, updated = ? WHERE id = ? AND worker = ?",
+                (self.max_attempts, f"{worker}: {error}", time.time(), task_id, worker))
+
+    def counts(self):
+        db = self._connect()
+        counts = dict.fromkeys(("pending", "leased", "done", "failed"), 0)
+        counts.update(db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+        return counts
+
+    def failures(self):
+        db = self._connect()
+        return db.execute("SELECT id, error FROM tasks WHERE state = 'failed' ORDER BY rowid").fetchall()
+
+
+class FileCoordinator:
+    """
+    Work queue made of plain files on the shared project root, for file systems
+    where SQLite locking cannot be trusted.
+    """
+    def __init__(self, root, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.root = os.path.abspath(root)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        # tasks/<rank>-<seq>_<id>.json: payloads, claimed in name order (rank: PRIORITY_BASE - priority)
+        # leases/<name>: created with O_EXCL by the owner; the mtime is the heartbeat
+        # attempts/<name>: number of claims so far
+        for sub in ("tasks", "leases", "attempts", "done", "failed"):
+            os.makedirs(os.path.join(self.root, sub), exist_ok=True)
+
+    def _path(self, sub, name):
+        return os.path.join(self.root, sub, name)
+
+    def _write(self, sub, name, data):
+        path = self._path(sub, name)
+        tmp_path = f"{path}.{get_worker_id()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, sub, name):
+        try:
+            with open(self._path(sub, name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _task_names(self):
+        return sorted(n[:-len(".json")] for n in os.listdir(os.path.join(self.root, "tasks")) if n.endswith(".json"))
+
+    def _priority(self, name):
+        rank, separator, _ = name.partition("-")
+        # Names without a rank were enqueued before priorities existed.
+        return PRIORITY_BASE - int(rank) if separator and rank.isdigit() else 0
+
+    def _finished(self, name):
+        return os.path.exists(self._path("done", name)) or os.path.exists(self._path("failed", name))
+
+    def enqueue(self, tasks):
+        existing = set(name.split("_", 1)[1] for name in self._task_names())
+        added = 0
+        for task_id, payload in tasks:
+            if task_id in existing:
+                continue
+            rank = max(0, min(2 * PRIORITY_BASE - 1, PRIORITY_BASE - task_priority(payload)))
+            self._write("tasks", f"{rank:04d}-{time.time_ns():020d}_{task_id}.json", payload)
+            existing.add(task_id)
+            added += 1
+        return added
+
+    def _attempts(self, name):
+        try:
+            with open(self._path("attempts", name), "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _try_lease(self, worker, name):
+        lease = self._path("leases", name)
+        try:
+            fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(worker)
+        return True
+
+    def _reclaim_stale(self, worker, name):
+        lease = self._path("leases", name)
+        try:
+            age = time.time() - os.stat(lease).st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.lease:
+            return False
+        stale = f"{lease}.{worker}.stale"
+        try:
+            os.rename(lease, stale)
+        except FileNotFoundError:
+            return False  # Another worker reclaimed it first
+        with open(stale, "r", encoding="utf-8") as f:
+            owner = f.read().strip()
+        os.remove(stale)
+        logger.warning(f"[QUEUE] Lease of {owner} on {name} expired, reclaiming")
+        metrics.incr("queue_reclaimed")
+        return True
+
+    def claim(self, worker, min_priority=None):
+        for name in self._task_names():
+            if min_priority is not None and self._priority(name) < min_priority:
+                continue
+            if self._finished(name):
+                continue
+            if not self._try_lease(worker, name):
+                if not self._reclaim_stale(worker, name) or not self._try_lease(worker, name):
+                    continue
+            if self._finished(name):
+                os.remove(self._path("leases", name))
+                continue
+            attempts = self._attempts(name)
+            if attempts >= self.max_attempts:
+                self._write("failed", name, {"error": f"gave up after {attempts} attempts"})
+                os.remove(self._path("leases", name))
+                continue
+            payload = self._read("tasks", f"{name}.json")
+            if payload is None:
+                os.remove(self._path("leases", name))
+                continue
+            with open(self._path("attempts", name), "w", encoding="utf-8") as f:
+                f.write(str(attempts + 1))
+            return name, payload
+        return None
+
+    def _owns(self, worker, name):
+        try:
+            with open(self._path("leases", name), "r", encoding="utf-8") as f:
+                return f.read().strip() == worker
+        except OSError:
+            return False
+
+    def heartbeat(self, worker, task_ids):
+        lost = []
+        for name in task_ids:
+            if self._owns(worker, name):
+                os.utime(self._path("leases", name))
+            else:
+                lost.append(name)
+        return lost
+
+    def _release(self, worker, name):
+        if self._owns(worker, name):
+            os.remove(self._path("leases", name))
+
+    def update(self, worker, task_id, payload):
+        if not self._owns(worker, task_id):
+            return False
+        self._write("tasks", f"{task_id}.json", payload)
+        return True
+
+    def complete(self, worker, task_id):
+        if not self._owns(worker, task_id) or self._finished(task_id):
+            return False
+        self._write("done", task_id, {"worker": worker, "time": time.time()})
+        self._release(worker, task_id)
+        return True
+
+    def fail(self, worker, task_id, error):
+        if not self._owns(worker, task_id):
+            return
+        if self._attempts(task_id) >= self.max_attempts:
+            self._write("failed", task_id, {"worker": worker, "error": f"{worker}: {error}"})
+        self._release(worker, task_id)
+
+    def counts(self):
+        counts = dict.fromkeys(("pending", "leased", "done", "failed"), 0)
+        leases = set(os.listdir(os.path.join(self.root, "leases")))
+        for name in self._task_names():
+            if os.path.exists(self._path("done", name)):
+                counts["done"] += 1
+            elif os.path.exists(self._path("failed", name)):
+                counts["failed"] += 1
+            elif name in leases:
+                counts["leased"] += 1
+            else:
+                counts["pending"] += 1
+        return counts
+
+    def failures(self):
+        return [(name, (self._read("failed", name) or {}).get("error"))
+                for name in self._task_names() if os.path.exists(self._path("failed", name))]
+
+
+def build_tasks(job, files, sequences):
+    """
+    Turns a discovered delivery into queue tasks. job holds the processor
+    arguments, so a worker on another host can rebuild the same processor.
+    """
+    tasks = []
+    for file_path in files:
+        tasks.append((task_key("file", [file_path]), {"kind": "file", "job": job, "path": file_path}))
+    for seq in sequences:
+        tasks.append((task_key("sequence", seq["paths"]), {"kind": "sequence", "job": job, "sequence": seq}))
+    return tasks
+
+
+class IngestWorker:
+    """
+    Claims tasks from a coordinator and ingests them, `slots` at a time, until the queue is drained.
+    While every slot is busy, an urgent slot claims tasks that outrank all running ones.
+    """
+    def __init__(self, coordinator, executors, worker_id=None, slots=1, poll=5.0, wait=False):
+        self.coordinator = coordinator
+        self.executors = executors
+        self.worker_id = worker_id or get_worker_id()
+        self.slots = max(1, slots)
+        self.poll = poll
+        self.wait = wait
+        self.completed = 0
+        self.failed = 0
+        self._held = set()
+        self._running = {}  # task id -> priority
+        self._lock = threading.Lock()
+        self._processors = {}
+        self._stop = threading.Event()
+        self._slots_done = threading.Event()
+
+    def run(self):
+        logger.info(f"[WORKER] {self.worker_id} polling {getattr(self.coordinator, 'path', self.coordinator.root)} "
+                    f"with {self.slots} slots")
+        heartbeat = threading.Thread(target=self._heartbeat, name="heartbeat", daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._loop, name=f"slot-{i}") for i in range(self.slots)]
+        urgent = threading.Thread(target=self._urgent_loop, name="slot-urgent")
+        for thread in threads + [urgent]:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+            self._slots_done.set()
+            while urgent.is_alive():
+                urgent.join(0.5)
+        except KeyboardInterrupt:
+            logger.warning("[WORKER] Interrupted; unfinished tasks are reclaimed once their lease expires.")
+            self._stop.set()
+            raise
+        finally:
+            self._stop.set()
+            self._slots_done.set()
+            heartbeat.join()
+        logger.info(f"[WORKER] {self.worker_id} finished: {self.completed} done, {self.failed} failed")
+        return self.failed == 0
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.coordinator.lease / 3):
+            with self._lock:
+                held = list(self._held)
+            if not held:
+                continue
+            try:
+                for task_id in self.coordinator.heartbeat(self.worker_id, held):
+                    logger.warning(f"[WORKER] Lost lease on {task_id}; another worker may ingest it again")
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"[WORKER] Heartbeat failed: {e}")
+
+    def _queue_error(self, e):
+        # A locked database or a flaky shared file system must not end the slot.
+        logger.warning(f"[WORKER] Could not read the queue, retrying in {self.poll}s: {e}")
+        metrics.incr("queue_errors")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                task = self.coordinator.claim(self.worker_id)
+                counts = self.coordinator.counts() if task is None else None
+            except (OSError, sqlite3.Error) as e:
+                self._queue_error(e)
+                self._stop.wait(self.poll)
+                continue
+            if task is None:
+                if not self.wait and not counts["pending"] and not counts["leased"]:
+                    return
+                # Other workers still hold leases: stay around to reclaim them if they die.
+                self._stop.wait(self.poll)
+                continue
+
+            self._execute(task)
+
+    def _urgent_loop(self):
+        while not self._slots_done.wait(self.poll):
+            with self._lock:
+                if len(self._running) < self.slots:
+                    continue
+                floor = max(self._running.values()) + 1
+            try:
+                task = self.coordinator.claim(self.worker_id, min_priority=floor)
+            except (OSError, sqlite3.Error) as e:
+                self._queue_error(e)
+                continue
+            if task is not None:
+                logger.info(f"[WORKER] Claimed urgent task {task[0]} (priority {task_priority(task[1])}) while all slots are busy")
+                metrics.incr("queue_urgent_claims")
+                self._execute(task)
+
+    def _execute(self, task):
+        task_id, payload = task
+        with self._lock:
+            self._held.add(task_id)
+            self._running[task_id] = task_priority(payload)
+        try:
+            with metrics.span("task", kind=payload["kind"]):
+                self._run_task(task_id, payload)
+            if self.coordinator.complete(self.worker_id, task_id):
+                with self._lock:
+                    self.completed += 1
+            else:
+                logger.warning(f"[WORKER] Lost lease on {task_id} before it completed; not marking it done")
+        except (Exception, SystemExit) as e:
+            logger.error(f"[WORKER] Task {task_id} failed: {e}")
+            self.coordinator.fail(self.worker_id, task_id, str(e) or type(e).__name__)
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._held.discard(task_id)
+                self._running.pop(task_id, None)
+
+    def _processor(self, job):
+        from mvl_ingestion.ingestion_processor import MVLIngestionProcessor
+
+        key = json.dumps(job, sort_keys=True)
+        with self._lock:
+            processor = self._processors.get(key)
+            if processor is None:
+                processor = self._processors[key] = MVLIngestionProcessor(job)
+        return processor
+
+    def _run_task(self, task_id, payload):
+        from mvl_ingestion.ingestion_builder import SequenceBuilder
+
+        processor = self._processor(payload["job"])
+        if payload["kind"] == "file":
+            processor.copy_file(payload["path"])
+            return
+        metadata = processor.data
+        if payload.get("plate_version"):
+            # A retry or reclaim: reuse the version reserved by the first attempt,
+            # recopying plates a crashed attempt may have left half written.
+            metadata = dict(metadata, plate_version=payload["plate_version"], overwrite=True)
+
+        def on_plan(out_paths):
+            if not payload.get("plate_version"):
+                version = os.path.basename(os.path.normpath(out_paths["plate_dir"]))
+                self.coordinator.update(self.worker_id, task_id, dict(payload, plate_version=version))
+
+        SequenceBuilder(
+            sequence=payload["sequence"],
+            copy_op=processor.copy_op,
+            proxy_op=processor.proxy_op,
+            mov_op=processor.mov_op,
+            executors=self.executors,
+            on_plan=on_plan
+        ).build(False, metadata)
+
+
+def run_worker(queue, slots=1, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+               executors=None, poll=5.0, wait=False, report=None):
+    """
+    Runs an ingest worker against the queue at `queue` and writes its run report
+    to `report` (default <queue dir>/reports/worker_<host>-<pid>_<run_id>.json).
+
+    Returns:
+        bool: True if every task this worker ran succeeded.
+    """
+    coordinator = create_coordinator(queue, lease=lease, max_attempts=max_attempts)
+    metrics.reset()
+    stage_executors = StageExecutors(parse_executor_overrides(executors))
+    worker = IngestWorker(coordinator, stage_executors, slots=slots, poll=poll, wait=wait)
+    metrics.set_info(worker=worker.worker_id, queue=os.path.abspath(queue))
+    try:
+        with stage_executors, metrics.span("run"):
+            ok = worker.run()
+    finally:
+        metrics.set_info(completed=worker.completed, failed=worker.failed, queue_counts=coordinator.counts())
+        report = report or os.path.join(coordinator.root, "reports", f"worker_{worker.worker_id}_{metrics.run_id}.json")
+        try:
+            metrics.write_json(report)
+        except OSError as e:
+            logger.warning(f"Failed to write worker report: {e}")
+
+    for task_id, error in coordinator.failures():
+        logger.error(f"[QUEUE] {task_id} failed: {error}")
+    return ok
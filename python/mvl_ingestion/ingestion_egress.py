@@ -0,0 +1,354 @@
+import os
+import re
+import io
+import json
+import time
+import zlib
+import gzip
+import struct
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import collections
+import concurrent.futures
+
+from mvl_ingestion.ingestion_utils import logger
+from mvl_ingestion.ingestion_metrics import metrics
+
+EGRESS_FORMATS = ("folder", "tar", "tgz", "zip")
+CHUNK_SIZE = 4 * 1024 * 1024
+CHECKSUM_FILE = "MANIFEST.sha256"
+VERSION_REGEX = re.compile(r"^v(\d{3})$")
+
+
+def find_published_versions(source, products=None, version=None):
+    """
+    Finds the published version folders under a shot, product or version folder.
+
+    Args:
+        source (str): Shot publish folder, product folder or version folder.
+        products (list): Product folder names to keep (e.g. ['plate', 'mov']), all if empty.
+        version (str): Version to pick (e.g. 'v003'), latest if empty.
+
+    Returns:
+        list: Version folder paths.
+    """
+    source = os.path.normpath(source)
+    if VERSION_REGEX.match(os.path.basename(source)):
+        return [source]
+
+    found = []
+    for root, dirs, _ in os.walk(source):
+        versions = sorted(d for d in dirs if VERSION_REGEX.match(d))
+        if not versions:
+            continue
+        dirs[:] = []  # do not descend into versions
+        if products and os.path.basename(root) not in products:
+            continue
+        picked = version if version else versions[-1]
+        if picked in versions:
+            found.append(os.path.join(root, picked))
+        else:
+            logger.warning(f"Version {picked} not found in {root}")
+    return sorted(found)
+
+
+def collect_files(version_dirs, source):
+    """
+    Lists the files of the version folders with their archive names, relative to source.
+    """
+    source = os.path.normpath(source)
+    base = source if not VERSION_REGEX.match(os.path.basename(source)) else os.path.dirname(source)
+    files = []
+    for version_dir in version_dirs:
+        for root, _, names in os.walk(version_dir):
+            for name in sorted(names):
+                if name.startswith("."):
+                    continue  # build records, their locks and temp files
+                path = os.path.join(root, name)
+                files.append((path, os.path.relpath(path, base).replace("\\", "/")))
+    return files
+
+
+class _HashingReader:
+    """File wrapper that hashes what is read through it."""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hasher = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.hasher.update(data)
+        return data
+
+
+class _HashingWriter:
+    """File wrapper that hashes and counts what is written through it."""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hasher = hashlib.sha256()
+        self.offset = 0
+
+    def write(self, data):
+        self.hasher.update(data)
+        self.offset += len(data)
+        return self.fileobj.write(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+class _ParallelGzipWriter:
+    """
+    Compresses a byte stream on a thread pool, one gzip member per block.
+    """
+    def __init__(self, fileobj, executor, level=6, block_size=CHUNK_SIZE, max_inflight=8):
+        self.fileobj = fileobj
+        self.executor = executor
+        self.level = level
+        self.block_size = block_size
+        self.max_inflight = max_inflight
+        self._buffer = bytearray()
+        self._pending = collections.deque()
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self._pending.append(self.executor.submit(gzip.compress, block, self.level))
+        while len(self._pending) > self.max_inflight:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def close(self):
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        while self._pending:
+            self.fileobj.write(self._pending.popleft().result())
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(max(timestamp, 315532800))  # zip dates start in 1980
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def _deflate_file(path, level):
+    """
+    Compresses one file into a spooled temp file. Runs on a worker thread; zlib
+    and hashlib release the GIL on large buffers.
+
+    Returns:
+        dict: 'data' (file object), 'crc', 'size', 'compressed_size', 'sha256', 'mtime', 'method'
+    """
+    hasher = hashlib.sha256()
+    crc = 0
+    size = 0
+    method = 8 if level else 0
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if method else None
+    spool = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            spool.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        spool.write(compressor.flush())
+    compressed_size = spool.tell()
+    spool.seek(0)
+    return {
+        "data": spool, "crc": crc, "size": size, "compressed_size": compressed_size,
+        "sha256": hasher.hexdigest(), "mtime": os.path.getmtime(path), "method": method,
+    }
+
+
+class _ZipStreamWriter:
+    """
+    Minimal zip writer for entries compressed ahead of time, with Zip64 support.
+    """
+    def __init__(self, fileobj):
+        self.out = fileobj
+        self.entries = []
+
+    def add(self, arcname, entry):
+        name = arcname.encode("utf-8")
+        offset = self.out.tell()
+        dos_time, dos_date = _dos_datetime(entry["mtime"])
+        zip64 = entry["size"] >= 0xFFFFFFFF or entry["compressed_size"] >= 0xFFFFFFFF
+        extra = struct.pack("<HHQQ", 0x0001, 16, entry["size"], entry["compressed_size"]) if zip64 else b""
+        self.out.write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 45 if zip64 else 20, 0x0800, entry["method"], dos_time, dos_date,
+            entry["crc"], 0xFFFFFFFF if zip64 else entry["compressed_size"],
+            0xFFFFFFFF if zip64 else entry["size"], len(name), len(extra)
+        ) + name + extra)
+        shutil.copyfileobj(entry["data"], self.out, CHUNK_SIZE)
+        self.entries.append((name, entry, offset, dos_time, dos_date))
+
+    def close(self):
+        cd_offset = self.out.tell()
+        for name, entry, offset, dos_time, dos_date in self.entries:
+            fields = []
+            size = entry["size"]
+            compressed_size = entry["compressed_size"]
+            if size >= 0xFFFFFFFF:
+                fields.append(size)
+                size = 0xFFFFFFFF
+            if compressed_size >= 0xFFFFFFFF:
+                fields.append(compressed_size)
+                compressed_size = 0xFFFFFFFF
+            if offset >= 0xFFFFFFFF:
+                fields.append(offset)
+                offset = 0xFFFFFFFF
+            extra = struct.pack(f"<HH{len(fields)}Q", 0x0001, 8 * len(fields), *fields) if fields else b""
+            version = 45 if fields else 20
+            self.out.write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | version, version, 0x0800, entry["method"],
+                dos_time, dos_date, entry["crc"], compressed_size, size, len(name), len(extra), 0, 0, 0,
+                0o100644 << 16, offset
+            ) + name + extra)
+        cd_size = self.out.tell() - cd_offset
+        count = len(self.entries)
+        if count >= 0xFFFF or cd_offset >= 0xFFFFFFFF or cd_size >= 0xFFFFFFFF:
+            zip64_offset = self.out.tell()
+            self.out.write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self.out.write(struct.pack("<IIQI", 0x07064B50, 0, zip64_offset, 1))
+            count = min(count, 0xFFFF)
+            cd_size = min(cd_size, 0xFFFFFFFF)
+            cd_offset = min(cd_offset, 0xFFFFFFFF)
+        self.out.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0))
+
+
+class EgressPackager:
+    """
+    Packages published files for a vendor as a folder, tar, tar.gz or zip in one
+    streaming pass, with checksums and a manifest.
+    """
+    def __init__(self, fmt="tgz", workers=0, level=6):
+        if fmt not in EGRESS_FORMATS:
+            raise ValueError(f"Unsupported egress format: {fmt}. Use one of {', '.join(EGRESS_FORMATS)}")
+        self.fmt = fmt
+        self.workers = workers or os.cpu_count() or 4
+        self.level = level
+
+    def archive_path(self, out_dir, name):
+        if self.fmt == "folder":
+            return os.path.join(out_dir, name)
+        extension = {"tar": ".tar", "tgz": ".tar.gz", "zip": ".zip"}[self.fmt]
+        return os.path.join(out_dir, name + extension)
+
+    def package(self, files, out_path):
+        """
+        Args:
+            files (list): (source path, archive name) tuples.
+            out_path (str): Destination folder (folder format) or archive path.
+
+        Returns:
+            dict: The manifest, also written to '<out_path>.manifest.json'.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        with metrics.span("egress", format=self.fmt), \
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if self.fmt == "folder":
+                records, archive_sha = self._package_folder(files, out_path, executor), None
+            else:
+                tmp_path = f"{out_path}.partial"
+                with open(tmp_path, "wb") as raw:
+                    out = _HashingWriter(raw)
+                    if self.fmt == "zip":
+                        records = self._package_zip(files, out, executor)
+                    else:
+                        records = self._package_tar(files, out, executor)
+                os.replace(tmp_path, out_path)
+                archive_sha = out.hasher.hexdigest()
+
+        manifest = {
+            "format": self.fmt,
+            "path": out_path,
+            "sha256": archive_sha,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "file_count": len(records),
+            "total_size": sum(r["size"] for r in records),
+            "files": records,
+        }
+        with open(f"{out_path}.manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        metrics.incr("egress_files", len(records))
+        metrics.incr("egress_bytes", manifest["total_size"])
+        logger.info(f"Egress package written to {out_path} ({len(records)} files)")
+        return manifest
+
+    @staticmethod
+    def _checksums(records):
+        return "".join(f"{r['sha256']}  {r['path']}\n" for r in records).encode("utf-8")
+
+    def _package_folder(self, files, out_dir, executor):
+        def copy(src, arcname):
+            dst = os.path.join(out_dir, *arcname.split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+                reader = _HashingReader(f_src)
+                shutil.copyfileobj(reader, f_dst, CHUNK_SIZE)
+            shutil.copystat(src, dst)
+            return {"path": arcname, "size": os.path.getsize(dst), "sha256": reader.hasher.hexdigest()}
+
+        records = list(executor.map(lambda item: copy(*item), files))
+        with open(os.path.join(out_dir, CHECKSUM_FILE), "wb") as f:
+            f.write(self._checksums(records))
+        return records
+
+    def _package_tar(self, files, out, executor):
+        records = []
+        sink = _ParallelGzipWriter(out, executor, self.level, max_inflight=self.workers * 2) if self.fmt == "tgz" else out
+        with tarfile.open(fileobj=sink, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            for src, arcname in files:
+                info = tar.gettarinfo(src, arcname=arcname)
+                with open(src, "rb") as f:
+                    reader = _HashingReader(f)
+                    tar.addfile(info, fileobj=reader)
+                records.append({"path": arcname, "size": info.size, "sha256": reader.hasher.hexdigest()})
+            checksums = self._checksums(records)
+            info = tarfile.TarInfo(CHECKSUM_FILE)
+            info.size = len(checksums)
+            info.mtime = time.time()
+            tar.addfile(info, fileobj=io.BytesIO(checksums))
+        if self.fmt == "tgz":
+            sink.close()
+        return records
+
+    def _package_zip(self, files, out, executor):
+        records = []
+        writer = _ZipStreamWriter(out)
+        pending = collections.deque()
+
+        def drain(limit):
+            while len(pending) > limit:
+                arcname, future = pending.popleft()
+                entry = future.result()
+                writer.add(arcname, entry)
+                entry["data"].close()
+                records.append({"path": arcname, "size": entry["size"], "sha256": entry["sha256"]})
+
+        for src, arcname in files:
+            pending.append((arcname, executor.submit(_deflate_file, src, self.level)))
+            drain(self.workers * 2)
+        drain(0)
+
+        checksums = self._checksums(records)
+        writer.add(CHECKSUM_FILE, {
+            "data": io.BytesIO(checksums), "crc": zlib.crc32(checksums), "size": len(checksums),
+            "compressed_size": len(checksums), "mtime": time.time(), "method": 0,
+        })
+        writer.close()
+        return records
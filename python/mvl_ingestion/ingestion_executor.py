@@ -0,0 +1,276 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+import multiprocessing
+import concurrent.futures
+from collections import namedtuple
+
+from mvl_ingestion.ingestion_utils import logger, get_executor_config_template
+from mvl_ingestion.ingestion_metrics import metrics
+from mvl_ingestion.ingestion_autotune import ConcurrencyGate, ConcurrencyTuner, TuningStore
+from mvl_ingestion.ingestion_priority import lanes
+
+EXECUTOR_TYPES = ("thread", "process")
+# Process workers are started lazily from builder threads. A plain fork there
+# copies locks (metrics, blob store, logging) that other threads may hold, so
+# workers come from a forkserver (spawn where it is not available).
+PROCESS_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Compact, picklable task records sent to workers instead of the metadata dict.
+CopyTask = namedtuple("CopyTask", ["src", "dst", "overwrite"])
+ProxyTask = namedtuple("ProxyTask", ["src", "dst", "resolution"])
+MovTask = namedtuple("MovTask", ["input_pattern", "output_mov", "metadata"])
+
+
+def parse_executor_overrides(spec):
+    """
+    Parses a CLI override like 'copy=thread:16,derive=process:8'.
+
+    Returns:
+        dict: stage -> {'type': ..., 'workers': ...}
+    """
+    overrides = {}
+    for item in filter(None, (spec or "").split(",")):
+        try:
+            stage, value = item.split("=")
+            kind, _, workers = value.partition(":")
+            overrides[stage.strip()] = {"type": kind.strip(), "workers": int(workers or 0)}
+        except ValueError:
+            raise ValueError(f"Invalid executor override '{item}'. Expected stage=type[:workers].")
+    return overrides
+
+
+def _init_process_worker(profile_mode, profile_interval, profile_dir, lanes_state):
+    # Workers must never reuse a profiler that came with the parent's state.
+    metrics.profiler = None
+    lanes.attach(lanes_state)
+    if profile_mode and profile_mode != "off":
+        from multiprocessing.util import Finalize
+        from mvl_ingestion.ingestion_profiler import Profiler
+
+        metrics.profiler = Profiler(profile_mode, interval=profile_interval, out_dir=profile_dir)
+        metrics.profiler.start()
+        Finalize(metrics.profiler, metrics.profiler.dump, exitpriority=10)
+
+
+def _run_process_task(op, task, phase, labels, priority):
+    """
+    Runs op.execute(*task) in a worker process and returns the result with the
+    metrics recorded in the worker, so the parent can merge them.
+    """
+    metrics.reset()
+    lanes.current = priority
+    try:
+        with metrics.span(phase, **labels):
+            result = op.execute(*task)
+    finally:
+        lanes.current = None
+    return result, metrics.snapshot()
+
+
+class StageExecutor:
+    """
+    Runs the tasks of one stage on a thread or process pool, most urgent first.
+    With autotune=(minimum, maximum, initial) a ConcurrencyTuner sets the tasks in flight.
+    """
+    def __init__(self, stage, kind="thread", workers=0, autotune=None):
+        if kind not in EXECUTOR_TYPES:
+            raise ValueError(f"Unsupported executor type '{kind}' for stage {stage}. Use one of {', '.join(EXECUTOR_TYPES)}")
+        self.stage = stage
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 4
+        self.tuner = None
+        if autotune:
+            minimum, maximum, initial = autotune
+            self.workers = maximum
+            self.tuner = ConcurrencyTuner(stage, ConcurrencyGate(max(minimum, min(maximum, initial))), minimum, maximum)
+        self.gate = self.tuner.gate if self.tuner else ConcurrencyGate(self.workers)
+        self._queue = []  # (-priority, order, start)
+        self._order = itertools.count()
+        self._queue_lock = threading.Lock()
+        self._local = threading.local()
+        if kind == "process":
+            profiler = metrics.profiler
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(PROCESS_START_METHOD),
+                initializer=_init_process_worker,
+                initargs=(
+                    profiler.mode if profiler else "off",
+                    profiler.interval if profiler else 0,
+                    profiler.out_dir if profiler else None,
+                    lanes.state,
+                ),
+            )
+        else:
+            self._pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix=f"mvl-{stage}"
+            )
+
+    def _run_thread_task(self, op, task, phase, labels, priority):
+        lanes.current = priority
+        try:
+            with metrics.span(phase, **labels):
+                return op.execute(*task)
+        finally:
+            lanes.current = None
+
+    def run(self, op, tasks, phase, on_done=None, on_start=None, priority=0, **labels):
+        """
+        Runs op.execute(*task) for every task and waits for all of them.
+
+        Args:
+            on_start (callable, optional): Called with each task as it is handed to a worker.
+            on_done (callable, optional): Called with each future as it finishes.
+            priority (int): Tasks of a higher priority start before queued tasks of lower ones.
+
+        Returns:
+            list: Results in task order.
+        """
+        if self.kind == "process":
+            target = _run_process_task
+        else:
+            target = self._run_thread_task
+
+        futures = []
+        lanes.enter(priority)
+        try:
+            with self._queue_lock:
+                for task in tasks:
+                    future = concurrent.futures.Future()
+                    if on_done:
+                        future.add_done_callback(on_done)
+                    futures.append(future)
+                    start = lambda task=task, future=future: self._start(future, target, op, task, phase, labels, priority, on_start)
+                    heapq.heappush(self._queue, (-priority, next(self._order), start))
+            self._dispatch()
+
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        finally:
+            lanes.leave(priority)
+
+        results = []
+        for future in futures:
+            result = future.result()
+            if self.kind == "process":
+                result, snapshot = result
+                metrics.merge(snapshot)
+            results.append(result)
+        return results
+
+    def _dispatch(self):
+        """
+        Starts the most urgent queued tasks while the gate has room.
+        """
+        # Tasks that finish at once call back into here; the outer loop picks up.
+        if getattr(self._local, "dispatching", False):
+            return
+        self._local.dispatching = True
+        try:
+            while True:
+                with self._queue_lock:
+                    if not self._queue or not self.gate.try_acquire():
+                        return
+                    _, _, start = heapq.heappop(self._queue)
+                start()
+        finally:
+            self._local.dispatching = False
+
+    def _start(self, future, target, op, task, phase, labels, priority, on_start):
+        if on_start:
+            on_start(task)
+        if self.tuner:
+            self.tuner.task_started()
+        started = time.perf_counter()
+        try:
+            inner = self._pool.submit(target, op, task, phase, labels, priority)
+        except BaseException as e:
+            self.gate.release()
+            if self.tuner:
+                self.tuner.task_finished()
+            future.set_exception(e)
+            return
+        inner.add_done_callback(lambda inner: self._finished(inner, future, started))
+
+    def _finished(self, inner, future, started):
+        self.gate.release()
+        error = inner.exception()
+        if self.tuner:
+            self.tuner.task_finished(time.perf_counter() - started if error is None else None)
+        if error is None:
+            future.set_result(inner.result())
+        else:
+            future.set_exception(error)
+        self._dispatch()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class StageExecutors:
+    """
+    Lazily created executors per stage (copy, derive, encode) from executor_template.yaml,
+    shared by all sequence builders of a run. Autotuned stages need a tuning_key.
+    """
+    def __init__(self, overrides=None, tuning_key=None, tuning_store=None):
+        self.config = {stage: dict(cfg) for stage, cfg in get_executor_config_template()["stages"].items()}
+        for stage, cfg in (overrides or {}).items():
+            self.config.setdefault(stage, {}).update(cfg)
+        self.tuning_key = tuning_key
+        self._tuning_store = tuning_store
+        self._executors = {}
+        self._lock = threading.Lock()
+
+    def _autotune_bounds(self, stage, cfg):
+        if not self.tuning_key or not cfg.get("autotune"):
+            return None
+        if self._tuning_store is None:
+            self._tuning_store = TuningStore()
+        minimum = cfg.get("min_workers") or 1
+        maximum = max(minimum, cfg.get("max_workers") or os.cpu_count() or 4)
+        initial = self._tuning_store.get(self.tuning_key, stage) or cfg.get("workers") or os.cpu_count() or 4
+        return minimum, maximum, initial
+
+    def get(self, stage):
+        with self._lock:
+            executor = self._executors.get(stage)
+            if executor is None:
+                cfg = self.config.get(stage, {})
+                autotune = self._autotune_bounds(stage, cfg)
+                executor = StageExecutor(stage, cfg.get("type", "thread"), cfg.get("workers", 0), autotune=autotune)
+                if executor.tuner:
+                    logger.debug(f"Created {executor.kind} executor for {stage}, autotuned within {autotune[0]}-{autotune[1]} "
+                                 f"workers starting at {executor.tuner.limit}")
+                else:
+                    logger.debug(f"Created {executor.kind} executor for {stage} with {executor.workers} workers")
+                self._executors[stage] = executor
+            return executor
+
+    def _save_tuning(self):
+        tuned = {stage: executor.tuner for stage, executor in self._executors.items() if executor.tuner}
+        if not tuned:
+            return
+        self._tuning_store.update(self.tuning_key, {stage: tuner.best_limit for stage, tuner in tuned.items()})
+        self._tuning_store.save()
+        summary = {
+            stage: {"workers": tuner.best_limit, "final": tuner.limit, "adjustments": tuner.adjustments}
+            for stage, tuner in tuned.items()
+        }
+        metrics.set_info(autotune={"key": self.tuning_key, "stages": summary})
+        logger.info(f"[AUTOTUNE] {self.tuning_key}: " + ", ".join(f"{stage}={s['workers']}" for stage, s in summary.items()))
+
+    def shutdown(self):
+        with self._lock:
+            for executor in self._executors.values():
+                executor.shutdown()
+            self._save_tuning()
+            self._executors = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from mvl_ingestion.ingestion_utils import logger
+
+BUILD_RECORD = ".mvl_build.json"
+# A lock file older than this is left over from a killed process.
+LOCK_STALE = 60.0
+
+
+def file_identity(path):
+    """
+    Cheap identity of a derivative input: name, size and mtime. Plates are
+    copied with their mtime preserved, so a re-delivered frame changes it.
+    """
+    st = os.stat(path)
+    return [os.path.basename(path), st.st_size, st.st_mtime_ns]
+
+
+def input_hash(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class DerivativeGraph:
+    """
+    Build records (input and parameter hashes) for the derivatives of one output directory,
+    kept in a .mvl_build.json sidecar.
+    """
+    def __init__(self, directory):
+        self.directory = os.path.normpath(directory)
+        self.path = os.path.join(self.directory, BUILD_RECORD)
+        self.records = self._load()
+        self._recorded = set()
+        self._forgotten = set()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable build record {self.path}: {e}")
+            return {}
+
+    @contextmanager
+    def _file_lock(self):
+        lock_path = f"{self.path}.lock"
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > LOCK_STALE:
+                        os.remove(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.05)
+        os.close(fd)
+        try:
+            yield
+        finally:
+            os.remove(lock_path)
+
+    def outdated(self, output, inputs, params):
+        """
+        Returns:
+            str: Why output must be rebuilt, or None if it is up to date.
+        """
+        if not os.path.exists(output):
+            return "missing"
+        record = self.records.get(os.path.basename(output))
+        if record is None:
+            return "no build record"
+        if record.get("inputs") != input_hash(inputs):
+            return "inputs changed"
+        if record.get("params") != input_hash(params):
+            return "parameters changed"
+        return None
+
+    def has_record(self, output):
+        return os.path.basename(output) in self.records
+
+    def record(self, output, inputs, params):
+        with self._lock:
+            name = os.path.basename(output)
+            self.records[name] = {
+                "inputs": input_hash(inputs),
+                "params": input_hash(params),
+                "parameters": params,
+            }
+            self._recorded.add(name)
+            self._forgotten.discard(name)
+
+    def forget(self, output):
+        """
+        Drops the record of an output that was renamed or removed.
+
+        Returns:
+            dict: The dropped record, or None.
+        """
+        with self._lock:
+            name = os.path.basename(output)
+            self._recorded.discard(name)
+            self._forgotten.add(name)
+            return self.records.pop(name, None)
+
+    def save(self):
+        """
+        Re-reads the file and writes it back with the outputs recorded and forgotten here,
+        so builders sharing the directory keep each other's records.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._file_lock():
+                records = self._load()
+                for name in self._forgotten:
+                    records.pop(name, None)
+                records.update({name: self.records[name] for name in self._recorded})
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(records, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            self.records = records
@@ -0,0 +1,142 @@
+import re
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+DIGITS_REGEX = re.compile(r"\d+")
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `burst` warnings of the same kind (differing only by numbers) per `interval` seconds.
+    """
+    def __init__(self, burst=5, interval=60.0, level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.level = level
+        self._windows = {}  # key -> [window start, emitted, suppressed]
+        self._lock = threading.Lock()
+
+    def _key(self, record):
+        template = record.msg if record.args else record.getMessage()
+        return record.name, record.levelno, DIGITS_REGEX.sub("#", str(template))
+
+    def check(self, record):
+        """
+        Returns None to drop the record, otherwise a notice to append to it ("" for none).
+        The record itself is left untouched.
+        """
+        if record.levelno < self.level:
+            return ""
+        now = time.monotonic()
+        key = self._key(record)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                # The first record over the burst was emitted with a notice.
+                suppressed = window[2] - 1 if window else 0
+                self._windows[key] = [now, 1, 0]
+                return f" ({suppressed} similar messages suppressed)" if suppressed > 0 else ""
+            if window[1] < self.burst:
+                window[1] += 1
+                return ""
+            window[2] += 1
+            if window[2] == 1:
+                # Say once per window that we started dropping.
+                return f" (repeated, further similar messages suppressed for {self.interval:.0f}s)"
+            return None
+
+    def filter(self, record):
+        return self.check(record) is not None
+
+    def drain(self):
+        """
+        Returns [(message template, suppressed count)] and forgets them.
+        """
+        with self._lock:
+            suppressed = [(key[2], window[2] - 1) for key, window in self._windows.items() if window[2] > 1]
+            self._windows = {}
+        return suppressed
+
+
+class RateLimitedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that rate limits with RateLimitFilter and appends its notices
+    to the copy of the record it puts on the queue.
+    """
+    def __init__(self, log_queue, rate_limit):
+        super().__init__(log_queue)
+        self.rate_limit = rate_limit
+
+    def emit(self, record):
+        notice = self.rate_limit.check(record)
+        if notice is None:
+            return
+        try:
+            prepared = self.prepare(record)
+            if notice:
+                prepared.msg = f"{prepared.msg}{notice}"
+            self.enqueue(prepared)
+        except Exception:
+            self.handleError(record)
+
+
+class _LoggingState:
+    def __init__(self):
+        self.logger = None
+        self.handlers = []
+        self.queue_handler = None
+        self.rate_limit = None
+        self.listener = None
+
+
+_state = _LoggingState()
+_state_lock = threading.Lock()
+
+
+def setup_logging(logger, frame_detail=False, burst=5, interval=60.0):
+    """
+    Moves the handlers of logger behind a rate limited queue drained by one listener thread.
+    The level is INFO, or DEBUG (per-frame messages) with frame_detail.
+    """
+    level = logging.DEBUG if frame_detail else logging.INFO
+    with _state_lock:
+        if _state.listener is None:
+            _state.logger = logger
+            _state.handlers = list(logger.handlers)
+            for handler in _state.handlers:
+                logger.removeHandler(handler)
+            log_queue = queue.SimpleQueue()
+            _state.rate_limit = RateLimitFilter(burst=burst, interval=interval)
+            _state.queue_handler = RateLimitedQueueHandler(log_queue, _state.rate_limit)
+            logger.addHandler(_state.queue_handler)
+            _state.listener = logging.handlers.QueueListener(log_queue, *_state.handlers, respect_handler_level=True)
+            _state.listener.start()
+            atexit.register(stop_logging)
+
+        logger.setLevel(level)
+        if frame_detail:
+            for handler in _state.handlers:
+                handler.setLevel(logging.DEBUG)
+    return _state.listener
+
+
+def stop_logging():
+    """
+    Reports suppressed warnings, flushes the queue and gives the handlers back to the logger.
+    """
+    with _state_lock:
+        if _state.listener is None:
+            return
+        for template, count in _state.rate_limit.drain():
+            _state.logger.warning(f"{count} more messages like '{template}' were suppressed")
+        _state.listener.stop()
+        _state.logger.removeHandler(_state.queue_handler)
+        for handler in _state.handlers:
+            _state.logger.addHandler(handler)
+        _state.listener = None
+
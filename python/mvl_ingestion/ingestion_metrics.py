@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import socket
+import datetime
+import threading
+from contextlib import contextmanager
+
+from mvl_ingestion.ingestion_utils import logger
+
+PROMETHEUS_PREFIX = "mvl_ingest"
+# Labels left out of the textfile output: one series per sequence would grow without bound.
+PROMETHEUS_DROPPED_LABELS = ("sequence",)
+
+
+def get_report_path(destination, project, run_id):
+    """
+    Returns the default run report location under the project root.
+    """
+    return os.path.join(destination, project, ".mvl_reports", f"ingest_{run_id}.json")
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    pairs = []
+    for name, value in key:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class RunMetrics:
+    """
+    Thread-safe collector for phase timings and counters of an ingest run.
+    Spans with the same name and labels are aggregated (count, total, min, max).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.profiler = None  # optional Profiler, see ingestion_profiler
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.run_id = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.started = time.time()
+            self.spans = {}
+            self.counters = {}
+            self.info = {}
+
+    @contextmanager
+    def span(self, name, **labels):
+        profiler = self.profiler
+        if profiler:
+            profiler.enter(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+            if profiler:
+                profiler.exit(name)
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            stats = self.spans.get(key)
+            if stats is None:
+                self.spans[key] = {"count": 1, "total": seconds, "min": seconds, "max": seconds}
+            else:
+                stats["count"] += 1
+                stats["total"] += seconds
+                stats["min"] = min(stats["min"], seconds)
+                stats["max"] = max(stats["max"], seconds)
+
+    def incr(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self):
+        """
+        Returns a picklable copy of the raw spans and counters, see merge().
+        """
+        with self._lock:
+            return {
+                "spans": {key: dict(stats) for key, stats in self.spans.items()},
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, snapshot):
+        """
+        Adds spans and counters recorded elsewhere, e.g. in a worker process.
+        """
+        with self._lock:
+            for key, other in snapshot.get("spans", {}).items():
+                stats = self.spans.get(key)
+                if stats is None:
+                    self.spans[key] = dict(other)
+                else:
+                    stats["count"] += other["count"]
+                    stats["total"] += other["total"]
+                    stats["min"] = min(stats["min"], other["min"])
+                    stats["max"] = max(stats["max"], other["max"])
+            for key, value in snapshot.get("counters", {}).items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_info(self, **info):
+        with self._lock:
+            self.info.update(info)
+
+    def to_dict(self):
+        with self._lock:
+            spans = [
+                dict(name=name, labels=dict(labels), **{k: round(v, 6) if isinstance(v, float) else v for k, v in stats.items()})
+                for (name, labels), stats in sorted(self.spans.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            return {
+                "run_id": self.run_id,
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "started": datetime.datetime.fromtimestamp(self.started).isoformat(),
+                "elapsed": round(time.time() - self.started, 6),
+                "info": dict(self.info),
+                "spans": spans,
+                "counters": counters,
+            }
+
+    def write_json(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        logger.info(f"Run report written to {path}")
+
+    def write_prometheus(self, path):
+        """
+        Writes the metrics in Prometheus textfile collector format, as gauges of the
+        last run summed over sequences.
+        """
+        def without_sequence(labels):
+            return tuple(item for item in labels if item[0] not in PROMETHEUS_DROPPED_LABELS)
+
+        lines = []
+        with self._lock:
+            seconds = {}
+            calls = {}
+            for (name, labels), stats in self.spans.items():
+                key = (("phase", name),) + without_sequence(labels)
+                seconds[key] = seconds.get(key, 0.0) + stats["total"]
+                calls[key] = calls.get(key, 0) + stats["count"]
+            counters = {}
+            for (name, labels), value in self.counters.items():
+                key = (name, without_sequence(labels))
+                counters[key] = counters.get(key, 0) + value
+
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_last_run_phase_seconds Time spent per ingest phase in the last run.")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_last_run_phase_seconds gauge")
+            for key, value in sorted(seconds.items()):
+                lines.append(f"{PROMETHEUS_PREFIX}_last_run_phase_seconds{_format_labels(key)} {value:.6f}")
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_last_run_phase_calls Number of timed calls per ingest phase in the last run.")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_last_run_phase_calls gauge")
+            for key, value in sorted(calls.items()):
+                lines.append(f"{PROMETHEUS_PREFIX}_last_run_phase_calls{_format_labels(key)} {value}")
+            for name in sorted({name for name, _ in counters}):
+                metric = f"{PROMETHEUS_PREFIX}_last_run_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                for (counter_name, labels), value in sorted(counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{metric}{_format_labels(labels)} {value}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge")
+            lines.append(f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds {self.started:.0f}")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        logger.info(f"Prometheus metrics written to {path}")
+
+
+metrics = RunMetrics()
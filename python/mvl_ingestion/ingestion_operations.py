@@ -1,7 +1,21 @@
 import os
+import re
+import time
 import shutil
+import threading
 import subprocess
 from mvl_ingestion.ingestion_utils import logger
+from mvl_ingestion.ingestion_metrics import metrics
+from mvl_ingestion.exr_header_reader import read_exr_header
+from mvl_ingestion.ingestion_priority import run_child
+
+# EXR compressions that keep pixel data bit-exact (pxr24 is lossy for float channels).
+LOSSLESS_COMPRESSIONS = ("none", "rle", "zips", "zip", "piz")
+RECOMPRESSIONS = LOSSLESS_COMPRESSIONS + ("pxr24", "b44", "b44a", "dwaa", "dwab")
+# Frame numbers of plates, for sampling the frames whose pixels are verified.
+FRAME_NUMBER_REGEX = re.compile(r"(\d+)\.exr$", re.IGNORECASE)
+# Header attributes a recompression may change; everything else must come out byte for byte.
+RECOMPRESSION_ATTRIBUTES = ("compression", "dwaCompressionLevel", "zipCompressionLevel", "chunkCount")
 
 
 class FileOperation:
@@ -10,21 +24,210 @@ class FileOperation:
         raise NotImplementedError
 
 class CopyFileOperation(FileOperation):
+    def __init__(self, store=None):
+        self.store = store  # optional BlobStore for content-addressed dedup
+
     def execute(self, src, dst, overwrite=False):
+        """
+        Copies one frame. Per-frame messages are DEBUG; the builder logs a summary.
+
+        Returns:
+            str: 'skipped', 'deduplicated', 'copied' or 'size_mismatch'.
+        """
         if os.path.exists(dst) and os.path.getsize(dst) > 0 and os.path.getsize(src) > 0 and not overwrite:
-            logger.info(f"Skipped copy (already exists): {os.path.basename(dst)}")
-            return
+            logger.debug(f"Skipped copy (already exists): {os.path.basename(dst)}")
+            metrics.incr("frames_skipped")
+            return "skipped"
         os.makedirs(os.path.dirname(dst), exist_ok=True)
-        shutil.copy2(src, dst)
+        outcome = "copied"
+        if self.store:
+            digest, is_new = self.store.put(src)
+            method = self.store.materialize(digest, dst)
+            if not is_new:
+                outcome = "deduplicated"
+                metrics.incr("frames_deduplicated")
+                logger.debug(f"Deduplicated {os.path.basename(src)} ({method} to blob {digest[:12]})")
+        else:
+            if os.path.exists(dst) and os.stat(dst).st_nlink > 1:
+                # Break the link so the copy does not write into a shared blob.
+                os.remove(dst)
+            shutil.copy2(src, dst)
 
         # Validate file sizes
         src_size = os.path.getsize(src)
         dst_size = os.path.getsize(dst)
+        metrics.incr("frames_copied")
+        metrics.incr("bytes_copied", dst_size)
         if src_size == dst_size:
-            logger.info(f"Copied file: {os.path.basename(src)} to {dst} (size validated)")
+            logger.debug(f"Copied file: {os.path.basename(src)} to {dst} (size validated)")
+            return outcome
+        logger.warning(f"Size mismatch for {src} -> {dst}: src={src_size}, dst={dst_size}")
+        return "size_mismatch"
+
+
+def parse_compression(value):
+    """
+    Validates an EXR compression such as 'zip', 'piz' or 'dwaa:45' (with a DWA level).
+
+    Returns:
+        tuple: (compression name, oiiotool --compression argument)
+    """
+    name, _, level = str(value).lower().partition(":")
+    if name not in RECOMPRESSIONS:
+        raise ValueError(f"Unsupported EXR compression: {value}. Use one of {', '.join(RECOMPRESSIONS)}")
+    if level and not level.isdigit():
+        raise ValueError(f"Compression level must be a number: {value}")
+    return name, f"{name}:{level}" if level else name
+
+
+def decode_frame(path):
+    """
+    Decodes every pixel of an image with `iinfo --hash`.
+
+    Returns:
+        tuple: (seconds, SHA-1 of the pixel data)
+    """
+    start = time.perf_counter()
+    metrics.incr("subprocess_spawns", tool="iinfo")
+    result = subprocess.run(["iinfo", "--hash", str(path)], check=True, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    digest = next((line.split(":", 1)[1].strip() for line in result.stdout.splitlines() if "SHA-1" in line), None)
+    return seconds, digest
+
+
+class RecompressFileOperation(CopyFileOperation):
+    """
+    Copies plates rewritten to another EXR compression with oiiotool. Frames whose header
+    (or, when sampled, pixels) changed are copied unchanged instead.
+    """
+    def __init__(self, compression, threads=0, store=None, verify_every=10):
+        super().__init__(store=store)
+        self.compression, self.argument = parse_compression(compression)
+        self.threads = threads
+        self.verify_every = verify_every
+        self._sampled = set()
+        self._lock = threading.Lock()
+
+    def sample(self, paths):
+        """
+        Verifies the pixels of these source frames, e.g. the first and last of a sequence.
+        """
+        with self._lock:
+            self._sampled.update(os.path.normpath(path) for path in paths)
+
+    def _verifies(self, src):
+        if self.compression not in LOSSLESS_COMPRESSIONS or self.verify_every <= 0:
+            return False
+        with self._lock:
+            if os.path.normpath(src) in self._sampled:
+                return True
+        match = FRAME_NUMBER_REGEX.search(os.path.basename(src))
+        return match is None or int(match.group(1)) % self.verify_every == 0
+
+    def execute(self, src, dst, overwrite=False):
+        """
+        Returns:
+            str: 'recompressed', or an outcome of CopyFileOperation.execute.
+        """
+        if os.path.exists(dst) and os.path.getsize(dst) > 0 and os.path.getsize(src) > 0 and not overwrite:
+            logger.debug(f"Skipped copy (already exists): {os.path.basename(dst)}")
+            metrics.incr("frames_skipped")
+            return "skipped"
+        try:
+            source = read_exr_header(src)
+        except ValueError:
+            return super().execute(src, dst, overwrite=True)
+        if source["compression"] == self.compression and ":" not in self.argument:
+            return super().execute(src, dst, overwrite=True)
+        if source["multipart"] or source["deep"] or source["tiled"]:
+            # Only the first part is checked here; such files are rare in plates.
+            metrics.incr("frames_recompress_unsupported")
+            return super().execute(src, dst, overwrite=True)
+
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        # Hidden, so a crash does not leave something that looks like a plate.
+        tmp_path = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.{os.getpid()}.tmp.exr")
+        command = ["oiiotool", "--threads", str(self.threads), "-a", str(src), "--nosoftwareattrib",
+                   "--compression", self.argument, "-o", tmp_path]
+        try:
+            metrics.incr("subprocess_spawns", tool="oiiotool")
+            run_child(command, check=True, capture_output=True)
+            problem = self._compare_headers(source, read_exr_header(tmp_path))
+            if not problem and self._verifies(src):
+                problem = self._compare_pixels(src, tmp_path)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            problem = str(e)
+        if problem:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            metrics.incr("frames_recompress_failed")
+            logger.warning(f"Recompression of {os.path.basename(src)} failed ({problem}), copying it unchanged")
+            return super().execute(src, dst, overwrite=True)
+
+        shutil.copystat(src, tmp_path)
+        if self.store:
+            digest, _ = self.store.put(tmp_path)
+            os.remove(tmp_path)
+            self.store.materialize(digest, dst)
         else:
-            logger.warning(f"Size mismatch for {src} -> {dst}: src={src_size}, dst={dst_size}")
-        
+            if os.path.exists(dst) and os.stat(dst).st_nlink > 1:
+                os.remove(dst)
+            os.replace(tmp_path, dst)
+        src_size = os.path.getsize(src)
+        dst_size = os.path.getsize(dst)
+        metrics.incr("frames_copied")
+        metrics.incr("frames_recompressed", compression=self.compression)
+        metrics.incr("bytes_copied", dst_size)
+        metrics.incr("bytes_recompress_source", src_size, compression=self.compression)
+        metrics.incr("bytes_recompress_output", dst_size, compression=self.compression)
+        logger.debug(f"Recompressed {os.path.basename(src)} from {source['compression']} to {self.compression}: "
+                     f"{src_size} -> {dst_size} bytes")
+        return "recompressed"
+
+    def _compare_headers(self, source, output):
+        for key in ("multipart", "tiled", "deep", "data_window", "display_window", "channels", "line_order"):
+            if source[key] != output[key]:
+                return f"{key} changed"
+        if output["compression"] != self.compression:
+            return f"written as {output['compression']}"
+        source_attributes, output_attributes = source["raw_attributes"], output["raw_attributes"]
+        for name in sorted(set(source_attributes) | set(output_attributes)):
+            if name not in RECOMPRESSION_ATTRIBUTES and source_attributes.get(name) != output_attributes.get(name):
+                return f"attribute {name} {'changed' if name in source_attributes and name in output_attributes else 'missing or added'}"
+        return None
+
+    def _compare_pixels(self, src, output):
+        source_seconds, source_hash = decode_frame(src)
+        output_seconds, output_hash = decode_frame(output)
+        metrics.observe("decode_source", source_seconds, compression=self.compression)
+        metrics.observe("decode_recompressed", output_seconds, compression=self.compression)
+        if source_hash is None or source_hash != output_hash:
+            metrics.incr("recompress_pixel_mismatch")
+            return "pixels differ"
+        metrics.incr("frames_recompress_verified", compression=self.compression)
+        return None
+
+    def compare(self, src, dst, sequence=None):
+        """
+        Decodes a source frame and its recompressed copy, for the run report.
+        Frames sampled for verification were already measured then.
+
+        Returns:
+            dict: 'source_seconds' and 'output_seconds', or None if the frames could
+                  not be decoded or were measured while being verified.
+        """
+        if self._verifies(src):
+            return None
+        try:
+            source_seconds, _ = decode_frame(src)
+            output_seconds, _ = decode_frame(dst)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"Decode comparison of {os.path.basename(src)} failed: {e}")
+            return None
+        metrics.observe("decode_source", source_seconds, sequence=sequence, compression=self.compression)
+        metrics.observe("decode_recompressed", output_seconds, sequence=sequence, compression=self.compression)
+        return {"source_seconds": source_seconds, "output_seconds": output_seconds}
+
 
 class ProxyGenerationOperation(FileOperation):
     def execute(self, input_path, output_path, resolution):
@@ -35,9 +238,14 @@ class ProxyGenerationOperation(FileOperation):
             "-o", str(output_path)
         ]
         try:
-            subprocess.run(command, check=True, capture_output=True)
+            metrics.incr("subprocess_spawns", tool="oiiotool")
+            run_child(command, check=True, capture_output=True)
+            metrics.incr("proxies_generated")
+            return True
         except Exception as e:
-            logger.info(f"Proxy generation failed: {e}")
+            metrics.incr("proxies_failed")
+            logger.warning(f"Proxy generation failed: {e}")
+            return False
 
 class MovGenerationOperation(FileOperation):
     def execute(self, input_pattern, output_mov, metadata, fps=24):
@@ -52,6 +260,7 @@ class MovGenerationOperation(FileOperation):
                 'bottomleft': os.path.basename(input_pattern).split('_')[-1] # version
             }
             create_movie_from_sequence(data)
+            return True
         except Exception as e:
             logger.warning(f"mvl_make_dailies failed: {e}")
             logger.info("Falling back to ffmpeg...")
@@ -65,7 +274,10 @@ class MovGenerationOperation(FileOperation):
                 output_mov
             ]
             try:
-                subprocess.run(ffmpeg_cmd, check=True)
+                metrics.incr("subprocess_spawns", tool="ffmpeg")
+                run_child(ffmpeg_cmd, check=True)
                 logger.info(f"Successfully generated MOV using ffmpeg: {output_mov}")
+                return True
             except subprocess.CalledProcessError as ffmpeg_error:
-                logger.error(f"ffmpeg failed to generate movie: {ffmpeg_error}")
\ No newline at end of file
+                logger.error(f"ffmpeg failed to generate movie: {ffmpeg_error}")
+                return False
\ No newline at end of file
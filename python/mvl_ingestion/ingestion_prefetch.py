@@ -0,0 +1,114 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from mvl_ingestion.ingestion_utils import logger
+from mvl_ingestion.ingestion_metrics import metrics
+
+PREFETCH_MODES = ("auto", "fadvise", "read")
+READ_CHUNK = 1024 * 1024
+
+
+class Prefetcher:
+    """
+    Warms the OS page cache (posix_fadvise, or reads into a fixed buffer) at most `ahead`
+    frames and `budget_mb` megabytes in front of the frames handed to consumers.
+    """
+    def __init__(self, ahead=8, budget_mb=512, workers=4, mode="auto"):
+        if mode not in PREFETCH_MODES:
+            raise ValueError(f"Unsupported prefetch mode: {mode}. Use one of {', '.join(PREFETCH_MODES)}")
+        if mode == "auto":
+            mode = "fadvise" if hasattr(os, "posix_fadvise") else "read"
+        self.ahead = ahead
+        self.budget = budget_mb * 1024 * 1024
+        self.workers = max(1, workers)
+        self.mode = mode
+        self._cond = threading.Condition()
+        self._paths = []
+        self._sizes = []
+        self._next = 0
+        self._started = 0
+        self._stop = False
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        """
+        Returns a Prefetcher configured by --prefetch/--prefetch_mb, or None if disabled.
+        """
+        ahead = (metadata or {}).get('prefetch', 8)
+        if not ahead:
+            return None
+        return cls(ahead=ahead, budget_mb=(metadata or {}).get('prefetch_mb') or 512)
+
+    def _outstanding(self):
+        # Bytes warmed but not yet picked up; consumers start roughly in order.
+        return sum(self._sizes[self._started:self._next])
+
+    def started(self, *_):
+        """
+        Marks one frame as handed to a consumer; usable as StageExecutor.run's on_start.
+        """
+        with self._cond:
+            self._started += 1
+            self._next = max(self._next, self._started)
+            self._cond.notify_all()
+
+    def _worker(self, buffer):
+        while True:
+            with self._cond:
+                while not self._stop and self._next < len(self._paths) and (
+                        self._next >= self._started + self.ahead or self._outstanding() >= self.budget):
+                    self._cond.wait()
+                if self._stop or self._next >= len(self._paths):
+                    return
+                index = self._next
+                self._next += 1
+            try:
+                self._sizes[index] = self._warm(self._paths[index], buffer)
+                metrics.incr("prefetch_frames")
+                metrics.incr("prefetch_bytes", self._sizes[index])
+            except OSError as e:
+                # The consumer reports the real error, if any.
+                logger.debug(f"Prefetch of {self._paths[index]} failed: {e}")
+
+    def _warm(self, path, buffer):
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            size = os.fstat(fd).st_size
+            if self.mode == "fadvise":
+                os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+            else:
+                with open(fd, "rb", buffering=0, closefd=False) as f:
+                    while f.readinto(buffer):
+                        pass
+            return size
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def run(self, paths):
+        """
+        Prefetches paths, in order, while the block runs. Call started() as each
+        frame is handed to a consumer.
+        """
+        with self._cond:
+            self._paths = list(paths)
+            self._sizes = [0] * len(self._paths)
+            self._next = 0
+            self._started = 0
+            self._stop = False
+        threads = [
+            threading.Thread(target=self._worker, args=(bytearray(READ_CHUNK) if self.mode == "read" else None,),
+                             name=f"mvl-prefetch-{i}", daemon=True)
+            for i in range(min(self.workers, len(self._paths)))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._stop = True
+                self._cond.notify_all()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,134 @@
+import os
+import sys
+import shutil
+import threading
+import subprocess
+import multiprocessing
+
+from mvl_ingestion.ingestion_utils import logger
+from mvl_ingestion.ingestion_metrics import metrics
+
+# Niceness given to the child processes of work that is outranked.
+BACKGROUND_NICE = 15
+# How often a running child checks whether more urgent work has arrived.
+CHILD_POLL = 1.0
+NO_PRIORITY = -(2 ** 31)
+
+
+class PriorityLanes:
+    """
+    Priorities of the work queued or running in this run. The highest one is kept in
+    shared memory, so process pool workers (see attach) can tell whether they are outranked.
+    """
+    def __init__(self):
+        # Only this process writes it (under _lock); workers only read, so no
+        # SemLock, which would tie the value to one multiprocessing context.
+        self._top = multiprocessing.RawValue("i", NO_PRIORITY)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def state(self):
+        return self._top
+
+    def attach(self, state):
+        """
+        Uses the shared top priority of the parent; called in pool workers.
+        """
+        self._top = state
+        self._active = {}
+
+    def enter(self, priority):
+        with self._lock:
+            self._active[priority] = self._active.get(priority, 0) + 1
+            self._top.value = max(self._active)
+
+    def leave(self, priority):
+        with self._lock:
+            self._active[priority] -= 1
+            if not self._active[priority]:
+                del self._active[priority]
+            self._top.value = max(self._active) if self._active else NO_PRIORITY
+
+    def top(self):
+        return self._top.value
+
+    @property
+    def current(self):
+        """
+        Priority of the task running in this thread, or None outside of stage tasks.
+        """
+        return getattr(self._local, "priority", None)
+
+    @current.setter
+    def current(self, priority):
+        self._local.priority = priority
+
+    def outranked(self, priority=None):
+        priority = self.current if priority is None else priority
+        return priority is not None and self.top() > priority
+
+
+lanes = PriorityLanes()
+
+
+def _threads(pid):
+    """
+    Thread ids of a process on Linux, where nice and ionice apply per thread;
+    just the pid elsewhere.
+    """
+    try:
+        return [int(tid) for tid in os.listdir(f"/proc/{pid}/task")] or [pid]
+    except (OSError, ValueError):
+        return [pid]
+
+
+def deprioritize(pid):
+    """
+    Lowers the CPU and I/O priority of every thread of a child process until it exits.
+    """
+    if sys.platform == "win32":
+        import ctypes
+        PROCESS_SET_INFORMATION = 0x0200
+        IDLE_PRIORITY_CLASS = 0x40
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_SET_INFORMATION, False, pid)
+        if handle:
+            kernel32.SetPriorityClass(handle, IDLE_PRIORITY_CLASS)
+            kernel32.CloseHandle(handle)
+        return
+    threads = _threads(pid)
+    for tid in threads:
+        try:
+            os.setpriority(os.PRIO_PROCESS, tid, BACKGROUND_NICE)
+        except ProcessLookupError:
+            continue  # the thread exited meanwhile
+    if shutil.which("ionice"):
+        subprocess.run(["ionice", "-c", "3", "-p", *map(str, threads)], capture_output=True)
+
+
+def run_child(command, check=False, capture_output=False, text=False):
+    """
+    subprocess.run for the children of stage tasks (oiiotool, ffmpeg), deprioritized
+    as soon as a task of higher priority than the calling one is queued or running.
+    """
+    stdout = stderr = subprocess.PIPE if capture_output else None
+    with subprocess.Popen(command, stdout=stdout, stderr=stderr, text=text) as process:
+        lowered = False
+        while True:
+            if not lowered and lanes.outranked():
+                lowered = True
+                try:
+                    deprioritize(process.pid)
+                    metrics.incr("children_deprioritized", tool=os.path.basename(str(command[0])))
+                except OSError as e:
+                    logger.debug(f"Could not deprioritize {command[0]}: {e}")
+            try:
+                out, err = process.communicate(timeout=CHILD_POLL)
+                break
+            except subprocess.TimeoutExpired:
+                continue
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, out, err)
+    return subprocess.CompletedProcess(command, process.returncode, out, err)
@@ -9,28 +9,55 @@ import subprocess
 import concurrent.futures
 import logging
 import argparse
+import functools
+import fnmatch
+from contextlib import contextmanager
 
 
 from mvl_core_pipeline.fig import Fig, YAMLConfigDriver
 from mvl_core_pipeline.context import Context
 
-from mvl_ingestion.ingestion_operations import ProxyGenerationOperation, CopyFileOperation, MovGenerationOperation
+from mvl_ingestion.ingestion_operations import ProxyGenerationOperation, CopyFileOperation, MovGenerationOperation, RecompressFileOperation, LOSSLESS_COMPRESSIONS
+from mvl_ingestion.ingestion_store import BlobStore, get_store_root
+from mvl_ingestion.ingestion_metrics import metrics, get_report_path
+from mvl_ingestion.ingestion_profiler import Profiler, get_profile_dir
+from mvl_ingestion.ingestion_executor import StageExecutors, parse_executor_overrides
+from mvl_ingestion.ingestion_autotune import get_tuning_key
+from mvl_ingestion.ingestion_scratch import ScratchSpace
+from mvl_ingestion.exr_header_reader import inspect_sequence
+from mvl_ingestion.ingestion_egress import EgressPackager, find_published_versions, collect_files
+from mvl_ingestion.ingestion_watch import DeliveryWatcher
+from mvl_ingestion.ingestion_coordinator import create_coordinator, build_tasks, DEFAULT_LEASE
 
 from mvl_ingestion.ingestion_utils import check_missing_frames
 from mvl_ingestion.ingestion_builder import SequenceBuilder
 from mvl_ingestion.ingestion_utils import get_files_and_sequences
-from mvl_ingestion.ingestion_utils import logger
+from mvl_ingestion.ingestion_utils import logger, reset_version_cache, get_path_config_template
 
 @unique
 class INGESTIONPROCESS(Enum):
     INGEST = 1
     EGRESS = 2
+
+class PreflightError(Exception):
+	"""
+	Raised when the pre-flight check finds problems and --no-force is set.
+	"""
+
+@functools.lru_cache(maxsize=None)
+def resolve_context():
+	"""
+	Resolves the pipeline context once per process, so batch jobs share it.
+	"""
+	try:
+		return Context.from_environment()
+	except ValueError as e:
+		logger.warning(f"{e} — Falling back to CLI arguments.")
+		return None
 	
 class MVLIngestionProcessor():
 
 	def __init__(self, args):
-		self.data = vars(args)
-		
 		self.copy_op = CopyFileOperation()
 		self.proxy_op = ProxyGenerationOperation()
 		self.mov_op = MovGenerationOperation()
@@ -39,12 +66,10 @@ class MVLIngestionProcessor():
 		if isinstance(args, dict):
 			args = argparse.Namespace(**args)
 		self.args = args
+		self.data = vars(args)
 
-		try:
-			self.ctx = Context.from_environment()
-		except ValueError as e:
-			logger.warning(f"{e} — Falling back to CLI arguments.")
-			self.ctx = None  # Or a dummy object if needed
+		self.ctx = resolve_context()
+		if self.ctx is None:
 			# Check if output path is provided; if not, exit
 			if not getattr(args, "output", None):
 				logger.error("Context resolution failed and --output was not provided. Cannot continue.")
@@ -83,6 +108,20 @@ class MVLIngestionProcessor():
 		self.resolved_proxy_ext= args.proxy
 		self.resolved_resolution= args.resolution
 		self.is_force_ingestion= args.force
+		self.process = INGESTIONPROCESS.EGRESS if getattr(args, "egress", False) else INGESTIONPROCESS.INGEST
+
+		self.store = None
+		if getattr(args, "dedup", False):
+			store_root = get_store_root(self.resolved_out_dir, self.resolved_project)
+			self.store = BlobStore(store_root, link_mode=getattr(args, "dedup_link", "auto"))
+			self.copy_op = CopyFileOperation(store=self.store)
+			logger.info(f"Dedup blob store enabled at {store_root}")
+
+		if getattr(args, "recompress", None):
+			self.copy_op = RecompressFileOperation(args.recompress, threads=getattr(args, "recompress_threads", 0) or 0, store=self.store,
+				verify_every=getattr(args, "recompress_verify", 10))
+			if self.copy_op.compression not in LOSSLESS_COMPRESSIONS:
+				logger.warning(f"{self.copy_op.compression} is lossy: recompressed plates will not match the delivered pixels.")
 
 	def _construct_source_path(self, project, vendor, input_date):
 		from datetime import datetime
@@ -110,6 +149,41 @@ class MVLIngestionProcessor():
 
 		return constructed_path
 	
+	def _construct_egress_path(self, project, vendor, input_date):
+		"""
+		Construct the vendor delivery folder from the egress_workspace template
+		Args:
+			project(str): project name
+			vendor(str): vendor the package is sent to
+			input_date(str): delivery date in YYYY-MM-DD format, today if empty
+		"""
+		from datetime import datetime
+
+		try:
+			date_obj = datetime.strptime(input_date, "%Y-%m-%d") if input_date else datetime.now()
+		except ValueError:
+			raise ValueError("input_date must be in YYYY-MM-DD format.")
+
+		missing = [flag for flag, value in (("--scene", self.resolved_scene), ("--shot", self.resolved_shot),
+			("--resolution", self.resolved_resolution)) if not value]
+		if missing:
+			raise ValueError(f"The egress folder needs {', '.join(missing)}; set them or pass --egress_output.")
+
+		tokens = {
+			'project_root': f'j:/{project}',
+			'vendor': vendor,
+			'date': date_obj.strftime("%Y%m%d"),
+			'scene': self.resolved_scene,
+			'shot': f"{self.resolved_scene}_{self.resolved_shot}",
+			'resolution': self.resolved_resolution,
+		}
+
+		constructed_path = get_path_config_template()['egress_workspace'].format(**tokens)
+		os.makedirs(constructed_path, exist_ok=True)
+		logger.info(f"egress path constructed : {constructed_path}")
+
+		return constructed_path
+
 	def _construct_out_path(self, project,scene, shot):
 		"""
 		Construct the destination path
@@ -151,48 +225,255 @@ class MVLIngestionProcessor():
 			return 
     
 	def process_from_mvl(self):
-		return NotImplementedError("Not implement yet!")
+		"""
+		Packages the published versions found under the source for a vendor, as a
+		folder, tar, tar.gz or zip in the from_mvl workspace, with a manifest.
+		"""
+		products = [p.strip() for p in (getattr(self.args, "egress_products", None) or "").split(",") if p.strip()]
+		versions = find_published_versions(
+			self.resolved_source, products=products, version=getattr(self.args, "egress_version", None) or None)
+		if not versions:
+			logger.error(f"No published versions found in {self.resolved_source}")
+			return None
+
+		files = collect_files(versions, self.resolved_source)
+		logger.info(f"Packaging {len(files)} files from {len(versions)} versions: {', '.join(versions)}")
+
+		out_dir = getattr(self.args, "egress_output", None) or self._construct_egress_path(
+			project=self.resolved_project,
+			vendor=self.resolved_vendor,
+			input_date=self.resolved_date,
+		)
+		name = "_".join(filter(None, [self.resolved_project, self.resolved_scene, self.resolved_shot])) \
+			or os.path.basename(os.path.normpath(self.resolved_source))
+		packager = EgressPackager(fmt=getattr(self.args, "egress_format", None) or "tgz")
+		return packager.package(files, packager.archive_path(out_dir, name))
 	
 	def execute(self):
 		"""
 		Processes folders, gets all files and file sequences and ingest.
 		"""
+		logger.info(f"source : {self.resolved_source}")
+		with self.instrumented():
+			self._execute()
+
+	@contextmanager
+	def instrumented(self):
+		"""
+		Resets the run state, optionally profiles, and writes the run report when the block exits.
+		"""
+		metrics.reset()
+		reset_version_cache()
+		metrics.set_info(source=self.resolved_source, output=self.resolved_out_dir, project=self.resolved_project)
+		self.report_path = getattr(self.args, "report", None) or get_report_path(
+			self.resolved_out_dir, self.resolved_project, metrics.run_id)
+
+		profile_mode = getattr(self.args, "profile", None) or "off"
+		if profile_mode != "off":
+			metrics.profiler = Profiler(
+				profile_mode,
+				interval=getattr(self.args, "profile_interval", None) or 0.005,
+				out_dir=get_profile_dir(self.report_path)
+			)
+			metrics.profiler.start()
+
+		try:
+			with metrics.span("run"):
+				yield
+		finally:
+			if metrics.profiler:
+				metrics.profiler.dump()
+				metrics.profiler = None
+			self.write_report()
+
+	def _execute(self):
+		if self.process == INGESTIONPROCESS.EGRESS:
+			self.process_from_mvl()
+			return
+		if getattr(self.args, "watch", False):
+			self.watch()
+			return
+
+		all_files, all_sequences = self.discover()
+		if getattr(self.args, "queue", None):
+			self.enqueue(all_files, all_sequences)
+			return
+
+		# Run file and sequence copy tasks in parallel
+		executors = self.create_executors()
+		scratch = self.create_scratch()
+		try:
+			with executors, concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
+				futures = self.submit(executor, executors, all_files, all_sequences, scratch)
+				# Wait for all to finish
+				for future in concurrent.futures.as_completed(futures):
+					future.result()
+		finally:
+			if scratch:
+				scratch.close()
+
+		if self.store and getattr(self.args, "dedup_gc", False):
+			self.store.gc()
+
+	def create_executors(self):
+		"""
+		Creates the stage executors from --executors; with --autotune, their concurrency is tuned
+		and remembered for this source/destination pair.
+		"""
+		tuning_key = None
+		if getattr(self.args, "autotune", False):
+			tuning_key = get_tuning_key(self.resolved_source, self.resolved_out_dir)
+		return StageExecutors(parse_executor_overrides(getattr(self.args, "executors", None)), tuning_key=tuning_key)
+
+	def create_scratch(self):
+		"""
+		Returns the ScratchSpace given by --scratch, or None to copy straight to the destination.
+		"""
+		if not getattr(self.args, "scratch", None):
+			return None
+		return ScratchSpace(self.args.scratch, budget_gb=getattr(self.args, "scratch_gb", None) or 0)
+
+	def discover(self):
+		"""
+		Scans the source for files and sequences and runs the pre-flight check.
+
+		Returns:
+			tuple: (list of file paths, list of sequence dicts)
+		"""
 		file_tasks =  []
 		sequence_tasks = []
 
-		logger.info(f"source : {self.resolved_source}")
-
 		if os.path.isfile(self.resolved_source):
-			file_tasks[self.resolved_source]
+			file_tasks.append([self.resolved_source])
 		elif os.path.isdir(self.resolved_source):
-			files, sequences = get_files_and_sequences(self.resolved_source, scene=self.resolved_scene, shot=self.resolved_shot)
+			with metrics.span("scan"):
+				files, sequences = get_files_and_sequences(self.resolved_source, scene=self.resolved_scene, shot=self.resolved_shot)
 			if files:
 				file_tasks.append(files)
 			if sequences:
 				sequence_tasks.append(sequences)
+				if getattr(self.args, "preflight", True):
+					self.preflight(sequences)
 
 		#logger.info(f"files : {file_tasks}, ###########\n sequence: {sequence_tasks}")
 
-		# Run file and sequence copy tasks in parallel
-		with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
-			# File copy tasks
-			all_files = [file_path for files_list in file_tasks for file_path in files_list]
-			file_futures = [executor.submit(self.copy_file, file_path) for file_path in all_files]
-			all_sequences = [seq for seq_list in sequence_tasks for seq in seq_list]
-			# Sequence copy tasks
-			sequence_futures = [
-				executor.submit(
-					SequenceBuilder(
-						sequence=seq,
-						copy_op=self.copy_op,
-						proxy_op=self.proxy_op,
-						mov_op=self.mov_op
-					).build, False, self.data
-				) for seq in all_sequences
-			]
-			# Wait for all to finish
-			for future in concurrent.futures.as_completed(file_futures + sequence_futures):
-				future.result()
+		all_files = [file_path for files_list in file_tasks for file_path in files_list]
+		all_sequences = [seq for seq_list in sequence_tasks for seq in seq_list]
+		self.prioritize(all_sequences)
+		return all_files, all_sequences
+
+	def prioritize(self, sequences):
+		"""
+		Gives sequences the priority of the first matching fnmatch pattern in sequence_priorities.
+		"""
+		patterns = getattr(self.args, "sequence_priorities", None) or {}
+		for seq in sequences:
+			for pattern, priority in patterns.items():
+				if fnmatch.fnmatchcase(seq["base_name"], str(pattern)):
+					seq["priority"] = int(priority)
+					break
+
+	def submit(self, executor, executors, files, sequences, scratch=None):
+		"""
+		Submits the file copies and sequence builds to a pool, which may be shared with other jobs.
+		With a scratch space, sequences are staged there and pushed once their derivatives are built.
+
+		Returns:
+			list: The futures, files first.
+		"""
+		# File copy tasks
+		file_futures = [executor.submit(self.copy_file, file_path) for file_path in files]
+		# Sequence copy tasks, the most urgent first
+		job_priority = int(getattr(self.args, "priority", 0) or 0)
+		sequence_futures = [
+			executor.submit(
+				SequenceBuilder(
+					sequence=seq,
+					copy_op=self.copy_op,
+					proxy_op=self.proxy_op,
+					mov_op=self.mov_op,
+					executors=executors,
+					scratch=scratch
+				).build, False, self.data
+			) for seq in sorted(sequences, key=lambda seq: -seq.get("priority", job_priority))
+		]
+		return file_futures + sequence_futures
+
+	def enqueue(self, files, sequences):
+		"""
+		Adds the discovered files and sequences to the shared queue given by --queue,
+		to be ingested by `ingest worker` processes instead of this one.
+		"""
+		coordinator = create_coordinator(self.args.queue, lease=getattr(self.args, "queue_lease", None) or DEFAULT_LEASE)
+		job = {key: value for key, value in self.data.items() if key not in ("queue", "batch")}
+		# Workers must not fall back to a different context or output than the one resolved here.
+		job.update(input=self.resolved_source, output=self.resolved_out_dir, project=self.resolved_project,
+			scene=self.resolved_scene, shot=self.resolved_shot)
+		tasks = build_tasks(job, files, sequences)
+		added = coordinator.enqueue(tasks)
+		metrics.incr("queue_enqueued", added)
+		logger.info(f"[QUEUE] Enqueued {added} of {len(tasks)} tasks to {self.args.queue} ({coordinator.counts()})")
+
+	def watch(self):
+		"""
+		Ingests frames from the source folder while the vendor upload is still in progress.
+		"""
+		executors = self.create_executors()
+		with executors:
+			DeliveryWatcher(
+				roots=[self.resolved_source],
+				metadata=self.data,
+				copy_op=self.copy_op,
+				proxy_op=self.proxy_op,
+				mov_op=self.mov_op,
+				executors=executors,
+				scene=self.resolved_scene,
+				shot=self.resolved_shot,
+				settle=getattr(self.args, "watch_settle", 10.0),
+				idle=getattr(self.args, "watch_idle", 600.0),
+				poll=getattr(self.args, "watch_poll", 5.0),
+				use_inotify=not getattr(self.args, "watch_polling", False),
+			).run()
+
+	def preflight(self, sequences):
+		"""
+		Reports mismatched resolutions, truncated files and channel differences before copying.
+		Raises PreflightError on problems when --no-force is set.
+		"""
+		total_problems = 0
+		with metrics.span("preflight"):
+			for seq in sequences:
+				if seq.get('extension', '').lower() != 'exr':
+					continue
+				reference, problems = inspect_sequence(seq['paths'], expected_resolution=seq.get('resolution'))
+				if reference:
+					seq['exr'] = {
+						'resolution': f"{reference['width']}x{reference['height']}",
+						'channels': [c['name'] for c in reference['channels']],
+						'compression': reference['compression'],
+					}
+				for problem in problems:
+					logger.warning(f"[PREFLIGHT] {seq['base_name']}: {problem}")
+				metrics.incr("preflight_frames", len(seq['paths']))
+				metrics.incr("preflight_problems", len(problems))
+				total_problems += len(problems)
+
+		if total_problems and not self.is_force_ingestion:
+			raise PreflightError(
+				f"Pre-flight found {total_problems} problems. Fix the delivery, or drop --no-force "
+				f"(or pass --no-preflight) to ingest anyway.")
+		logger.info(f"Pre-flight check complete ({total_problems} problems)")
+
+	def write_report(self):
+		"""
+		Writes the JSON run report and, if requested, the Prometheus textfile.
+		"""
+		try:
+			metrics.write_json(self.report_path)
+			if getattr(self.args, "metrics_textfile", None):
+				metrics.write_prometheus(self.args.metrics_textfile)
+		except OSError as e:
+			logger.warning(f"Failed to write run report: {e}")
         
 	def parse_filename(self, filename):
 		"""
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from collections import defaultdict
+
+from mvl_ingestion.ingestion_utils import logger
+
+PROFILE_MODES = ("off", "cprofile", "sampling")
+# From Python 3.12 only one cProfile can be active per interpreter.
+SINGLE_CPROFILE = sys.version_info >= (3, 12)
+
+
+def get_profile_dir(report_path):
+    """
+    Returns the profile output folder that sits next to the run report.
+    """
+    return os.path.splitext(report_path)[0] + "_profile"
+
+
+class _Sampler(threading.Thread):
+    """
+    Background thread that samples the stacks of all other threads and
+    aggregates them in folded format, tagged with thread name and phase.
+    """
+    def __init__(self, profiler, interval):
+        super().__init__(name="mvl-profile-sampler", daemon=True)
+        self.profiler = profiler
+        self.interval = interval
+        self.stacks = defaultdict(int)
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                phases = self.profiler.current_phases(thread_id)
+                root = [names.get(thread_id, str(thread_id)), phases[-1] if phases else "idle"]
+                self.stacks[";".join(root + stack[::-1])] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    """
+    Optional profiler attached to the run metrics: cProfile of the outermost span per
+    thread ('cprofile') or sampled folded stacks ('sampling'), attributed to (thread, phase).
+    """
+    def __init__(self, mode="cprofile", interval=0.005, out_dir=None):
+        if mode not in PROFILE_MODES or mode == "off":
+            raise ValueError(f"Unsupported profile mode: {mode}. Use one of {', '.join(PROFILE_MODES[1:])}")
+        self.mode = mode
+        self.interval = interval
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._phases = {}
+        self._profiles = defaultdict(list)
+        self._sampler = None
+        self._warned = False
+
+    def start(self):
+        if self.mode == "sampling" or SINGLE_CPROFILE:
+            self._sampler = _Sampler(self, self.interval)
+            self._sampler.start()
+        if self.mode == "cprofile" and SINGLE_CPROFILE:
+            logger.warning("cProfile profiles one thread at a time on Python 3.12+; "
+                           "stacks of all threads are also sampled into profile.folded")
+        logger.info(f"Profiling enabled ({self.mode})")
+
+    def current_phases(self, thread_id):
+        return list(self._phases.get(thread_id, ()))
+
+    def enter(self, phase):
+        thread_id = threading.get_ident()
+        stack = self._phases.setdefault(thread_id, [])
+        stack.append(phase)
+        if self.mode != "cprofile" or len(stack) > 1:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows only one active profiler per interpreter.
+            if not self._warned:
+                logger.warning(f"No cProfile for {phase} and other concurrent phases ({e}); "
+                               f"their time is only in the sampled stacks")
+                self._warned = True
+            return
+        self._local.profile = profile
+
+    def exit(self, phase):
+        thread_id = threading.get_ident()
+        stack = self._phases.get(thread_id)
+        if stack:
+            stack.pop()
+        if self.mode != "cprofile" or stack:
+            return
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            return
+        profile.disable()
+        self._local.profile = None
+        with self._lock:
+            self._profiles[(phase, threading.current_thread().name)].append(profile)
+
+    def dump(self, out_dir=None):
+        """
+        Stops profiling and writes .pstats per phase and threads.json (cprofile),
+        or profile.folded (sampling, and cprofile on 3.12+) to out_dir.
+        """
+        out_dir = out_dir or self.out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        suffix = f"_{os.getpid()}"
+        if self._sampler:
+            self._sampler.stop()
+            path = os.path.join(out_dir, f"profile{suffix}.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in sorted(self._sampler.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"Profile written to {path} ({self._sampler.samples} samples)")
+        if self.mode == "sampling":
+            return
+
+        attribution = []
+        by_phase = defaultdict(list)
+        with self._lock:
+            for (phase, thread_name), profiles in sorted(self._profiles.items()):
+                stats = pstats.Stats(*profiles)
+                by_phase[phase].extend(profiles)
+                attribution.append({
+                    "phase": phase,
+                    "thread": thread_name,
+                    "calls": len(profiles),
+                    "seconds": round(stats.total_tt, 6),
+                })
+        for phase, profiles in by_phase.items():
+            pstats.Stats(*profiles).dump_stats(os.path.join(out_dir, f"{phase}{suffix}.pstats"))
+        with open(os.path.join(out_dir, f"threads{suffix}.json"), "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "written": time.time(), "threads": attribution}, f, indent=2)
+        logger.info(f"Profile written to {out_dir} ({len(by_phase)} phases)")
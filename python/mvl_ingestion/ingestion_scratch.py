@@ -0,0 +1,128 @@
+import os
+import re
+import sys
+import time
+import uuid
+import shutil
+import socket
+import threading
+
+from mvl_ingestion.ingestion_utils import logger
+from mvl_ingestion.ingestion_metrics import metrics
+
+# Leftover run folders on platforms where the owner process cannot be checked
+# are evicted after this many seconds.
+STALE_AGE = 24 * 3600
+# Space reserved per staged sequence, relative to its plates (proxies, MOV).
+DERIVATIVE_OVERHEAD = 1.25
+RUN_DIR_REGEX = re.compile(r"^(?P<host>.+)-(?P<pid>\d+)$")
+
+
+class StageCopyOperation:
+    """
+    Plain copy used to stage plates into scratch and to push derivatives out,
+    counted separately from the plate copies in the run report.
+    """
+    def __init__(self, counter):
+        self.counter = counter
+
+    def execute(self, src, dst, overwrite=True):
+        if not overwrite and os.path.exists(dst):
+            return "skipped"
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(src, dst)
+        metrics.incr(self.counter, os.path.getsize(dst))
+        return "copied"
+
+
+class ScratchArea:
+    """
+    Local folder of one staged sequence. Destination paths are mirrored below it.
+    """
+    def __init__(self, space, path, reserved):
+        self.space = space
+        self.path = path
+        self.reserved = reserved
+        self.pushes = []  # (local path, destination path) of derivatives
+
+    def local(self, destination):
+        relative = os.path.splitdrive(os.path.abspath(destination))[1].lstrip("\\/")
+        return os.path.join(self.path, relative)
+
+    def release(self):
+        self.space.release(self)
+
+
+class ScratchSpace:
+    """
+    Budgeted scratch directory on local disk, shared by the sequences of a run.
+    """
+    def __init__(self, root, budget_gb=0):
+        self.root = os.path.abspath(root)
+        self.host = socket.gethostname()
+        self.run_dir = os.path.join(self.root, f"{self.host}-{os.getpid()}")
+        os.makedirs(self.root, exist_ok=True)
+        self.evict_stale()
+        free = shutil.disk_usage(self.root).free * 0.9
+        self.budget = min(budget_gb * 1024 ** 3, free) if budget_gb else free
+        self.used = 0
+        self._cond = threading.Condition()
+        logger.info(f"Staging through scratch {self.root} (budget {self.budget / 1024 ** 3:.1f} GB)")
+
+    def _is_stale(self, name, path):
+        match = RUN_DIR_REGEX.match(name)
+        if match and match.group("host") == self.host and sys.platform != "win32":
+            pid = int(match.group("pid"))
+            if pid == os.getpid():
+                return False
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                return False
+            return False
+        return time.time() - os.path.getmtime(path) > STALE_AGE
+
+    def evict_stale(self):
+        """
+        Removes the folders of runs that crashed or were killed.
+        """
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.isdir(path) and self._is_stale(name, path):
+                    shutil.rmtree(path)
+                    metrics.incr("scratch_evicted")
+                    logger.info(f"Evicted stale scratch folder {path}")
+            except OSError as e:
+                logger.warning(f"Failed to evict scratch folder {path}: {e}")
+
+    def reserve(self, name, plate_bytes):
+        """
+        Blocks until there is room for the sequence.
+
+        Returns:
+            ScratchArea: or None if the sequence does not fit in the budget at all.
+        """
+        needed = int(plate_bytes * DERIVATIVE_OVERHEAD)
+        if needed > self.budget:
+            logger.warning(f"{name}: {needed / 1024 ** 3:.1f} GB does not fit in the scratch budget, not staging it")
+            return None
+        with metrics.span("scratch_wait", sequence=name):
+            with self._cond:
+                while self.used + needed > self.budget:
+                    self._cond.wait()
+                self.used += needed
+        path = os.path.join(self.run_dir, f"{name}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(path)
+        return ScratchArea(self, path, needed)
+
+    def release(self, area):
+        shutil.rmtree(area.path, ignore_errors=True)
+        with self._cond:
+            self.used -= area.reserved
+            self._cond.notify_all()
+
+    def close(self):
+        shutil.rmtree(self.run_dir, ignore_errors=True)
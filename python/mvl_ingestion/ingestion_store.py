@@ -0,0 +1,224 @@
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+from mvl_ingestion.ingestion_utils import logger
+
+# Linux FICLONE ioctl (btrfs, xfs with reflink=1, ...)
+FICLONE = 0x40049409
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def get_store_root(destination, project):
+    """
+    Returns the default blob store location under the project root
+    used by generate_sequence_output_paths.
+    """
+    return os.path.join(destination, project, ".mvl_store")
+
+
+def _reflink(src, dst):
+    """
+    Clones src into dst sharing the same extents. Raises OSError when the
+    platform or the filesystem does not support it.
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError("reflink is only supported on linux")
+    import fcntl
+
+    with open(src, "rb") as src_fd, open(dst, "wb") as dst_fd:
+        try:
+            fcntl.ioctl(dst_fd.fileno(), FICLONE, src_fd.fileno())
+        except OSError:
+            dst_fd.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+class BlobStore:
+    """
+    Content-addressed store for delivered frames, so a frame delivered twice is written once.
+    Destinations are reflinks or hardlinks to the blob, falling back to a plain copy.
+    """
+    def __init__(self, root, link_mode="auto", algorithm="blake2b"):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Unsupported link mode: {link_mode}. Use one of {', '.join(LINK_MODES)}")
+        self.root = os.path.normpath(root)
+        self.link_mode = link_mode
+        self.algorithm = algorithm
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+    def __getstate__(self):
+        # Allow the store to travel with CopyFileOperation to process workers.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _new_hash(self):
+        if self.algorithm == "blake2b":
+            return hashlib.blake2b(digest_size=32)
+        return hashlib.new(self.algorithm)
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest[2:])
+
+    def refs_path(self, digest):
+        return self.blob_path(digest) + ".refs"
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def _hash_file(self, path):
+        hasher = self._new_hash()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def put(self, src):
+        """
+        Hashes src and writes it into the store unless the blob already exists.
+
+        Returns:
+            tuple: (digest, bool) where the bool is True if the blob was new.
+        """
+        digest = self._hash_file(src)
+        if self.has(digest):
+            return digest, False
+
+        # Hashed again while copying, in case src changed in between.
+        hasher = self._new_hash()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with open(src, "rb") as src_fd, os.fdopen(fd, "wb") as tmp_fd:
+                while True:
+                    chunk = src_fd.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    tmp_fd.write(chunk)
+            shutil.copystat(src, tmp_path)
+            digest = hasher.hexdigest()
+            blob = self.blob_path(digest)
+            with self._lock:
+                if os.path.exists(blob):
+                    os.remove(tmp_path)
+                    return digest, False
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(tmp_path, blob)
+            return digest, True
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def materialize(self, digest, dst):
+        """
+        Creates dst from the blob, trying reflink, then hardlink, then copy
+        depending on link_mode.
+
+        Returns:
+            str: The method that was used.
+        """
+        blob = self.blob_path(digest)
+        if os.path.lexists(dst):
+            # Never write through an existing hardlink into a blob.
+            os.remove(dst)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+        methods = [self.link_mode] if self.link_mode != "auto" else ["reflink", "hardlink", "copy"]
+        for method in methods:
+            try:
+                if method == "reflink":
+                    _reflink(blob, dst)
+                elif method == "hardlink":
+                    os.link(blob, dst)
+                else:
+                    shutil.copy2(blob, dst)
+                break
+            except OSError as e:
+                if method == methods[-1]:
+                    raise
+                logger.debug(f"{method} failed for {os.path.basename(dst)}: {e}")
+
+        # The inode, mtime and size tell gc whether dst was rewritten since.
+        dst_stat = os.stat(dst)
+        with self._lock:
+            with open(self.refs_path(digest), "a", encoding="utf-8") as refs:
+                refs.write(f"{os.path.abspath(dst)}\t{dst_stat.st_ino}\t{dst_stat.st_mtime_ns}\t{dst_stat.st_size}\n")
+        return method
+
+    def _is_referenced(self, blob, refs_file):
+        blob_stat = os.stat(blob)
+        if blob_stat.st_nlink > 1:
+            return True
+        if not os.path.exists(refs_file):
+            return False
+        digest = os.path.basename(os.path.dirname(blob)) + os.path.basename(blob)
+        with open(refs_file, "r", encoding="utf-8") as refs:
+            for line in refs:
+                path, *identity = line.rstrip("\n").split("\t")
+                if not path or not os.path.exists(path):
+                    continue
+                st = os.stat(path)
+                if identity:
+                    if [str(st.st_ino), str(st.st_mtime_ns), str(st.st_size)] == identity:
+                        return True
+                elif st.st_size == blob_stat.st_size and self._hash_file(path) == digest:
+                    # Refs written before identities were recorded.
+                    return True
+        return False
+
+    def gc(self, grace_period=3600, dry_run=False):
+        """
+        Removes blobs without hardlinks or unchanged destinations in their refs file.
+        Blobs newer than grace_period seconds are kept.
+
+        Returns:
+            tuple: (number of blobs removed, bytes freed)
+        """
+        removed = 0
+        freed = 0
+        now = time.time()
+        blobs_dir = os.path.join(self.root, "blobs")
+        if not os.path.isdir(blobs_dir):
+            return removed, freed
+
+        for prefix in sorted(os.listdir(blobs_dir)):
+            prefix_dir = os.path.join(blobs_dir, prefix)
+            for name in sorted(os.listdir(prefix_dir)):
+                if name.endswith(".refs"):
+                    continue
+                blob = os.path.join(prefix_dir, name)
+                refs_file = blob + ".refs"
+                try:
+                    if now - os.path.getmtime(refs_file if os.path.exists(refs_file) else blob) < grace_period:
+                        continue
+                    if self._is_referenced(blob, refs_file):
+                        continue
+                    size = os.path.getsize(blob)
+                    if not dry_run:
+                        os.remove(blob)
+                        if os.path.exists(refs_file):
+                            os.remove(refs_file)
+                    removed += 1
+                    freed += size
+                except OSError as e:
+                    logger.warning(f"Failed to collect blob {name}: {e}")
+
+        logger.info(f"Blob store gc: removed {removed} blobs, freed {freed} bytes{' (dry run)' if dry_run else ''}")
+        return removed, freed
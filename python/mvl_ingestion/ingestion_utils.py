@@ -2,6 +2,8 @@
 import os
 import re
 import logging
+import threading
+import functools
 from pathlib import Path
 import coloredlogs
 
@@ -12,17 +14,30 @@ from mvl_core_pipeline.path_template import resolve_template
 
 
 logger = Logger(name='movie_generator', repo_name='mvl_ingestion').get_logger()
-logger.setLevel(logging.DEBUG)
 coloredlogs.install(level='INFO', logger=logger)
+# Per-frame messages are DEBUG; see ingestion_logging.setup_logging for --log_frames.
+logger.setLevel(logging.INFO)
 
+@functools.lru_cache(maxsize=None)
 def get_parser_config_template():
     fig = Fig('mvl_ingestion', 'parser_template', YAMLConfigDriver())
     return fig.get_config()['template']
 
+@functools.lru_cache(maxsize=None)
 def get_resolution_config_template():
     fig = Fig('mvl_ingestion', 'resolution_template', YAMLConfigDriver())
     return fig.get_config()['template']
 
+@functools.lru_cache(maxsize=None)
+def get_path_config_template():
+    fig = Fig('mvl_ingestion', 'path_template', YAMLConfigDriver())
+    return fig.get_config()['templates']
+
+@functools.lru_cache(maxsize=None)
+def get_executor_config_template():
+    fig = Fig('mvl_ingestion', 'executor_template', YAMLConfigDriver())
+    return fig.get_config()['template']
+
 def normalize(s):
     return s.strip().replace('\r', '').replace('\n', '')
 
@@ -63,6 +78,12 @@ def ingestion_args():
     """
     return get_parser_config_template()['args']
 
+def ingestion_worker_args():
+    """
+    Returns the dict to fill the `ingest worker` arg parser
+    """
+    return get_parser_config_template()['worker_args']
+
 def get_next_version(base_path):
     """
     Scan for existing version folders (v001, v002, ...) and return the next available version.
@@ -83,6 +104,58 @@ def get_next_version(base_path):
 
     return f"v{next_version:03d}"  # Always 3 digits
 
+_version_cache = {}
+_version_lock = threading.Lock()
+
+def reset_version_cache():
+    """
+    Forgets the version listings cached by reserve_next_version. Called at the start of a run.
+    """
+    with _version_lock:
+        _version_cache.clear()
+
+def reserve_next_version(base_path):
+    """
+    Reserves the next version folder (v001, v002, ...) under base_path with an exclusive
+    mkdir, so concurrent ingests of the same shot never pick the same version.
+
+    Returns:
+        str: The reserved version, e.g. 'v003'.
+    """
+    key = os.path.normcase(os.path.abspath(base_path))
+    with _version_lock:
+        if key not in _version_cache:
+            latest = get_next_version(base_path)
+            _version_cache[key] = int(latest[1:]) - 1
+        os.makedirs(base_path, exist_ok=True)
+        number = _version_cache[key] + 1
+        while True:
+            version = f"v{number:03d}"
+            try:
+                os.mkdir(os.path.join(base_path, version))
+                break
+            except FileExistsError:
+                number += 1
+        _version_cache[key] = number
+    return version
+
+def release_version(base_path, version):
+    """
+    Removes a version folder reserved by reserve_next_version again if nothing was written to it.
+
+    Returns:
+        bool: True if the folder was removed.
+    """
+    key = os.path.normcase(os.path.abspath(base_path))
+    with _version_lock:
+        try:
+            os.rmdir(os.path.join(base_path, version))
+        except OSError:
+            return False  # not empty, or already gone
+        if _version_cache.get(key) == int(version[1:]):
+            _version_cache[key] -= 1
+    return True
+
 def generate_sequence_output_paths(seq, metadata):
 
     current_scene = seq.get("scene")
@@ -146,7 +219,14 @@ def generate_sequence_output_paths(seq, metadata):
     }
 
     base_path = resolve_template("path", "shots:publish:base_path", tokens)
-    version = get_next_version(base_path=base_path)
+    if metadata.get('plate_version'):
+        # Rerun into an existing version: plates are skipped and only outdated derivatives rebuilt.
+        version = metadata['plate_version']
+        if not re.fullmatch(r"v\d{3}", version):
+            raise ValueError(f"Invalid plate version '{version}', expected e.g. v003.")
+        os.makedirs(os.path.join(base_path, variant, product_type, version), exist_ok=True)
+    else:
+        version = reserve_next_version(os.path.join(base_path, variant, product_type))
     res_name = (metadata or {}).get('proxy_res') or '2K_DCP'
     resolution = get_resolution_string(res_name=res_name, fallback="2K_DCP")
 
@@ -168,7 +248,10 @@ def generate_sequence_output_paths(seq, metadata):
     output_paths = { 
         'plate_path': plates_path,
         'proxy_path': proxy_path,
-        'movie_path': mov_path  
+        'movie_path': mov_path,
+        'plate_dir': plate_path,
+        # generate_out_filename arguments, for frames planned later (watch mode)
+        'naming': (scene_shot_data, scene_shot_type, current_resolution)
     }
     return output_paths
 			
@@ -283,12 +366,31 @@ def get_files_and_sequences(root_dirs, scene=None, shot=None, resolution=None):
 
     return files, sequences
 
+_csv_cache = {}
+_csv_lock = threading.Lock()
+
 def read_csv(csv_file_path):    
+    """
+    Reads the shot mapping CSV. Mappings are cached per file and re-read only
+    when the file's size or mtime changes, so sequences and batch jobs share them.
+    """
+    try:
+        st = os.stat(csv_file_path)
+        cache_key = (os.path.abspath(csv_file_path), st.st_size, st.st_mtime_ns)
+    except (OSError, TypeError):
+        cache_key = None
+    with _csv_lock:
+        if cache_key and cache_key in _csv_cache:
+            return _csv_cache[cache_key]
+
     mapping = None
     reader_no_header = MVLCSVReader(csv_file_path)
     reader_no_header.read_csv(skip_header=False)
     # Create mapping where the first column is the key (no header)
     mapping = reader_no_header.create_dictionary_mapping(skip_header=False)
+    if cache_key:
+        with _csv_lock:
+            _csv_cache[cache_key] = mapping
     return mapping
 
 def get_supported_proxy_resolutions():
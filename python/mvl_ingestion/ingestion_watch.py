@@ -0,0 +1,304 @@
+import os
+import re
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from mvl_ingestion.ingestion_utils import (
+    logger, get_files_and_sequences, generate_sequence_output_paths, generate_out_filename,
+    check_missing_frames, get_resolution_string
+)
+from mvl_ingestion.ingestion_metrics import metrics
+from mvl_ingestion.ingestion_executor import CopyTask
+from mvl_ingestion.ingestion_builder import SequenceBuilder, get_proxy_path, summarize
+from mvl_ingestion.ingestion_graph import DerivativeGraph, file_identity, input_hash
+
+FRAME_REGEX = re.compile(r"^(.+?)_(\d+)\.([a-zA-Z0-9]+)$")
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+# No IN_MODIFY: it fires for every chunk written, and each event rescans the tree.
+# A finished frame is reported by IN_CLOSE_WRITE (or IN_MOVED_TO when renamed into place).
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Fallback watcher: every wait asks for a full rescan."""
+    def __init__(self, roots):
+        self.roots = roots
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return None
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux inotify watcher using libc through ctypes. Uploads from other hosts to a
+    network mount are not reported, so pending folders are still polled.
+    """
+    def __init__(self, roots):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        for root in roots:
+            self.add_tree(root)
+
+    def add_tree(self, root):
+        for path, _, _ in os.walk(root):
+            self.add(path)
+
+    def add(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self._dirs[wd] = path
+
+    def wait(self, timeout):
+        """
+        Returns the folders that changed, or None when the queue overflowed and a rescan is needed.
+        """
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed
+        data = os.read(self.fd, 64 * 1024)
+        pos = 0
+        while pos < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, pos)
+            name = data[pos + EVENT_HEADER.size:pos + EVENT_HEADER.size + length].rstrip(b"\0")
+            pos += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            folder = self._dirs.get(wd)
+            if folder is None:
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                new_dir = os.path.join(folder, os.fsdecode(name))
+                self.add_tree(new_dir)
+                changed.add(new_dir)
+            changed.add(folder)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(roots, use_inotify=True):
+    if use_inotify:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(roots)
+
+
+class _SequenceState:
+    def __init__(self, builder):
+        self.builder = builder
+        self.first_frame = None
+        self.frames = {}  # source frame number -> (source path, destination path)
+        self.sources = set()
+        self.last_activity = time.time()
+        self.finalized = False
+
+
+class DeliveryWatcher:
+    """
+    Ingests a delivery while it is still being uploaded: frames are copied once settled,
+    and a sequence is finalized (gap check, MOV) after `idle` seconds without new frames.
+    """
+    def __init__(self, roots, metadata, copy_op, proxy_op, mov_op, executors,
+                 scene=None, shot=None, settle=10.0, idle=600.0, poll=5.0, use_inotify=True):
+        self.roots = [os.path.normpath(r) for r in roots]
+        self.metadata = metadata
+        self.copy_op = copy_op
+        self.proxy_op = proxy_op
+        self.mov_op = mov_op
+        self.executors = executors
+        self.scene = scene
+        self.shot = shot
+        self.settle = settle
+        self.idle = idle
+        self.poll = poll
+        self.use_inotify = use_inotify
+        self._stat = {}  # path -> (size, mtime_ns, unchanged since)
+        self._states = {}
+        self._pending_dirs = set()
+
+    def _all_dirs(self):
+        dirs = set()
+        for root in self.roots:
+            for path, _, _ in os.walk(root):
+                dirs.add(path)
+        return dirs
+
+    def _is_stable(self, path, now):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        previous = self._stat.get(path)
+        if previous is None or previous[:2] != (st.st_size, st.st_mtime_ns):
+            self._stat[path] = (st.st_size, st.st_mtime_ns, now)
+            return False
+        return st.st_size > 0 and now - previous[2] >= self.settle
+
+    def run(self):
+        watcher = create_watcher(self.roots, self.use_inotify)
+        logger.info(f"Watching {', '.join(self.roots)} ({type(watcher).__name__}, settle {self.settle}s, idle {self.idle}s)")
+        dirs = self._all_dirs()
+        try:
+            while True:
+                for folder in sorted(dirs):
+                    self._scan(folder)
+                self._finalize_idle()
+                if self._states and all(s.finalized for s in self._states.values()) and not self._pending_dirs:
+                    logger.info("All sequences finalized, delivery complete.")
+                    break
+                changed = watcher.wait(self.poll)
+                if changed is None:
+                    dirs = self._all_dirs()
+                else:
+                    dirs = set(d for d in changed | self._pending_dirs if os.path.isdir(d))
+        except KeyboardInterrupt:
+            logger.warning("Watch interrupted; unfinished sequences were not finalized.")
+        finally:
+            watcher.close()
+
+    def _scan(self, folder):
+        now = time.time()
+        try:
+            _, sequences = get_files_and_sequences(folder, scene=self.scene, shot=self.shot)
+        except (OSError, IndexError) as e:
+            logger.debug(f"Skipping {folder}: {e}")
+            return
+
+        pending = False
+        for seq in sequences:
+            key = (folder, seq['base_name'], seq['extension'])
+            state = self._states.get(key)
+            if state and state.finalized:
+                continue
+            stable = []
+            for path in seq['paths']:
+                if state and path in state.sources:
+                    continue
+                if self._is_stable(path, now):
+                    stable.append(path)
+                else:
+                    pending = True
+                    if state:
+                        state.last_activity = now
+            if stable:
+                if state is None:
+                    builder = SequenceBuilder(seq, self.copy_op, self.proxy_op, self.mov_op, executors=self.executors)
+                    builder.priority = int(self.metadata.get('priority') or 0)
+                    state = self._states[key] = _SequenceState(builder)
+                self._ingest(state, seq, stable)
+        if pending:
+            self._pending_dirs.add(folder)
+        else:
+            self._pending_dirs.discard(folder)
+
+    def _destination(self, state, frame, ext):
+        naming = state.builder.out_paths['naming']
+        filename = generate_out_filename(1001 + frame - state.first_frame, ext, *naming)
+        return os.path.join(state.builder.out_paths['plate_dir'], filename)
+
+    def _ingest(self, state, seq, paths):
+        builder = state.builder
+        frames = {int(FRAME_REGEX.match(os.path.basename(p)).group(2)): p for p in paths}
+        ext = os.path.splitext(paths[0])[1]
+        if state.first_frame is None:
+            with metrics.span("plan", sequence=builder.name):
+                builder.out_paths = generate_sequence_output_paths(dict(seq, paths=sorted(paths)), self.metadata)
+            state.first_frame = min(frames)
+        elif min(frames) < state.first_frame:
+            self._renumber(state, min(frames), ext)
+
+        tasks = []
+        for frame, src in sorted(frames.items()):
+            dst = self._destination(state, frame, ext)
+            state.frames[frame] = (src, dst)
+            state.sources.add(src)
+            tasks.append(CopyTask(src, dst, self.metadata.get('overwrite', False)))
+        with metrics.span("copy", sequence=builder.name):
+            outcomes = self.executors.get("copy").run(self.copy_op, tasks, "copy_frame", priority=builder.priority, sequence=builder.name)
+        metrics.incr("frames", len(tasks), sequence=builder.name)
+
+        if self.metadata.get('use_proxy'):
+            builder.copied_paths = [task.dst for task in tasks]
+            builder.generate_proxies(
+                proxy_fmt=self.metadata.get('proxy', 'jpeg'),
+                proxy_res_fmt=self.metadata.get('proxy_res', "2K_DCP")
+            )
+        state.last_activity = time.time()
+        logger.info(f"[WATCH] {builder.name}: ingested {len(tasks)} frames ({len(state.frames)} total{summarize(outcomes)})")
+
+    def _renumber(self, state, first_frame, ext):
+        """
+        Shifts the copied plates, proxies and proxy build records so a late first frame is 1001.
+        """
+        builder = state.builder
+        logger.warning(f"[WATCH] {builder.name}: frame {first_frame} arrived after {state.first_frame}, renumbering")
+        proxy_dir = os.path.normpath(str(builder.out_paths.get('proxy_path')))
+        proxy_res = get_resolution_string(self.metadata.get('proxy_res', "2K_DCP"))
+        proxy_fmt = self.metadata.get('proxy', 'jpeg')
+        graph = DerivativeGraph(proxy_dir)
+        moved = []
+        old_first = state.first_frame
+        state.first_frame = first_frame
+        # Numbers only grow, so rename from the highest frame down to avoid collisions.
+        for frame in sorted(state.frames, reverse=True):
+            src, old_dst = state.frames[frame]
+            new_dst = self._destination(state, frame, ext)
+            old_inputs = input_hash([file_identity(old_dst)])
+            os.replace(old_dst, new_dst)
+            old_proxy = get_proxy_path(old_dst, proxy_dir, proxy_res, proxy_fmt)
+            record = graph.forget(old_proxy)
+            if os.path.exists(old_proxy):
+                new_proxy = get_proxy_path(new_dst, proxy_dir, proxy_res, proxy_fmt)
+                os.replace(old_proxy, new_proxy)
+                # Only a record that was current for the old plate carries over.
+                if record and record.get("inputs") == old_inputs and "parameters" in record:
+                    moved.append((new_proxy, new_dst, record["parameters"]))
+            state.frames[frame] = (src, new_dst)
+        # Records are re-added once all are forgotten, as new names reuse old ones.
+        for new_proxy, new_dst, params in moved:
+            graph.record(new_proxy, [file_identity(new_dst)], params)
+        if os.path.isdir(proxy_dir):
+            graph.save()
+        logger.info(f"[WATCH] {builder.name}: shifted {len(state.frames)} frames by {old_first - first_frame}")
+
+    def _finalize_idle(self):
+        now = time.time()
+        for (folder, _, _), state in self._states.items():
+            if state.finalized or folder in self._pending_dirs or now - state.last_activity < self.idle:
+                continue
+            self.finalize(state)
+
+    def finalize(self, state):
+        builder = state.builder
+        sources = [src for _, (src, _) in sorted(state.frames.items())]
+        if check_missing_frames(sources):
+            logger.warning(f"[WATCH] {builder.name}: sequence has missing frames, see above")
+        builder.copied_paths = [dst for _, (_, dst) in sorted(state.frames.items())]
+        if self.metadata.get('mov'):
+            builder.generate_mov(self.metadata)
+        state.finalized = True
+        logger.info(f"[WATCH] {builder.name}: finalized with {len(state.frames)} frames")
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from mvl_ingestion import ingestion_autotune
+from mvl_ingestion.ingestion_autotune import ConcurrencyGate, ConcurrencyTuner, TuningStore, get_tuning_key
+
+
+class ConcurrencyGateTest(unittest.TestCase):
+    def test_limit(self):
+        gate = ConcurrencyGate(2)
+        self.assertTrue(gate.try_acquire())
+        self.assertTrue(gate.try_acquire())
+        self.assertFalse(gate.try_acquire())
+        gate.release()
+        self.assertTrue(gate.try_acquire())
+
+    def test_raising_the_limit_wakes_waiters(self):
+        gate = ConcurrencyGate(1)
+        gate.acquire()
+        waiter = threading.Thread(target=gate.acquire)
+        waiter.start()
+        waiter.join(0.05)
+        self.assertTrue(waiter.is_alive())
+        gate.set_limit(2)
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(gate.active, 2)
+
+
+class ConcurrencyTunerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        patcher = mock.patch.object(ingestion_autotune.time, "perf_counter", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tuner(self, limit=4, minimum=2, maximum=8):
+        return ConcurrencyTuner("copy", ConcurrencyGate(limit), minimum, maximum, window=8, min_seconds=0.5)
+
+    def window(self, tuner, seconds, tasks=8, latency=None, idle=0.0):
+        """
+        Runs `tasks` tasks that all finish after `seconds` of busy time, after `idle` seconds with nothing running.
+        """
+        self.now += idle
+        for _ in range(tasks):
+            tuner.task_started()
+        self.now += seconds
+        for _ in range(tasks):
+            tuner.task_finished(seconds if latency is None else latency)
+        return tuner.limit
+
+    def test_probes_up_while_throughput_grows(self):
+        tuner = self.tuner()
+        self.assertEqual(self.window(tuner, 1.0), 5)
+        self.assertEqual(self.window(tuner, 0.8, tasks=10), 6)
+        self.assertEqual(self.window(tuner, 0.8, tasks=12), 7)
+        self.assertEqual(tuner.adjustments, 3)
+
+    def test_backs_off_when_throughput_drops(self):
+        tuner = self.tuner(limit=6)
+        self.window(tuner, 1.0, tasks=12)
+        self.assertEqual(self.window(tuner, 2.0, tasks=14), 5)
+        self.assertEqual(tuner.best_limit, 6)
+
+    def test_backs_off_when_latency_grows(self):
+        tuner = self.tuner(limit=4)
+        self.window(tuner, 1.0, latency=0.2)
+        self.assertEqual(self.window(tuner, 1.25, tasks=10, latency=0.4), 3)
+
+    def test_stays_within_bounds(self):
+        tuner = self.tuner(limit=8, maximum=8)
+        self.assertEqual(self.window(tuner, 1.0, tasks=16), 8)
+        tuner = self.tuner(limit=2, minimum=2)
+        self.window(tuner, 1.0)
+        self.assertEqual(self.window(tuner, 10.0), 2)
+
+    def test_idle_time_is_not_counted(self):
+        tuner = self.tuner()
+        self.window(tuner, 1.0)
+        # Same busy throughput after waiting on the previous stage: keep probing.
+        self.assertEqual(self.window(tuner, 1.25, tasks=10, idle=30.0), 6)
+
+    def test_small_or_failed_windows_wait(self):
+        tuner = self.tuner()
+        self.assertEqual(self.window(tuner, 1.0, tasks=7), 4)
+        self.assertEqual(self.window(tuner, 0.1, tasks=1), 5)
+        tuner = self.tuner()
+        for _ in range(8):
+            tuner.task_started()
+        self.now += 1.0
+        for _ in range(8):
+            tuner.task_finished(None)
+        self.assertEqual((tuner.limit, tuner.adjustments), (4, 0))
+
+
+class TuningStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, ".mvl_ingestion", "tuning.json")
+
+    def test_save_and_load(self):
+        store = TuningStore(self.path)
+        self.assertIsNone(store.get("J: -> K:", "copy"))
+        store.update("J: -> K:", {"copy": 12})
+        store.update("J: -> K:", {"derive": 6})
+        store.save()
+        self.assertEqual(TuningStore(self.path).data, {"J: -> K:": {"copy": 12, "derive": 6}})
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["tuning.json"])
+
+    def test_unreadable_file_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{")
+        self.assertEqual(TuningStore(self.path).data, {})
+
+    def test_tuning_key_uses_mount_points(self):
+        with tempfile.TemporaryDirectory() as root:
+            key = get_tuning_key(os.path.join(root, "to_mvl"), root)
+        source, destination = key.split(" -> ")
+        self.assertEqual(source, destination)
+        self.assertTrue(os.path.ismount(source))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import types
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+from mvl_ingestion import ingestion_utils, ingestion_processor
+from mvl_ingestion.ingestion_batch import run_batch, run_batch_file, load_jobs, normalize_job, default_args
+from mvl_ingestion.ingestion_processor import PreflightError
+from test_egress import ShippedFig
+
+
+class FakeExecutors:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeProcessor:
+    """
+    Stands in for MVLIngestionProcessor; the input name says what the job does.
+    """
+    submitted = []
+
+    def __init__(self, args):
+        if args["input"] == "unresolved":
+            raise ValueError("no context for unresolved")
+        self.args = types.SimpleNamespace(**args)
+        self.resolved_source = args["input"]
+
+    def instrumented(self):
+        return contextlib.nullcontext()
+
+    def create_executors(self):
+        return FakeExecutors()
+
+    def create_scratch(self):
+        return None
+
+    def discover(self):
+        if self.resolved_source == "truncated":
+            raise PreflightError("Pre-flight found 2 problems")
+        if self.resolved_source == "empty":
+            return [], []
+        sequences = [{"base_name": self.resolved_source, "paths": ["a.1001.exr", "a.1002.exr"]}]
+        if self.resolved_source == "urgent_sequence":
+            sequences[0]["priority"] = 20
+        return ["notes.txt"], sequences
+
+    def submit(self, executor, executors, files, sequences, scratch):
+        FakeProcessor.submitted.append(self.resolved_source)
+        return [executor.submit(self.build)]
+
+    def build(self):
+        if self.resolved_source == "unreachable":
+            raise OSError("destination unreachable")
+
+
+class RunBatchTest(unittest.TestCase):
+    def setUp(self):
+        ingestion_utils.get_parser_config_template.cache_clear()
+        self.addCleanup(ingestion_utils.get_parser_config_template.cache_clear)
+        for target, name, value in ((ingestion_utils, "Fig", ShippedFig),
+                                    (ingestion_processor, "MVLIngestionProcessor", FakeProcessor)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        FakeProcessor.submitted = []
+
+    def test_statuses(self):
+        results = run_batch([{"input": name} for name in ("ok", "unresolved", "truncated", "empty", "unreachable")])
+        self.assertEqual([r["status"] for r in results], ["ok", "failed", "failed", "failed", "failed"])
+        self.assertEqual((results[0]["files"], results[0]["sequences"], results[0]["frames"]), (1, 1, 2))
+        self.assertEqual(results[1]["errors"], ["setup: no context for unresolved"])
+        self.assertEqual(results[2]["errors"], ["discover: Pre-flight found 2 problems"])
+        self.assertEqual(results[3]["errors"], ["nothing to ingest in empty"])
+        self.assertEqual(results[4]["errors"], ["destination unreachable"])
+
+    def test_urgent_jobs_are_submitted_first(self):
+        run_batch([{"input": "first"}, {"input": "urgent_sequence"}, {"input": "hero", "priority": 10},
+                   {"input": "late", "priority": -1}])
+        self.assertEqual(FakeProcessor.submitted, ["urgent_sequence", "hero", "first", "late"])
+
+    def test_watch_is_rejected(self):
+        results = run_batch([{"input": "ok", "watch": True}])
+        self.assertEqual(results[0]["errors"], ["watch and egress are not supported in batch mode"])
+
+    def test_defaults_and_job_keys(self):
+        defaults = default_args()
+        self.assertTrue(defaults["force"])
+        with mock.patch.object(FakeProcessor, "__init__", autospec=True, side_effect=FakeProcessor.__init__) as init:
+            run_batch([{"input": "ok", "date": "2025-07-15", "--no-mov": True}], defaults={"vendor": "from_da"})
+        args = init.call_args[0][1]
+        self.assertEqual((args["input_date"], args["vendor"], args["no_mov"]), ("2025-07-15", "from_da", True))
+        self.assertNotIn("batch", args)
+
+    def test_normalize_job(self):
+        self.assertEqual(normalize_job({" --proxy-res": "2K_DCP", "scene": "SC_48", "shot": "", "vendor": None}),
+                         {"proxy_res": "2K_DCP", "scene": "SC_48"})
+
+
+class LoadJobsTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_yaml_list_and_mapping(self):
+        self.assertEqual(load_jobs(self.write("jobs.yaml", "- input: /a\n- input: /b\n")), ([{"input": "/a"}, {"input": "/b"}], {}))
+        path = self.write("turnover.yaml", "defaults:\n  vendor: from_da\njobs:\n  - input: /a\n")
+        self.assertEqual(load_jobs(path), ([{"input": "/a"}], {"vendor": "from_da"}))
+
+    def test_csv(self):
+        path = self.write("jobs.csv", "input,scene,shot,date\n/a,SC_48,SH_14,2025-07-15\n/b,SC_48,,\n")
+        jobs, defaults = load_jobs(path)
+        self.assertEqual(jobs[0], {"input": "/a", "scene": "SC_48", "shot": "SH_14", "date": "2025-07-15"})
+        self.assertEqual(normalize_job(jobs[1]), {"input": "/b", "scene": "SC_48"})
+        self.assertEqual(defaults, {})
+
+    def test_manifest_defaults_override_cli(self):
+        path = self.write("turnover.yaml", "defaults:\n  vendor: from_da\njobs:\n  - input: /a\n")
+        with mock.patch("mvl_ingestion.ingestion_batch.run_batch") as batch:
+            run_batch_file(path, {"vendor": "from_cli", "output": "/mnt/projects"})
+        batch.assert_called_once_with([{"input": "/a"}], {"vendor": "from_da", "output": "/mnt/projects"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import time
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from mvl_ingestion.ingestion_coordinator import SQLiteCoordinator, FileCoordinator, IngestWorker
+
+LEASE = 0.2
+
+
+def task(task_id, priority=0):
+    return task_id, {"kind": "file", "job": {"priority": priority}, "path": f"/vault/{task_id}.exr"}
+
+
+class CoordinatorTests:
+    """
+    Claim, lease and completion semantics shared by both queue backends.
+    """
+    def create(self, root, lease=LEASE, max_attempts=3):
+        raise NotImplementedError
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.coordinator = self.create(tmp.name)
+
+    def test_enqueue_ignores_known_ids(self):
+        self.assertEqual(self.coordinator.enqueue([task("a"), task("b")]), 2)
+        self.assertEqual(self.coordinator.enqueue([task("a"), task("c")]), 1)
+        self.assertEqual(self.coordinator.counts()["pending"], 3)
+
+    def test_claim_is_exclusive(self):
+        self.coordinator.enqueue([task("a")])
+        task_id, payload = self.coordinator.claim("w1")
+        self.assertEqual(payload["path"], "/vault/a.exr")
+        self.assertIsNone(self.coordinator.claim("w2"))
+        self.assertEqual(self.coordinator.counts()["leased"], 1)
+
+    def test_claim_by_priority_then_age(self):
+        self.coordinator.enqueue([task("low", -1), task("first"), task("hero", 10), task("second")])
+        claimed = [self.coordinator.claim("w1")[1]["path"] for _ in range(4)]
+        self.assertEqual(claimed, ["/vault/hero.exr", "/vault/first.exr", "/vault/second.exr", "/vault/low.exr"])
+
+    def test_claim_min_priority(self):
+        self.coordinator.enqueue([task("a"), task("hero", 10)])
+        self.assertEqual(self.coordinator.claim("w1", min_priority=5)[1]["path"], "/vault/hero.exr")
+        self.assertIsNone(self.coordinator.claim("w1", min_priority=5))
+
+    def test_only_the_owner_completes(self):
+        self.coordinator.enqueue([task("a")])
+        task_id, _ = self.coordinator.claim("w1")
+        self.assertFalse(self.coordinator.complete("w2", task_id))
+        self.assertTrue(self.coordinator.complete("w1", task_id))
+        self.assertFalse(self.coordinator.complete("w1", task_id))
+        self.assertEqual(self.coordinator.counts()["done"], 1)
+
+    def test_expired_lease_is_reclaimed(self):
+        self.coordinator.enqueue([task("a")])
+        task_id, _ = self.coordinator.claim("w1")
+        time.sleep(LEASE * 2)
+        reclaimed, _ = self.coordinator.claim("w2")
+        self.assertEqual(self.coordinator.heartbeat("w1", [task_id]), [task_id])
+        self.assertEqual(self.coordinator.heartbeat("w2", [reclaimed]), [])
+        self.assertFalse(self.coordinator.complete("w1", task_id))
+        self.assertTrue(self.coordinator.complete("w2", reclaimed))
+
+    def test_heartbeat_keeps_the_lease(self):
+        self.coordinator.enqueue([task("a")])
+        task_id, _ = self.coordinator.claim("w1")
+        for _ in range(3):
+            time.sleep(LEASE / 2)
+            self.assertEqual(self.coordinator.heartbeat("w1", [task_id]), [])
+        self.assertIsNone(self.coordinator.claim("w2"))
+
+    def test_update_needs_the_lease(self):
+        self.coordinator.enqueue([task("a")])
+        task_id, payload = self.coordinator.claim("w1")
+        payload["plate_version"] = "v001"
+        self.assertFalse(self.coordinator.update("w2", task_id, payload))
+        self.assertTrue(self.coordinator.update("w1", task_id, payload))
+        self.coordinator.fail("w1", task_id, "boom")
+        _, retried = self.coordinator.claim("w2")
+        self.assertEqual(retried["plate_version"], "v001")
+
+    def test_fail_retries_until_max_attempts(self):
+        self.coordinator.enqueue([task("a")])
+        for attempt in range(3):
+            task_id, _ = self.coordinator.claim("w1")
+            self.coordinator.fail("w1", task_id, f"attempt {attempt}")
+        self.assertIsNone(self.coordinator.claim("w1"))
+        self.assertEqual(self.coordinator.counts()["failed"], 1)
+        self.assertEqual(len(self.coordinator.failures()), 1)
+
+    def test_fail_by_other_worker_is_ignored(self):
+        self.coordinator.enqueue([task("a")])
+        task_id, _ = self.coordinator.claim("w1")
+        self.coordinator.fail("w2", task_id, "not mine")
+        self.assertTrue(self.coordinator.complete("w1", task_id))
+
+
+class SQLiteCoordinatorTest(CoordinatorTests, unittest.TestCase):
+    def create(self, root, lease=LEASE, max_attempts=3):
+        return SQLiteCoordinator(os.path.join(root, "queue.db"), lease=lease, max_attempts=max_attempts)
+
+
+class FileCoordinatorTest(CoordinatorTests, unittest.TestCase):
+    def create(self, root, lease=LEASE, max_attempts=3):
+        return FileCoordinator(os.path.join(root, "queue"), lease=lease, max_attempts=max_attempts)
+
+
+class IngestWorkerTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.coordinator = SQLiteCoordinator(os.path.join(tmp.name, "queue.db"), lease=LEASE)
+        self.coordinator.enqueue([task("a"), task("b")])
+
+    def test_claim_errors_are_retried(self):
+        claim = self.coordinator.claim
+        errors = [sqlite3.OperationalError("database is locked"), OSError("stale file handle")]
+
+        def flaky_claim(worker, min_priority=None):
+            if errors:
+                raise errors.pop(0)
+            return claim(worker, min_priority)
+
+        worker = IngestWorker(self.coordinator, executors=None, worker_id="w1", poll=0.01)
+        with mock.patch.object(self.coordinator, "claim", side_effect=flaky_claim), \
+                mock.patch.object(worker, "_run_task") as run_task:
+            self.assertTrue(worker.run())
+        self.assertEqual(run_task.call_count, 2)
+        self.assertEqual(worker.completed, 2)
+        self.assertEqual(self.coordinator.counts()["done"], 2)
+
+    def test_counts_errors_are_retried(self):
+        counts = self.coordinator.counts
+        errors = [sqlite3.OperationalError("database is locked")]
+
+        def flaky_counts():
+            if errors:
+                raise errors.pop(0)
+            return counts()
+
+        worker = IngestWorker(self.coordinator, executors=None, worker_id="w1", poll=0.01)
+        with mock.patch.object(self.coordinator, "counts", side_effect=flaky_counts), \
+                mock.patch.object(worker, "_run_task"):
+            self.assertTrue(worker.run())
+        self.assertFalse(errors)
+        self.assertEqual(worker.completed, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import unittest
+from unittest import mock
+
+import yaml
+
+from mvl_ingestion import ingestion_utils
+from mvl_ingestion.ingestion_processor import MVLIngestionProcessor
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "configs")
+
+
+class ShippedFig:
+    """
+    Fig replacement that reads the configs of this checkout.
+    """
+    def __init__(self, package, name, driver):
+        with open(os.path.join(CONFIG_DIR, f"{name}.yaml"), "r", encoding="utf-8") as f:
+            self.config = yaml.safe_load(f)
+
+    def get_config(self):
+        return self.config
+
+
+class EgressPathTest(unittest.TestCase):
+    def setUp(self):
+        ingestion_utils.get_path_config_template.cache_clear()
+        self.addCleanup(ingestion_utils.get_path_config_template.cache_clear)
+        patcher = mock.patch.object(ingestion_utils, "Fig", ShippedFig)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_egress_path_from_shipped_template(self):
+        processor = MVLIngestionProcessor.__new__(MVLIngestionProcessor)
+        processor.resolved_scene = "SC_48"
+        processor.resolved_shot = "SH_0140"
+        processor.resolved_resolution = "4448x3096"
+        with mock.patch("os.makedirs") as makedirs:
+            path = processor._construct_egress_path("gen63", "dneg", "2025-03-04")
+        self.assertEqual(path, "j:/gen63/vault/from_mvl/dneg/20250304/SC_48/SC_48_SH_0140/4448x3096")
+        makedirs.assert_called_once_with(path, exist_ok=True)
+
+    def test_egress_path_rejects_bad_date(self):
+        processor = MVLIngestionProcessor.__new__(MVLIngestionProcessor)
+        with self.assertRaises(ValueError):
+            processor._construct_egress_path("gen63", "dneg", "04/03/2025")
+
+    def test_egress_path_needs_a_resolution(self):
+        processor = MVLIngestionProcessor.__new__(MVLIngestionProcessor)
+        processor.resolved_scene = "SC_48"
+        processor.resolved_shot = "SH_0140"
+        processor.resolved_resolution = None
+        with mock.patch("os.makedirs") as makedirs, self.assertRaises(ValueError) as raised:
+            processor._construct_egress_path("gen63", "dneg", "2025-03-04")
+        self.assertIn("--resolution", str(raised.exception))
+        makedirs.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
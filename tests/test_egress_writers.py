@@ -0,0 +1,121 @@
+import io
+import os
+import json
+import zlib
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import unittest
+
+from mvl_ingestion.ingestion_egress import EgressPackager, _ZipStreamWriter, CHECKSUM_FILE
+
+CONTENTS = {
+    "SC_48_SH_0140/plate/v001/plate.1001.exr": os.urandom(300 * 1024),
+    "SC_48_SH_0140/plate/v001/plate.1002.exr": b"\0" * (5 * 1024 * 1024),
+    "SC_48_SH_0140/mov/v001/plate.mov": b"",
+}
+
+
+def stored_entry(data, mtime=1735689600.0):
+    return {"data": io.BytesIO(data), "crc": zlib.crc32(data), "size": len(data),
+            "compressed_size": len(data), "mtime": mtime, "method": 0}
+
+
+class EgressPackagerTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.files = []
+        for arcname, data in CONTENTS.items():
+            src = os.path.join(self.root, "published", arcname.replace("/", "_"))
+            os.makedirs(os.path.dirname(src), exist_ok=True)
+            with open(src, "wb") as f:
+                f.write(data)
+            self.files.append((src, arcname))
+
+    def package(self, fmt, **kwargs):
+        packager = EgressPackager(fmt, workers=2, **kwargs)
+        out_path = packager.archive_path(os.path.join(self.root, "out"), "SC_48_SH_0140")
+        manifest = packager.package(self.files, out_path)
+        with open(f"{out_path}.manifest.json", "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f), manifest)
+        self.assertEqual(manifest["file_count"], len(CONTENTS))
+        self.assertEqual(manifest["total_size"], sum(len(data) for data in CONTENTS.values()))
+        for record in manifest["files"]:
+            self.assertEqual(record["sha256"], hashlib.sha256(CONTENTS[record["path"]]).hexdigest())
+        if manifest["sha256"]:
+            with open(out_path, "rb") as f:
+                self.assertEqual(manifest["sha256"], hashlib.sha256(f.read()).hexdigest())
+        return out_path, manifest
+
+    def assert_checksums(self, data, manifest):
+        expected = "".join(f"{r['sha256']}  {r['path']}\n" for r in manifest["files"])
+        self.assertEqual(data.decode("utf-8"), expected)
+
+    def test_zip(self):
+        for level in (6, 0):
+            with self.subTest(level=level):
+                out_path, manifest = self.package("zip", level=level)
+                with zipfile.ZipFile(out_path) as archive:
+                    self.assertIsNone(archive.testzip())
+                    self.assertEqual(archive.namelist(), list(CONTENTS) + [CHECKSUM_FILE])
+                    for arcname, data in CONTENTS.items():
+                        self.assertEqual(archive.read(arcname), data)
+                    self.assert_checksums(archive.read(CHECKSUM_FILE), manifest)
+
+    def test_tar(self):
+        for fmt in ("tar", "tgz"):
+            with self.subTest(fmt=fmt):
+                out_path, manifest = self.package(fmt)
+                with tarfile.open(out_path, "r:gz" if fmt == "tgz" else "r:") as archive:
+                    self.assertEqual(archive.getnames(), list(CONTENTS) + [CHECKSUM_FILE])
+                    for arcname, data in CONTENTS.items():
+                        self.assertEqual(archive.extractfile(arcname).read(), data)
+                    self.assert_checksums(archive.extractfile(CHECKSUM_FILE).read(), manifest)
+
+    def test_folder(self):
+        out_path, manifest = self.package("folder")
+        for arcname, data in CONTENTS.items():
+            with open(os.path.join(out_path, *arcname.split("/")), "rb") as f:
+                self.assertEqual(f.read(), data)
+        with open(os.path.join(out_path, CHECKSUM_FILE), "rb") as f:
+            self.assert_checksums(f.read(), manifest)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            EgressPackager("rar")
+
+
+class ZipStreamWriterTest(unittest.TestCase):
+    def test_zip64_entry_count(self):
+        out = io.BytesIO()
+        writer = _ZipStreamWriter(out)
+        count = 0xFFFF + 10
+        for index in range(count):
+            writer.add(f"frames/{index:06d}.txt", stored_entry(str(index).encode()))
+        writer.close()
+        with zipfile.ZipFile(out) as archive:
+            names = archive.namelist()
+            self.assertEqual(len(names), count)
+            self.assertEqual(archive.read(names[-1]), str(count - 1).encode())
+
+    @unittest.skipIf(os.name == "nt", "needs sparse temp files")
+    def test_zip64_offsets(self):
+        # Entries past 4 GB; the space before them is a hole in a sparse file.
+        with tempfile.TemporaryFile() as out:
+            out.seek(0x100000000 + 1024)
+            writer = _ZipStreamWriter(out)
+            writer.add("plate.1001.exr", stored_entry(b"first"))
+            writer.add("plate.1002.exr", stored_entry(b"second"))
+            writer.close()
+            out.seek(0)
+            with zipfile.ZipFile(out) as archive:
+                infos = archive.infolist()
+                self.assertTrue(all(info.header_offset >= 0xFFFFFFFF for info in infos))
+                self.assertEqual(archive.read("plate.1002.exr"), b"second")
+
+
+if __name__ == "__main__":
+    unittest.main()
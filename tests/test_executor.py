@@ -0,0 +1,151 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+from mvl_ingestion import ingestion_utils
+from mvl_ingestion.ingestion_metrics import metrics
+from mvl_ingestion.ingestion_executor import StageExecutor, StageExecutors, CopyTask, parse_executor_overrides
+from test_egress import ShippedFig
+
+
+class Double:
+    def execute(self, value):
+        return value * 2
+
+
+class Fail:
+    def execute(self, value):
+        raise OSError(f"frame {value} unreachable")
+
+
+class Blocking:
+    """
+    Holds the first task until released and records the order tasks ran in.
+    """
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.order = []
+
+    def execute(self, name):
+        if name == "first":
+            self.started.set()
+            self.release.wait(5)
+        self.order.append(name)
+        return name
+
+
+class StageExecutorTest(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def executor(self, kind="thread", workers=2, **kwargs):
+        executor = StageExecutor("copy", kind, workers, **kwargs)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def test_results_in_task_order(self):
+        executor = self.executor(workers=4)
+        self.assertEqual(executor.run(Double(), [(n,) for n in range(20)], "copy"), [n * 2 for n in range(20)])
+
+    def test_callbacks_and_span(self):
+        started, done = [], []
+        self.executor().run(Double(), [(1,), (2,)], "copy", on_start=started.append, on_done=done.append, sequence="plate")
+        self.assertEqual(sorted(started), [(1,), (2,)])
+        self.assertEqual(sorted(future.result() for future in done), [2, 4])
+        span = next(s for s in metrics.to_dict()["spans"] if s["name"] == "copy")
+        self.assertEqual((span["labels"], span["count"]), ({"sequence": "plate"}, 2))
+
+    def test_errors_are_raised(self):
+        executor = self.executor()
+        with self.assertRaises(OSError):
+            executor.run(Fail(), [(1001,)], "copy")
+        # The slot is given back.
+        self.assertEqual(executor.gate.active, 0)
+        self.assertEqual(executor.run(Double(), [(1,)], "copy"), [2])
+
+    def test_priority_jumps_the_queue(self):
+        executor = self.executor(workers=1)
+        op = Blocking()
+        runs = []
+
+        def run(names, priority=0, queued=0):
+            runs.append(threading.Thread(target=executor.run, args=(op, [(n,) for n in names], "copy"),
+                                         kwargs={"priority": priority}))
+            runs[-1].start()
+            while len(executor._queue) < queued:
+                time.sleep(0.001)
+
+        run(["first"])
+        self.assertTrue(op.started.wait(5))
+        run(["low_1", "low_2"], queued=2)
+        run(["urgent"], priority=10, queued=3)
+        op.release.set()
+        for thread in runs:
+            thread.join(5)
+        self.assertEqual(op.order, ["first", "urgent", "low_1", "low_2"])
+
+    def test_gate_limits_tasks_in_flight(self):
+        executor = self.executor(workers=4, autotune=(1, 4, 2))
+        self.assertEqual(executor.workers, 4)
+        self.assertEqual(executor.gate.limit, 2)
+        peak = []
+        lock = threading.Lock()
+
+        class Track:
+            def execute(self, value):
+                with lock:
+                    peak.append(executor.gate.active)
+                return value
+
+        executor.run(Track(), [(n,) for n in range(16)], "copy")
+        self.assertLessEqual(max(peak), 2)
+
+    def test_process_pool_merges_worker_metrics(self):
+        executor = self.executor("process", workers=2)
+        self.assertEqual(executor.run(Double(), [(n,) for n in range(4)], "derive"), [0, 2, 4, 6])
+        span = next(s for s in metrics.to_dict()["spans"] if s["name"] == "derive")
+        self.assertEqual(span["count"], 4)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            StageExecutor("copy", "fiber")
+
+
+class StageExecutorsTest(unittest.TestCase):
+    def setUp(self):
+        ingestion_utils.get_executor_config_template.cache_clear()
+        self.addCleanup(ingestion_utils.get_executor_config_template.cache_clear)
+        patcher = mock.patch.object(ingestion_utils, "Fig", ShippedFig)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_config_and_overrides(self):
+        with StageExecutors(overrides=parse_executor_overrides("copy=thread:3,derive=thread")) as executors:
+            copy = executors.get("copy")
+            self.assertIs(executors.get("copy"), copy)
+            self.assertEqual((copy.kind, copy.workers, copy.tuner), ("thread", 3, None))
+            self.assertEqual(executors.get("derive").kind, "thread")
+            self.assertEqual((executors.config["encode"]["type"], executors.config["encode"]["workers"]), ("process", 2))
+
+    def test_autotune_starts_from_the_stored_setting(self):
+        store = mock.Mock()
+        store.get.return_value = 6
+        with StageExecutors(tuning_key="/mnt/vendor -> /mnt/vault", tuning_store=store) as executors:
+            copy = executors.get("copy")
+            self.assertEqual((copy.workers, copy.gate.limit), (64, 6))
+        store.update.assert_called_once_with("/mnt/vendor -> /mnt/vault", {"copy": 6})
+        store.save.assert_called_once_with()
+
+    def test_parse_executor_overrides(self):
+        self.assertEqual(parse_executor_overrides("copy=thread:16, derive=process"),
+                         {"copy": {"type": "thread", "workers": 16}, "derive": {"type": "process", "workers": 0}})
+        self.assertEqual(parse_executor_overrides(None), {})
+        with self.assertRaises(ValueError):
+            parse_executor_overrides("copy:16")
+
+
+if __name__ == "__main__":
+    unittest.main()
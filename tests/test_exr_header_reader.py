@@ -0,0 +1,132 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from mvl_ingestion.exr_header_reader import read_exr_header, inspect_sequence, READ_SIZE, TILED_FLAG
+
+COMPRESSIONS = {"none": (0, 1), "zip": (3, 16), "piz": (4, 32)}
+
+
+def attribute(name, attr_type, data):
+    return name.encode() + b"\0" + attr_type.encode() + b"\0" + struct.pack("<i", len(data)) + data
+
+
+def exr_bytes(width=8, height=40, compression="none", channels="BGR", extra=b"", flags=0):
+    """
+    A minimal single-part scanline OpenEXR file with half channels.
+    """
+    code, lines = COMPRESSIONS[compression]
+    chlist = b"".join(c.encode() + b"\0" + struct.pack("<iB3xii", 1, 0, 1, 1) for c in channels) + b"\0"
+    header = struct.pack("<ii", 20000630, 2 | flags)
+    header += attribute("channels", "chlist", chlist)
+    header += attribute("compression", "compression", bytes([code]))
+    header += attribute("dataWindow", "box2i", struct.pack("<4i", 0, 0, width - 1, height - 1))
+    header += attribute("displayWindow", "box2i", struct.pack("<4i", 0, 0, width - 1, height - 1))
+    header += attribute("lineOrder", "lineOrder", b"\0")
+    header += attribute("pixelAspectRatio", "float", struct.pack("<f", 1.0))
+    header += extra + b"\0"
+    chunk_count = (height + lines - 1) // lines
+    start = len(header) + 8 * chunk_count
+    chunks = b""
+    offsets = []
+    for chunk in range(chunk_count):
+        offsets.append(start + len(chunks))
+        data = b"\x11" * (width * 2 * len(channels) * min(lines, height - chunk * lines))
+        chunks += struct.pack("<ii", chunk * lines, len(data)) + data
+    return header + struct.pack(f"<{chunk_count}Q", *offsets) + chunks
+
+
+class ReadExrHeaderTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def write(self, data, name="plate.1001.exr"):
+        path = os.path.join(self.root, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_fields(self):
+        header = read_exr_header(self.write(exr_bytes(width=8, height=40)))
+        self.assertEqual(header["data_window"], [0, 0, 7, 39])
+        self.assertEqual(header["display_window"], [0, 0, 7, 39])
+        self.assertEqual((header["width"], header["height"]), (8, 40))
+        self.assertEqual([c["name"] for c in header["channels"]], ["B", "G", "R"])
+        self.assertEqual({c["type"] for c in header["channels"]}, {"half"})
+        self.assertEqual(header["compression"], "none")
+        self.assertEqual(header["line_order"], "increasing_y")
+        self.assertFalse(header["tiled"] or header["multipart"] or header["deep"])
+        self.assertFalse(header["truncated"])
+        self.assertEqual(header["raw_attributes"]["pixelAspectRatio"], ("float", struct.pack("<f", 1.0)))
+
+    def test_offset_table_per_compression(self):
+        for compression in COMPRESSIONS:
+            with self.subTest(compression=compression):
+                header = read_exr_header(self.write(exr_bytes(compression=compression)))
+                self.assertEqual(header["compression"], compression)
+                self.assertFalse(header["truncated"])
+
+    def test_truncated_pixels(self):
+        for compression in COMPRESSIONS:
+            with self.subTest(compression=compression):
+                data = exr_bytes(compression=compression)
+                header = read_exr_header(self.write(data[:-len(data) // 10]))
+                self.assertTrue(header["truncated"])
+
+    def test_truncated_offset_table(self):
+        data = exr_bytes()
+        header_size = data.index(struct.pack("<f", 1.0)) + 5
+        header = read_exr_header(self.write(data[:header_size + 12]))
+        self.assertTrue(header["truncated"])
+
+    def test_large_header(self):
+        comment = b"x" * (2 * READ_SIZE)
+        header = read_exr_header(self.write(exr_bytes(extra=attribute("comments", "string", comment))))
+        self.assertEqual(header["raw_attributes"]["comments"], ("string", comment))
+        self.assertFalse(header["truncated"])
+
+    def test_header_name_across_read_size(self):
+        # The first read ends inside the name of the attribute after the padding.
+        extra_start = len(exr_bytes(height=0)) - 1  # before the header terminator
+        padding = b"x" * (READ_SIZE - 3 - extra_start - len(attribute("comments", "string", b"")))
+        data = exr_bytes(extra=attribute("comments", "string", padding) + attribute("owner", "string", b"mvl"))
+        self.assertEqual(data.index(b"owner\0"), READ_SIZE - 3)
+        header = read_exr_header(self.write(data))
+        self.assertEqual(header["raw_attributes"]["owner"], ("string", b"mvl"))
+
+    def test_tiled_skips_offset_check(self):
+        data = exr_bytes(flags=TILED_FLAG)
+        header = read_exr_header(self.write(data[:len(data) // 2]))
+        self.assertTrue(header["tiled"])
+        self.assertFalse(header["truncated"])
+
+    def test_invalid_files(self):
+        with self.assertRaises(ValueError):
+            read_exr_header(self.write(b"\x89PNG\r\n\x1a\n" + b"\0" * 64))
+        with self.assertRaises(ValueError):
+            read_exr_header(self.write(exr_bytes()[:60]))
+
+
+class InspectSequenceTest(unittest.TestCase):
+    def test_problems(self):
+        with tempfile.TemporaryDirectory() as root:
+            frames = [exr_bytes(), exr_bytes(), exr_bytes()[:-100], exr_bytes(channels="AGR"), b"not an exr"]
+            paths = []
+            for number, data in enumerate(frames, 1001):
+                paths.append(os.path.join(root, f"plate.{number}.exr"))
+                with open(paths[-1], "wb") as f:
+                    f.write(data)
+            reference, problems = inspect_sequence(paths, expected_resolution="4448x3096")
+        self.assertEqual(reference["width"], 8)
+        self.assertEqual(len(problems), 4)
+        self.assertIn("plate.1001.exr: resolution 8x40 does not match", problems[0])
+        self.assertIn("plate.1003.exr: truncated file", problems[1])
+        self.assertIn("plate.1004.exr: channels", problems[2])
+        self.assertIn("plate.1005.exr: unreadable header", problems[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import time
+import tempfile
+import unittest
+
+from mvl_ingestion.ingestion_graph import DerivativeGraph, file_identity, BUILD_RECORD
+
+PARAMS = {"tool": "oiiotool", "resolution": "2048x1080", "format": "jpeg"}
+
+
+class DerivativeGraphTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.plate = self.write(os.path.join(tmp.name, "plate", "plate.1001.exr"), b"pixels")
+        self.proxy_dir = os.path.join(tmp.name, "proxy")
+        self.proxy = self.write(os.path.join(self.proxy_dir, "plate.1001.jpeg"), b"proxy")
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_outdated_reasons(self):
+        graph = DerivativeGraph(self.proxy_dir)
+        inputs = [file_identity(self.plate)]
+        self.assertEqual(graph.outdated(os.path.join(self.proxy_dir, "plate.1002.jpeg"), inputs, PARAMS), "missing")
+        self.assertEqual(graph.outdated(self.proxy, inputs, PARAMS), "no build record")
+        graph.record(self.proxy, inputs, PARAMS)
+        self.assertIsNone(graph.outdated(self.proxy, inputs, PARAMS))
+        self.assertEqual(graph.outdated(self.proxy, inputs, dict(PARAMS, resolution="1920x1080")), "parameters changed")
+
+        # A re-delivered plate changes size or mtime.
+        st = os.stat(self.plate)
+        os.utime(self.plate, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(graph.outdated(self.proxy, [file_identity(self.plate)], PARAMS), "inputs changed")
+
+    def test_save_and_reload(self):
+        graph = DerivativeGraph(self.proxy_dir)
+        graph.record(self.proxy, [file_identity(self.plate)], PARAMS)
+        self.assertTrue(graph.has_record(self.proxy))
+        graph.save()
+        self.assertEqual(sorted(os.listdir(self.proxy_dir)), [BUILD_RECORD, "plate.1001.jpeg"])
+        reloaded = DerivativeGraph(self.proxy_dir)
+        self.assertIsNone(reloaded.outdated(self.proxy, [file_identity(self.plate)], PARAMS))
+        self.assertEqual(reloaded.records["plate.1001.jpeg"]["parameters"], PARAMS)
+
+    def test_save_merges_with_other_builders(self):
+        first = DerivativeGraph(self.proxy_dir)
+        second = DerivativeGraph(self.proxy_dir)
+        first.record(self.proxy, [file_identity(self.plate)], PARAMS)
+        second.record("plate.1002.jpeg", ["plate.1002.exr"], PARAMS)
+        first.save()
+        second.save()
+        self.assertEqual(sorted(DerivativeGraph(self.proxy_dir).records), ["plate.1001.jpeg", "plate.1002.jpeg"])
+        self.assertEqual(sorted(second.records), ["plate.1001.jpeg", "plate.1002.jpeg"])
+
+    def test_forget(self):
+        graph = DerivativeGraph(self.proxy_dir)
+        graph.record(self.proxy, [file_identity(self.plate)], PARAMS)
+        graph.save()
+        other = DerivativeGraph(self.proxy_dir)
+        dropped = other.forget(self.proxy)
+        self.assertEqual(dropped["parameters"], PARAMS)
+        self.assertIsNone(other.forget(self.proxy))
+        other.save()
+        self.assertEqual(DerivativeGraph(self.proxy_dir).records, {})
+
+    def test_unreadable_record_is_ignored(self):
+        self.write(os.path.join(self.proxy_dir, BUILD_RECORD), b"{not json")
+        graph = DerivativeGraph(self.proxy_dir)
+        self.assertEqual(graph.records, {})
+        self.assertEqual(graph.outdated(self.proxy, [], PARAMS), "no build record")
+
+    def test_stale_lock_is_taken_over(self):
+        lock = self.write(os.path.join(self.proxy_dir, BUILD_RECORD + ".lock"), b"")
+        old = time.time() - 120
+        os.utime(lock, (old, old))
+        graph = DerivativeGraph(self.proxy_dir)
+        graph.record(self.proxy, [], PARAMS)
+        graph.save()
+        self.assertFalse(os.path.exists(lock))
+        self.assertTrue(DerivativeGraph(self.proxy_dir).has_record(self.proxy))
+
+
+if __name__ == "__main__":
+    unittest.main()
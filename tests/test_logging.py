@@ -0,0 +1,68 @@
+import queue
+import logging
+import unittest
+from unittest import mock
+
+from mvl_ingestion import ingestion_logging
+from mvl_ingestion.ingestion_logging import RateLimitFilter, RateLimitedQueueHandler
+
+
+def record(msg, *args, level=logging.WARNING):
+    return logging.LogRecord("movie_generator", level, __file__, 1, msg, args, None)
+
+
+class RateLimitFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch.object(ingestion_logging.time, "monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.rate_limit = RateLimitFilter(burst=2, interval=60)
+        self.queue = queue.Queue()
+        self.handler = RateLimitedQueueHandler(self.queue, self.rate_limit)
+
+    def emit(self, *records):
+        for item in records:
+            self.handler.handle(item)
+        messages = []
+        while not self.queue.empty():
+            messages.append(self.queue.get().getMessage())
+        return messages
+
+    def test_burst_then_notice_then_drop(self):
+        messages = self.emit(*[record("Size mismatch on frame %d", frame) for frame in range(1001, 1006)])
+        self.assertEqual(messages, [
+            "Size mismatch on frame 1001",
+            "Size mismatch on frame 1002",
+            "Size mismatch on frame 1003 (repeated, further similar messages suppressed for 60s)",
+        ])
+
+    def test_next_window_reports_the_count(self):
+        self.emit(*[record("Size mismatch on frame %d", frame) for frame in range(1001, 1006)])
+        self.now += 60
+        self.assertEqual(self.emit(record("Size mismatch on frame %d", 1006)),
+                         ["Size mismatch on frame 1006 (2 similar messages suppressed)"])
+
+    def test_kinds_and_levels_are_separate(self):
+        messages = self.emit(*[record(f"Copy failed for shot {n}") for n in range(3)],
+                             *[record("Slow copy of frame %d", n) for n in range(2)],
+                             *[record("Copied frame %d", n, level=logging.INFO) for n in range(4)])
+        self.assertEqual(len(messages), 3 + 2 + 4)
+
+    def test_records_are_not_modified(self):
+        records = [record("Size mismatch on frame %d", frame) for frame in range(1001, 1004)]
+        self.emit(*records)
+        self.assertEqual([(item.msg, item.args) for item in records], [("Size mismatch on frame %d", (frame,)) for frame in range(1001, 1004)])
+
+    def test_filter_drops_without_notices(self):
+        results = [self.rate_limit.filter(record("Size mismatch on frame %d", frame)) for frame in range(1001, 1006)]
+        self.assertEqual(results, [True, True, True, False, False])
+
+    def test_drain(self):
+        self.emit(*[record("Size mismatch on frame %d", frame) for frame in range(1001, 1006)])
+        self.assertEqual(self.rate_limit.drain(), [("Size mismatch on frame %d", 2)])
+        self.assertEqual(self.rate_limit.drain(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import json
+import tempfile
+import threading
+import unittest
+
+from mvl_ingestion.ingestion_metrics import RunMetrics
+
+
+class RunMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = RunMetrics()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def span(self, name, **labels):
+        return next(s for s in self.metrics.to_dict()["spans"] if s["name"] == name and s["labels"] == labels)
+
+    def test_spans_aggregate_per_name_and_labels(self):
+        for seconds in (0.5, 0.1, 0.3):
+            self.metrics.observe("copy", seconds, sequence="plate")
+        self.metrics.observe("copy", 2.0, sequence="bg")
+        self.assertEqual(self.span("copy", sequence="plate"), {
+            "name": "copy", "labels": {"sequence": "plate"}, "count": 3, "total": 0.9, "min": 0.1, "max": 0.5})
+        self.assertEqual(self.span("copy", sequence="bg")["count"], 1)
+
+    def test_span_times_the_block(self):
+        with self.metrics.span("scan"):
+            pass
+        with self.assertRaises(OSError):
+            with self.metrics.span("scan"):
+                raise OSError("unreachable")
+        self.assertEqual(self.span("scan")["count"], 2)
+
+    def test_none_labels_are_dropped(self):
+        self.metrics.incr("frames_copied", sequence=None)
+        self.metrics.incr("frames_copied", 4)
+        self.assertEqual(self.metrics.to_dict()["counters"], [{"name": "frames_copied", "labels": {}, "value": 5}])
+
+    def test_counters_are_thread_safe(self):
+        def count():
+            for _ in range(1000):
+                self.metrics.incr("frames_copied")
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.metrics.to_dict()["counters"][0]["value"], 8000)
+
+    def test_merge_worker_snapshot(self):
+        self.metrics.observe("proxy", 1.0)
+        self.metrics.incr("proxies_generated")
+        worker = RunMetrics()
+        worker.observe("proxy", 3.0)
+        worker.observe("mov", 5.0)
+        worker.incr("proxies_generated", 2)
+        self.metrics.merge(worker.snapshot())
+        self.assertEqual(self.span("proxy"), {"name": "proxy", "labels": {}, "count": 2, "total": 4.0, "min": 1.0, "max": 3.0})
+        self.assertEqual(self.span("mov")["count"], 1)
+        self.assertEqual(self.metrics.to_dict()["counters"][0]["value"], 3)
+
+    def test_reset(self):
+        self.metrics.observe("copy", 1.0)
+        self.metrics.set_info(project="gen63")
+        self.metrics.reset()
+        report = self.metrics.to_dict()
+        self.assertEqual((report["spans"], report["counters"], report["info"]), ([], [], {}))
+
+    def test_write_json(self):
+        self.metrics.set_info(project="gen63")
+        self.metrics.observe("copy", 1.0)
+        path = os.path.join(self.root, ".mvl_reports", "ingest.json")
+        self.metrics.write_json(path)
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+        self.assertEqual(report["info"], {"project": "gen63"})
+        self.assertEqual(report["spans"][0]["name"], "copy")
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["ingest.json"])
+
+    def test_write_prometheus_sums_over_sequences(self):
+        self.metrics.observe("copy", 1.0, sequence="plate", stage="copy")
+        self.metrics.observe("copy", 2.0, sequence="bg", stage="copy")
+        self.metrics.incr("frames_copied", 3, sequence="plate")
+        self.metrics.incr("frames_copied", 2, sequence="bg")
+        self.metrics.incr("bytes_copied", 10, vendor='d"neg')
+        path = os.path.join(self.root, "mvl_ingest.prom")
+        self.metrics.write_prometheus(path)
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertIn('mvl_ingest_last_run_phase_seconds{phase="copy",stage="copy"} 3.000000', lines)
+        self.assertIn('mvl_ingest_last_run_phase_calls{phase="copy",stage="copy"} 2', lines)
+        self.assertIn("mvl_ingest_last_run_frames_copied 5", lines)
+        self.assertIn('mvl_ingest_last_run_bytes_copied{vendor="d\\"neg"} 10', lines)
+        self.assertIn("# TYPE mvl_ingest_last_run_frames_copied gauge", lines)
+        self.assertFalse([line for line in lines if "sequence=" in line])
+
+
+if __name__ == "__main__":
+    unittest.main()
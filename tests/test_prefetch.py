@@ -0,0 +1,109 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+
+from mvl_ingestion.ingestion_metrics import metrics
+from mvl_ingestion.ingestion_prefetch import Prefetcher
+
+MB = 1024 * 1024
+
+
+class RecordingPrefetcher(Prefetcher):
+    """
+    Records the frames it warms instead of reading them; every frame is `frame_mb` big.
+    """
+    def __init__(self, frame_mb=1, **kwargs):
+        super().__init__(mode="read", **kwargs)
+        self.frame_mb = frame_mb
+        self.warmed = []
+        self._warmed_lock = threading.Lock()
+
+    def _warm(self, path, buffer):
+        with self._warmed_lock:
+            self.warmed.append(path)
+        return self.frame_mb * MB
+
+
+class PrefetcherTest(unittest.TestCase):
+    def settle(self, prefetcher, count):
+        deadline = time.time() + 5
+        while len(prefetcher.warmed) < count and time.time() < deadline:
+            time.sleep(0.001)
+        time.sleep(0.05)  # nothing more arrives
+        return sorted(prefetcher.warmed)
+
+    def frames(self, count):
+        return [f"plate.{number}.exr" for number in range(1001, 1001 + count)]
+
+    def test_stays_ahead_frames_in_front(self):
+        prefetcher = RecordingPrefetcher(ahead=3, workers=2)
+        with prefetcher.run(self.frames(10)):
+            self.assertEqual(self.settle(prefetcher, 3), self.frames(3))
+            prefetcher.started()
+            prefetcher.started()
+            self.assertEqual(self.settle(prefetcher, 5), self.frames(5))
+
+    def test_memory_budget(self):
+        prefetcher = RecordingPrefetcher(frame_mb=100, ahead=8, budget_mb=250, workers=1)
+        with prefetcher.run(self.frames(10)):
+            self.assertEqual(self.settle(prefetcher, 3), self.frames(3))
+            prefetcher.started()
+            self.assertEqual(self.settle(prefetcher, 4), self.frames(4))
+
+    def test_frames_already_started_are_skipped(self):
+        prefetcher = RecordingPrefetcher(ahead=2, workers=1)
+        taken, hold = threading.Event(), threading.Event()
+        warm = prefetcher._warm
+
+        def slow_first_frame(path, buffer):
+            if path == "plate.1001.exr":
+                taken.set()
+                hold.wait(5)
+            return warm(path, buffer)
+
+        prefetcher._warm = slow_first_frame
+        with prefetcher.run(self.frames(10)):
+            self.assertTrue(taken.wait(5))
+            for _ in range(4):
+                prefetcher.started()
+            hold.set()
+            self.assertEqual(self.settle(prefetcher, 3), ["plate.1001.exr", "plate.1005.exr", "plate.1006.exr"])
+
+    def test_stops_with_the_block(self):
+        prefetcher = RecordingPrefetcher(ahead=2, workers=4)
+        with prefetcher.run(self.frames(100)):
+            self.settle(prefetcher, 2)
+        self.assertFalse([t for t in threading.enumerate() if t.name.startswith("mvl-prefetch")])
+        self.assertEqual(len(prefetcher.warmed), 2)
+
+    def test_warms_real_files(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        with tempfile.TemporaryDirectory() as root:
+            paths = []
+            for number in range(1001, 1004):
+                paths.append(os.path.join(root, f"plate.{number}.exr"))
+                with open(paths[-1], "wb") as f:
+                    f.write(b"\0" * 3000)
+            paths.append(os.path.join(root, "plate.1004.exr"))  # not delivered yet
+            for mode in ("read", "fadvise") if hasattr(os, "posix_fadvise") else ("read",):
+                with self.subTest(mode=mode):
+                    metrics.reset()
+                    with Prefetcher(ahead=8, mode=mode).run(paths):
+                        pass
+                    counters = {c["name"]: c["value"] for c in metrics.to_dict()["counters"]}
+                    self.assertEqual(counters, {"prefetch_frames": 3, "prefetch_bytes": 9000})
+
+    def test_from_metadata(self):
+        self.assertIsNone(Prefetcher.from_metadata({"prefetch": 0}))
+        prefetcher = Prefetcher.from_metadata({"prefetch": 4, "prefetch_mb": 64})
+        self.assertEqual((prefetcher.ahead, prefetcher.budget), (4, 64 * MB))
+        self.assertEqual(Prefetcher.from_metadata(None).ahead, 8)
+        with self.assertRaises(ValueError):
+            Prefetcher(mode="mmap")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+
+from mvl_ingestion.ingestion_processor import MVLIngestionProcessor, PreflightError
+from test_exr_header_reader import exr_bytes
+
+
+class PreflightTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        frames = [exr_bytes(), exr_bytes()[:-100]]
+        paths = []
+        for number, data in enumerate(frames, 1001):
+            paths.append(os.path.join(tmp.name, f"plate.{number}.exr"))
+            with open(paths[-1], "wb") as f:
+                f.write(data)
+        self.sequences = [{"base_name": "plate", "extension": "exr", "paths": paths}]
+
+    def processor(self, force):
+        processor = MVLIngestionProcessor.__new__(MVLIngestionProcessor)
+        processor.is_force_ingestion = force
+        return processor
+
+    def test_problems_raise_with_no_force(self):
+        with self.assertRaises(PreflightError) as raised:
+            self.processor(force=False).preflight(self.sequences)
+        self.assertIn("--no-preflight", str(raised.exception))
+
+    def test_problems_are_reported_when_forced(self):
+        self.processor(force=True).preflight(self.sequences)
+        self.assertEqual(self.sequences[0]["exr"]["resolution"], "8x40")
+
+
+if __name__ == "__main__":
+    unittest.main()
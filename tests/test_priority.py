@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+import unittest
+from unittest import mock
+
+from mvl_ingestion import ingestion_priority
+from mvl_ingestion.ingestion_priority import PriorityLanes, NO_PRIORITY, BACKGROUND_NICE, lanes, run_child, deprioritize
+from mvl_ingestion.ingestion_executor import StageExecutor
+
+
+class PriorityLanesTest(unittest.TestCase):
+    def test_top_follows_active_lanes(self):
+        lanes = PriorityLanes()
+        self.assertEqual(lanes.top(), NO_PRIORITY)
+        lanes.enter(0)
+        lanes.enter(10)
+        lanes.enter(10)
+        self.assertEqual(lanes.top(), 10)
+        lanes.leave(10)
+        self.assertEqual(lanes.top(), 10)
+        lanes.leave(10)
+        self.assertEqual(lanes.top(), 0)
+        lanes.leave(0)
+        self.assertEqual(lanes.top(), NO_PRIORITY)
+
+    def test_outranked(self):
+        lanes = PriorityLanes()
+        lanes.enter(0)
+        lanes.enter(10)
+        self.assertFalse(lanes.outranked())  # outside of stage tasks
+        lanes.current = 0
+        self.assertTrue(lanes.outranked())
+        self.assertFalse(lanes.outranked(10))
+        lanes.leave(10)
+        self.assertFalse(lanes.outranked())
+
+    def test_attached_workers_see_the_parent(self):
+        parent, worker = PriorityLanes(), PriorityLanes()
+        worker.attach(parent.state)
+        parent.enter(5)
+        self.assertTrue(worker.outranked(0))
+
+    def test_stage_tasks_run_in_their_lane(self):
+        seen = []
+
+        class Record:
+            def execute(self, value):
+                seen.append((lanes.current, lanes.top()))
+                return value
+
+        executor = StageExecutor("copy", "thread", 1)
+        self.addCleanup(executor.shutdown)
+        executor.run(Record(), [(1,)], "copy", priority=7)
+        self.assertEqual(seen, [(7, 7)])
+        self.assertEqual(lanes.top(), NO_PRIORITY)
+
+
+class RunChildTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ingestion_priority, "CHILD_POLL", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, lanes, "current", None)
+
+    def python(self, code):
+        return [sys.executable, "-c", code]
+
+    def test_output_and_errors(self):
+        result = run_child(self.python("print('oiiotool 2.5')"), capture_output=True, text=True)
+        self.assertEqual((result.returncode, result.stdout.strip()), (0, "oiiotool 2.5"))
+        with self.assertRaises(subprocess.CalledProcessError):
+            run_child(self.python("raise SystemExit(3)"), check=True)
+
+    def test_deprioritized_when_urgent_work_arrives(self):
+        lanes.current = 0
+        lanes.enter(0)
+        self.addCleanup(lanes.leave, 0)
+        urgent = threading.Timer(0.1, lanes.enter, args=(10,))
+        urgent.start()
+        self.addCleanup(lanes.leave, 10)
+        with mock.patch.object(ingestion_priority, "deprioritize") as lowered:
+            run_child(self.python("import time; time.sleep(0.5)"))
+        lowered.assert_called_once()
+
+    def test_urgent_children_keep_their_priority(self):
+        lanes.current = 10
+        lanes.enter(10)
+        self.addCleanup(lanes.leave, 10)
+        with mock.patch.object(ingestion_priority, "deprioritize") as lowered:
+            run_child(self.python("pass"))
+        lowered.assert_not_called()
+
+    @unittest.skipIf(sys.platform == "win32", "nice values are POSIX")
+    def test_deprioritize_lowers_every_thread(self):
+        child = subprocess.Popen(self.python("import threading, time; threading.Thread(target=time.sleep, args=(5,)).start(); time.sleep(5)"))
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+        time.sleep(0.2)
+        with mock.patch.object(ingestion_priority.shutil, "which", return_value=None):
+            deprioritize(child.pid)
+        for tid in ingestion_priority._threads(child.pid):
+            self.assertEqual(os.getpriority(os.PRIO_PROCESS, tid), BACKGROUND_NICE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import pstats
+import tempfile
+import threading
+import unittest
+
+from mvl_ingestion.ingestion_metrics import RunMetrics
+from mvl_ingestion.ingestion_profiler import Profiler, SINGLE_CPROFILE, get_profile_dir
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.out_dir = os.path.join(tmp.name, "ingest_20250715_profile")
+        self.metrics = RunMetrics()
+
+    def run_phases(self, profiler, seconds=0.05):
+        self.metrics.profiler = profiler
+        profiler.start()
+
+        def copy():
+            with self.metrics.span("copy"):
+                with self.metrics.span("hash"):
+                    busy(seconds)
+        threads = [threading.Thread(target=copy, name=f"mvl-copy_{n}") for n in range(2)]
+        for thread in threads:
+            thread.start()
+        with self.metrics.span("proxy"):
+            busy(seconds)
+        for thread in threads:
+            thread.join()
+        self.metrics.profiler = None
+        profiler.dump()
+        return os.getpid()
+
+    def test_profile_dir(self):
+        self.assertEqual(get_profile_dir("/mnt/gen63/.mvl_reports/ingest_1.json"), "/mnt/gen63/.mvl_reports/ingest_1_profile")
+
+    @unittest.skipIf(SINGLE_CPROFILE, "one cProfile per interpreter")
+    def test_cprofile_per_thread_and_phase(self):
+        pid = self.run_phases(Profiler("cprofile", out_dir=self.out_dir))
+        with open(os.path.join(self.out_dir, f"threads_{pid}.json"), encoding="utf-8") as f:
+            threads = json.load(f)["threads"]
+        # Nested spans are part of the outermost one.
+        self.assertEqual(sorted((t["phase"], t["thread"]) for t in threads),
+                         [("copy", "mvl-copy_0"), ("copy", "mvl-copy_1"), ("proxy", "MainThread")])
+        stats = pstats.Stats(os.path.join(self.out_dir, f"copy_{pid}.pstats"))
+        self.assertTrue(any(name == "busy" for _, _, name in stats.stats))
+        self.assertTrue(os.path.exists(os.path.join(self.out_dir, f"proxy_{pid}.pstats")))
+
+    def test_sampling_folded_stacks(self):
+        pid = self.run_phases(Profiler("sampling", interval=0.001, out_dir=self.out_dir), seconds=0.3)
+        self.assertEqual(os.listdir(self.out_dir), [f"profile_{pid}.folded"])
+        with open(os.path.join(self.out_dir, f"profile_{pid}.folded"), encoding="utf-8") as f:
+            stacks = [line.rsplit(" ", 1) for line in f.read().splitlines()]
+        roots = {tuple(stack.split(";")[:2]) for stack, _ in stacks}
+        self.assertIn(("mvl-copy_0", "hash"), roots)
+        self.assertIn(("MainThread", "proxy"), roots)
+        self.assertTrue(all(int(count) > 0 for _, count in stacks))
+
+    def test_unknown_mode(self):
+        for mode in ("off", "perf"):
+            with self.subTest(mode=mode), self.assertRaises(ValueError):
+                Profiler(mode)
+
+
+if __name__ == "__main__":
+    unittest.main()
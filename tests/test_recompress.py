@@ -0,0 +1,161 @@
+import os
+import struct
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+
+from mvl_ingestion import ingestion_operations
+from mvl_ingestion.ingestion_operations import RecompressFileOperation, parse_compression
+from mvl_ingestion.exr_header_reader import read_exr_header
+
+COMPRESSION_CODES = {"none": 0, "zip": 3}
+
+
+def attribute(name, attr_type, data):
+    return name.encode() + b"\0" + attr_type.encode() + b"\0" + struct.pack("<i", len(data)) + data
+
+
+def exr_bytes(compression="none", owner=b"vendor", width=4, height=4):
+    """
+    A single-part scanline EXR with one line per chunk (the offset table only matters for truncation).
+    """
+    chlist = b"".join(c.encode() + b"\0" + struct.pack("<iB3xii", 1, 0, 1, 1) for c in "BGR") + b"\0"
+    header = struct.pack("<ii", 20000630, 2)
+    header += attribute("channels", "chlist", chlist)
+    header += attribute("compression", "compression", bytes([COMPRESSION_CODES[compression]]))
+    header += attribute("dataWindow", "box2i", struct.pack("<4i", 0, 0, width - 1, height - 1))
+    header += attribute("displayWindow", "box2i", struct.pack("<4i", 0, 0, width - 1, height - 1))
+    header += attribute("lineOrder", "lineOrder", b"\0")
+    header += attribute("owner", "string", owner) + b"\0"
+    start = len(header) + 8 * height
+    line = struct.pack("<ii", 0, width * 6) + b"\x11" * (width * 6)
+    offsets = [start + y * len(line) for y in range(height)]
+    return header + struct.pack(f"<{height}Q", *offsets) + line * height
+
+
+class FakeTools:
+    """
+    Stands in for oiiotool (run_child) and `iinfo --hash` (subprocess.run).
+    """
+    def __init__(self, owner=b"vendor", hashes=None):
+        self.owner = owner
+        self.hashes = hashes or {}
+        self.outputs = []
+        self.decoded = []
+
+    def oiiotool(self, command, check=False, capture_output=False, text=False):
+        compression = command[command.index("--compression") + 1].split(":")[0]
+        output = command[command.index("-o") + 1]
+        self.outputs.append(output)
+        with open(output, "wb") as f:
+            f.write(exr_bytes(compression, owner=self.owner))
+        return subprocess.CompletedProcess(command, 0, b"", b"")
+
+    def iinfo(self, command, check=False, capture_output=False, text=False):
+        path = command[-1]
+        self.decoded.append(path)
+        digest = self.hashes.get("output" if ".tmp.exr" in path else "source", "0123456789ABCDEF")
+        return subprocess.CompletedProcess(command, 0, f"{path} : 4 x 4, 3 channel, half openexr\n    SHA-1: {digest}\n", "")
+
+
+class RecompressFileOperationTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.out_dir = os.path.join(self.root, "plate", "v001")
+
+    def source(self, frame=1001, compression="none"):
+        path = os.path.join(self.root, "src", f"plate_gen63_48_14_{frame}.exr")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(exr_bytes(compression))
+        return path
+
+    def execute(self, op, src, tools):
+        dst = os.path.join(self.out_dir, os.path.basename(src))
+        with mock.patch.object(ingestion_operations, "run_child", side_effect=tools.oiiotool) as oiiotool, \
+                mock.patch.object(ingestion_operations.subprocess, "run", side_effect=tools.iinfo) as iinfo:
+            outcome = op.execute(src, dst)
+        # Temp files are hidden and never left behind.
+        self.assertIn(os.path.basename(dst), os.listdir(self.out_dir))
+        self.assertFalse([name for name in os.listdir(self.out_dir) if name.endswith(".tmp.exr")])
+        self.assertTrue(all(os.path.basename(path).startswith(".") for path in tools.outputs))
+        return outcome, dst, oiiotool, iinfo
+
+    def assert_unchanged(self, src, dst):
+        with open(src, "rb") as f_src, open(dst, "rb") as f_dst:
+            self.assertEqual(f_src.read(), f_dst.read())
+
+    def test_unchanged_compression_is_copied(self):
+        src = self.source(compression="zip")
+        outcome, dst, oiiotool, iinfo = self.execute(RecompressFileOperation("zip"), src, FakeTools())
+        self.assertEqual(outcome, "copied")
+        oiiotool.assert_not_called()
+        iinfo.assert_not_called()
+        self.assert_unchanged(src, dst)
+
+    def test_sampled_frame_is_verified(self):
+        op = RecompressFileOperation("zip", verify_every=10)
+        src = self.source(frame=1001)
+        op.sample([src])
+        tools = FakeTools()
+        outcome, dst, oiiotool, iinfo = self.execute(op, src, tools)
+        self.assertEqual(outcome, "recompressed")
+        self.assertEqual(read_exr_header(dst)["compression"], "zip")
+        self.assertEqual(tools.decoded, [src, tools.outputs[0]])
+        self.assertIn("-a", oiiotool.call_args[0][0])
+        self.assertEqual(os.stat(dst).st_mtime_ns, os.stat(src).st_mtime_ns)
+
+    def test_frames_between_samples_are_not_decoded(self):
+        op = RecompressFileOperation("zip", verify_every=10)
+        outcome, _, _, iinfo = self.execute(op, self.source(frame=1001), FakeTools())
+        self.assertEqual(outcome, "recompressed")
+        iinfo.assert_not_called()
+        _, _, _, iinfo = self.execute(op, self.source(frame=1010), FakeTools())
+        self.assertEqual(iinfo.call_count, 2)
+
+    def test_verify_every_frame_or_none(self):
+        for verify_every, decodes in ((1, 2), (0, 0)):
+            with self.subTest(verify_every=verify_every):
+                op = RecompressFileOperation("zip", verify_every=verify_every)
+                _, _, _, iinfo = self.execute(op, self.source(frame=1003), FakeTools())
+                self.assertEqual(iinfo.call_count, decodes)
+
+    def test_pixel_mismatch_falls_back_to_copy(self):
+        op = RecompressFileOperation("zip", verify_every=1)
+        src = self.source()
+        outcome, dst, _, _ = self.execute(op, src, FakeTools(hashes={"output": "BAD"}))
+        self.assertEqual(outcome, "copied")
+        self.assert_unchanged(src, dst)
+
+    def test_changed_attribute_falls_back_to_copy(self):
+        src = self.source()
+        outcome, dst, _, iinfo = self.execute(RecompressFileOperation("zip"), src, FakeTools(owner=b"oiiotool"))
+        self.assertEqual(outcome, "copied")
+        iinfo.assert_not_called()
+        self.assert_unchanged(src, dst)
+
+    def test_oiiotool_failure_falls_back_to_copy(self):
+        tools = FakeTools()
+        tools.oiiotool = mock.Mock(side_effect=subprocess.CalledProcessError(1, ["oiiotool"]))
+        src = self.source()
+        outcome, dst, _, _ = self.execute(RecompressFileOperation("zip"), src, tools)
+        self.assertEqual(outcome, "copied")
+        self.assert_unchanged(src, dst)
+
+    def test_lossy_compressions_are_not_verified(self):
+        op = RecompressFileOperation("dwaa:45", verify_every=1)
+        self.assertFalse(op._verifies(self.source()))
+
+    def test_parse_compression(self):
+        self.assertEqual(parse_compression("DWAA:45"), ("dwaa", "dwaa:45"))
+        self.assertEqual(parse_compression("zip"), ("zip", "zip"))
+        for value in ("lzma", "dwaa:high"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_compression(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from mvl_ingestion import ingestion_builder
+from mvl_ingestion.ingestion_builder import SequenceBuilder
+from mvl_ingestion.ingestion_graph import DerivativeGraph, file_identity
+from mvl_ingestion.ingestion_operations import CopyFileOperation
+from mvl_ingestion.ingestion_scratch import ScratchSpace, DERIVATIVE_OVERHEAD, STALE_AGE
+from test_watch import SerialExecutors, CopyProxyOperation, PROXY_RES, PARAMS
+
+GB = 1024 ** 3
+
+
+class ScratchSpaceTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = os.path.join(tmp.name, "scratch")
+
+    def space(self, budget_gb=1):
+        space = ScratchSpace(self.root, budget_gb=budget_gb)
+        self.addCleanup(space.close)
+        return space
+
+    def test_reserve_and_release(self):
+        space = self.space()
+        area = space.reserve("plate", 100)
+        self.assertEqual((area.reserved, space.used), (int(100 * DERIVATIVE_OVERHEAD), area.reserved))
+        self.assertTrue(os.path.isdir(area.path))
+        self.assertEqual(os.path.dirname(area.path), space.run_dir)
+        area.release()
+        self.assertEqual(space.used, 0)
+        self.assertFalse(os.path.exists(area.path))
+
+    def test_too_big_for_the_budget(self):
+        self.assertIsNone(self.space().reserve("plate", GB))
+
+    def test_waits_for_room(self):
+        space = self.space()
+        first = space.reserve("plate", 0.6 * GB)
+        reserved = []
+        waiter = threading.Thread(target=lambda: reserved.append(space.reserve("bg", 0.6 * GB)))
+        waiter.start()
+        waiter.join(0.05)
+        self.assertTrue(waiter.is_alive())
+        first.release()
+        waiter.join(5)
+        self.assertEqual(space.used, reserved[0].reserved)
+
+    def test_local_mirrors_the_destination(self):
+        area = self.space().reserve("plate", 100)
+        self.assertEqual(area.local("/mnt/projects/gen63/plate/v001/plate.1001.exr"),
+                         os.path.join(area.path, "mnt", "projects", "gen63", "plate", "v001", "plate.1001.exr"))
+
+    @unittest.skipIf(sys.platform == "win32", "run folders are only checked by pid on POSIX")
+    def test_evicts_folders_of_dead_runs(self):
+        host = socket.gethostname()
+        live = os.path.join(self.root, f"{host}-{os.getppid()}")
+        dead = os.path.join(self.root, f"{host}-999999999")
+        other_old = os.path.join(self.root, "render07-1234")
+        other_new = os.path.join(self.root, "render08-1234")
+        for path in (live, dead, other_old, other_new):
+            os.makedirs(path)
+        old = time.time() - STALE_AGE - 60
+        os.utime(other_old, (old, old))
+
+        def kill(pid, signal):
+            if pid == 999999999:
+                raise ProcessLookupError(pid)
+
+        with mock.patch("os.kill", side_effect=kill):
+            space = self.space()
+        self.assertEqual(sorted(os.listdir(self.root)), sorted(os.path.basename(p) for p in (live, other_new)))
+        space.reserve("plate", 100)
+        space.close()
+        self.assertNotIn(os.path.basename(space.run_dir), os.listdir(self.root))
+
+
+class StagedBuildTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = os.path.join(tmp.name, "to_mvl")
+        self.plate_dir = os.path.join(tmp.name, "out", "plate", "v001")
+        self.proxy_dir = os.path.join(tmp.name, "out", "proxy", "v001")
+        self.scratch = ScratchSpace(os.path.join(tmp.name, "scratch"), budget_gb=1)
+        self.addCleanup(self.scratch.close)
+        os.makedirs(self.source)
+        self.paths = []
+        for frame in (1001, 1002):
+            self.paths.append(os.path.join(self.source, f"plate_gen63_48_14_4448x3096_{frame}.exr"))
+            with open(self.paths[-1], "wb") as f:
+                f.write(f"pixels of {frame}".encode())
+        out_paths = {
+            "plate_path": {src: os.path.join(self.plate_dir, os.path.basename(src)) for src in self.paths},
+            "plate_dir": self.plate_dir,
+            "proxy_path": self.proxy_dir,
+        }
+        for name, value in (("generate_sequence_output_paths", lambda seq, metadata: out_paths),
+                            ("get_resolution_string", lambda name: PROXY_RES),
+                            ("print_slow", lambda *args: None)):
+            patcher = mock.patch.object(ingestion_builder, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_plates_and_proxies_are_pushed(self):
+        proxy_op = CopyProxyOperation()
+        builder = SequenceBuilder({"base_name": "plate_gen63_48_14", "paths": self.paths}, CopyFileOperation(), proxy_op,
+                                  None, executors=SerialExecutors(), scratch=self.scratch)
+        staged = []
+        generate_proxies = builder.generate_proxies
+
+        def check_staged(**kwargs):
+            staged.extend(builder.copied_paths)
+            generate_proxies(**kwargs)
+
+        builder.generate_proxies = check_staged
+        builder.build(False, {"use_proxy": True, "proxy": "jpeg", "proxy_res": "2K_DCP"})
+
+        self.assertTrue(all(path.startswith(self.scratch.run_dir) for path in staged))
+        self.assertEqual(sorted(os.listdir(self.plate_dir)), sorted(os.path.basename(p) for p in self.paths))
+        proxies = sorted(name for name in os.listdir(self.proxy_dir) if name.endswith(".jpeg"))
+        self.assertEqual(proxies, [f"plate_gen63_48_14_{PROXY_RES}_{frame}.jpeg" for frame in (1001, 1002)])
+        # Build records point at the destination and stay valid after the push.
+        graph = DerivativeGraph(self.proxy_dir)
+        for src in self.paths:
+            plate = os.path.join(self.plate_dir, os.path.basename(src))
+            proxy = os.path.join(self.proxy_dir, os.path.basename(src).replace("4448x3096", PROXY_RES).replace(".exr", ".jpeg"))
+            self.assertIsNone(graph.outdated(proxy, [file_identity(plate)], PARAMS))
+        self.assertEqual(os.listdir(self.scratch.run_dir), [])
+        self.assertEqual(self.scratch.used, 0)
+
+    def test_failed_build_releases_scratch(self):
+        builder = SequenceBuilder({"base_name": "plate_gen63_48_14", "paths": self.paths}, CopyFileOperation(), None,
+                                  None, executors=SerialExecutors(), scratch=self.scratch)
+        builder.push = mock.Mock(side_effect=OSError("destination unreachable"))
+        with self.assertRaises(OSError):
+            builder.build(False, {"plate_version": "v001"})
+        self.assertEqual(os.listdir(self.scratch.run_dir), [])
+        self.assertEqual(self.scratch.used, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from mvl_ingestion.ingestion_store import BlobStore
+
+
+class BlobStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.store = BlobStore(os.path.join(self.root, ".mvl_store"), link_mode="hardlink")
+
+    def write(self, name, data):
+        path = os.path.join(self.root, "to_mvl", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def blobs(self):
+        blobs_dir = os.path.join(self.store.root, "blobs")
+        return [name for prefix in os.listdir(blobs_dir) for name in os.listdir(os.path.join(blobs_dir, prefix))
+                if not name.endswith(".refs")]
+
+    def test_put_writes_duplicates_once(self):
+        digest, is_new = self.store.put(self.write("20250715/plate.1001.exr", b"pixels"))
+        self.assertTrue(is_new)
+        self.assertEqual(self.store.put(self.write("20250722/plate.1001.exr", b"pixels")), (digest, False))
+        other, is_new = self.store.put(self.write("20250722/plate.1002.exr", b"other pixels"))
+        self.assertTrue(is_new)
+        self.assertNotEqual(other, digest)
+        self.assertEqual(len(self.blobs()), 2)
+        self.assertEqual(os.listdir(os.path.join(self.store.root, "tmp")), [])
+
+    def test_materialize_hardlink(self):
+        digest, _ = self.store.put(self.write("plate.1001.exr", b"pixels"))
+        dst = os.path.join(self.root, "plate", "v001", "plate.1001.exr")
+        self.assertEqual(self.store.materialize(digest, dst), "hardlink")
+        self.assertEqual(self.read(dst), b"pixels")
+        self.assertTrue(os.path.samefile(dst, self.store.blob_path(digest)))
+
+    def test_materialize_replaces_instead_of_writing_through(self):
+        first, _ = self.store.put(self.write("plate.1001.exr", b"pixels"))
+        second, _ = self.store.put(self.write("plate.1001.v2.exr", b"new pixels"))
+        dst = os.path.join(self.root, "plate", "v001", "plate.1001.exr")
+        self.store.materialize(first, dst)
+        self.store.materialize(second, dst)
+        self.assertEqual(self.read(dst), b"new pixels")
+        self.assertEqual(self.read(self.store.blob_path(first)), b"pixels")
+
+    def test_copy_mode(self):
+        store = BlobStore(self.store.root, link_mode="copy")
+        digest, _ = store.put(self.write("plate.1001.exr", b"pixels"))
+        dst = os.path.join(self.root, "plate", "v001", "plate.1001.exr")
+        self.assertEqual(store.materialize(digest, dst), "copy")
+        self.assertFalse(os.path.samefile(dst, store.blob_path(digest)))
+        self.assertEqual(self.read(dst), b"pixels")
+
+    def test_gc_removes_unreferenced_blobs(self):
+        kept, _ = self.store.put(self.write("plate.1001.exr", b"kept"))
+        dropped, _ = self.store.put(self.write("plate.1002.exr", b"dropped"))
+        self.store.materialize(kept, os.path.join(self.root, "plate", "plate.1001.exr"))
+        dst = os.path.join(self.root, "plate", "plate.1002.exr")
+        self.store.materialize(dropped, dst)
+        os.remove(dst)
+
+        self.assertEqual(self.store.gc(grace_period=0, dry_run=True), (1, len(b"dropped")))
+        self.assertTrue(self.store.has(dropped))
+        self.assertEqual(self.store.gc(grace_period=0), (1, len(b"dropped")))
+        self.assertFalse(self.store.has(dropped))
+        self.assertFalse(os.path.exists(self.store.refs_path(dropped)))
+        self.assertTrue(self.store.has(kept))
+
+    def test_gc_keeps_unchanged_copies_only(self):
+        store = BlobStore(self.store.root, link_mode="copy")
+        kept, _ = store.put(self.write("plate.1001.exr", b"kept"))
+        rewritten, _ = store.put(self.write("plate.1002.exr", b"rewritten"))
+        store.materialize(kept, os.path.join(self.root, "plate", "plate.1001.exr"))
+        dst = os.path.join(self.root, "plate", "plate.1002.exr")
+        store.materialize(rewritten, dst)
+        with open(dst, "ab") as f:
+            f.write(b" by hand")
+        self.assertEqual(store.gc(grace_period=0), (1, len(b"rewritten")))
+        self.assertTrue(store.has(kept))
+
+    def test_gc_grace_period(self):
+        digest, _ = self.store.put(self.write("plate.1001.exr", b"pixels"))
+        dst = os.path.join(self.root, "plate", "plate.1001.exr")
+        self.store.materialize(digest, dst)
+        os.remove(dst)
+        self.assertEqual(self.store.gc(grace_period=3600), (0, 0))
+        self.assertTrue(self.store.has(digest))
+
+    def test_pickles_for_process_workers(self):
+        store = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(store.root, self.store.root)
+        digest, is_new = store.put(self.write("plate.1001.exr", b"pixels"))
+        self.assertTrue(is_new)
+        self.assertTrue(self.store.has(digest))
+
+    def test_unknown_link_mode(self):
+        with self.assertRaises(ValueError):
+            BlobStore(self.store.root, link_mode="symlink")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from mvl_ingestion import ingestion_builder, ingestion_utils
+from mvl_ingestion.ingestion_builder import SequenceBuilder
+from mvl_ingestion.ingestion_utils import reserve_next_version, release_version, reset_version_cache
+
+
+class ReserveVersionTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.base = os.path.join(tmp.name, "SC_48", "SH_0140", "main", "plate")
+        reset_version_cache()
+        self.addCleanup(reset_version_cache)
+
+    def test_two_reservations_in_one_run(self):
+        self.assertEqual(reserve_next_version(self.base), "v001")
+        self.assertEqual(reserve_next_version(self.base), "v002")
+        self.assertEqual(sorted(os.listdir(self.base)), ["v001", "v002"])
+
+    def test_existing_version(self):
+        os.makedirs(os.path.join(self.base, "v002"))
+        self.assertEqual(reserve_next_version(self.base), "v003")
+
+    def test_version_taken_after_listing(self):
+        # Another host creates the next folder after this run listed and cached the versions.
+        self.assertEqual(reserve_next_version(self.base), "v001")
+        os.mkdir(os.path.join(self.base, "v002"))
+        self.assertEqual(reserve_next_version(self.base), "v003")
+
+    def test_file_exists_error_moves_on(self):
+        mkdir = os.mkdir
+        raced = []
+
+        def racing_mkdir(path, *args, **kwargs):
+            if not raced and os.path.basename(path) == "v001":
+                raced.append(path)
+                mkdir(path, *args, **kwargs)  # the other ingest wins
+                raise FileExistsError(path)
+            return mkdir(path, *args, **kwargs)
+
+        with mock.patch.object(ingestion_utils.os, "mkdir", side_effect=racing_mkdir):
+            self.assertEqual(reserve_next_version(self.base), "v002")
+        self.assertEqual(os.path.basename(raced[0]), "v001")
+
+    def test_concurrent_reservations_are_distinct(self):
+        versions = []
+        threads = [threading.Thread(target=lambda: versions.append(reserve_next_version(self.base))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(versions), [f"v{n:03d}" for n in range(1, 9)])
+
+    def test_release_empty_version(self):
+        self.assertEqual(reserve_next_version(self.base), "v001")
+        self.assertTrue(release_version(self.base, "v001"))
+        self.assertFalse(os.path.exists(os.path.join(self.base, "v001")))
+        self.assertEqual(reserve_next_version(self.base), "v001")
+
+    def test_release_keeps_written_version(self):
+        version = reserve_next_version(self.base)
+        with open(os.path.join(self.base, version, "plate.1001.exr"), "wb") as f:
+            f.write(b"pixels")
+        self.assertFalse(release_version(self.base, version))
+        self.assertEqual(reserve_next_version(self.base), "v002")
+
+
+class FailingStage:
+    def run(self, *args, **kwargs):
+        raise OSError("destination unreachable")
+
+
+class FailingExecutors:
+    def get(self, stage):
+        return FailingStage()
+
+
+class FailedBuildTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.base = os.path.join(tmp.name, "plate")
+        self.source = os.path.join(tmp.name, "plate_gen63_48_14_1001.exr")
+        with open(self.source, "wb") as f:
+            f.write(b"pixels")
+        reset_version_cache()
+        self.addCleanup(reset_version_cache)
+
+        def plan(seq, metadata):
+            version = metadata.get("plate_version") or reserve_next_version(self.base)
+            plate_dir = os.path.join(self.base, version)
+            os.makedirs(plate_dir, exist_ok=True)
+            return {"plate_path": {self.source: os.path.join(plate_dir, "plate.1001.exr")}, "plate_dir": plate_dir}
+
+        patcher = mock.patch.object(ingestion_builder, "generate_sequence_output_paths", side_effect=plan)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ingestion_builder, "print_slow", lambda *args: None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def build(self, metadata, on_plan=None):
+        builder = SequenceBuilder({"base_name": "plate_gen63_48_14", "paths": [self.source]}, None, None, None,
+                                  executors=FailingExecutors(), on_plan=on_plan)
+        with self.assertRaises(OSError):
+            builder.build(False, metadata)
+
+    def test_failed_build_releases_its_version(self):
+        self.build({})
+        self.assertEqual(os.listdir(self.base), [])
+
+    def test_given_or_recorded_versions_are_kept(self):
+        self.build({"plate_version": "v004"})
+        self.build({}, on_plan=lambda out_paths: None)
+        self.assertEqual(sorted(os.listdir(self.base)), ["v004", "v005"])
+
+
+if __name__ == "__main__":
+    unittest.main()
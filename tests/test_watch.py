@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mvl_ingestion import ingestion_builder, ingestion_watch
+from mvl_ingestion.ingestion_builder import SequenceBuilder
+from mvl_ingestion.ingestion_graph import DerivativeGraph, file_identity
+from mvl_ingestion.ingestion_operations import CopyFileOperation
+from mvl_ingestion.ingestion_watch import DeliveryWatcher, _SequenceState
+
+PROXY_RES = "2048x1080"
+PARAMS = {"tool": "oiiotool", "resolution": PROXY_RES, "format": "jpeg"}
+
+
+class SerialStage:
+    def run(self, op, tasks, phase, on_done=None, on_start=None, priority=0, **labels):
+        return [op.execute(*task) for task in tasks]
+
+
+class SerialExecutors:
+    def get(self, stage):
+        return SerialStage()
+
+
+class CopyProxyOperation:
+    """
+    Stands in for oiiotool: the proxy is a copy of its plate, so it shows which frame it came from.
+    """
+    def __init__(self):
+        self.built = []
+
+    def execute(self, input_path, output_path, resolution):
+        shutil.copyfile(input_path, output_path)
+        self.built.append(os.path.basename(output_path))
+        return True
+
+
+class RenumberTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = os.path.join(tmp.name, "to_mvl", "48_14", "4448x3096")
+        self.plate_dir = os.path.join(tmp.name, "out", "plate", "v001")
+        self.proxy_dir = os.path.join(tmp.name, "out", "proxy", "v001")
+        os.makedirs(self.source)
+        out_paths = {
+            "plate_dir": self.plate_dir,
+            "proxy_path": self.proxy_dir,
+            "naming": ("gen63_48_0140", "plate", "4448x3096"),
+        }
+        self.patch(ingestion_watch, "generate_sequence_output_paths", lambda seq, metadata: dict(out_paths))
+        self.patch(ingestion_watch, "get_resolution_string", lambda name: PROXY_RES)
+        self.patch(ingestion_builder, "get_resolution_string", lambda name: PROXY_RES)
+        self.patch(ingestion_builder, "print_slow", lambda *args: None)
+
+        self.proxy_op = CopyProxyOperation()
+        self.watcher = DeliveryWatcher(
+            roots=[self.source],
+            metadata={"use_proxy": True, "proxy": "jpeg", "proxy_res": "2K_DCP"},
+            copy_op=CopyFileOperation(),
+            proxy_op=self.proxy_op,
+            mov_op=None,
+            executors=SerialExecutors(),
+        )
+
+    def patch(self, target, name, value):
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def deliver(self, state, frames):
+        paths = []
+        for frame in frames:
+            paths.append(os.path.join(self.source, f"plate_gen63_48_14_{frame}.exr"))
+            with open(paths[-1], "wb") as f:
+                f.write(f"pixels of {frame}".encode())
+        seq = {"base_name": "plate_gen63_48_14", "extension": "exr", "padding": 4, "paths": paths}
+        if state is None:
+            builder = SequenceBuilder(seq, self.watcher.copy_op, self.proxy_op, None, executors=self.watcher.executors)
+            state = _SequenceState(builder)
+        self.watcher._ingest(state, seq, paths)
+        return state
+
+    def test_late_first_frame(self):
+        state = self.deliver(None, [1002, 1003])
+        state = self.deliver(state, [1001])
+
+        expected = {1001: "pixels of 1001", 1002: "pixels of 1002", 1003: "pixels of 1003"}
+        plates = sorted(os.listdir(self.plate_dir))
+        self.assertEqual(plates, [f"gen63_48_0140_plate_f4448x3096_{n}.exr" for n in expected])
+        for number, content in expected.items():
+            with open(os.path.join(self.plate_dir, f"gen63_48_0140_plate_f4448x3096_{number}.exr"), "rb") as f:
+                self.assertEqual(f.read().decode(), content)
+
+        proxies = sorted(name for name in os.listdir(self.proxy_dir) if name.endswith(".jpeg"))
+        self.assertEqual(proxies, [f"gen63_48_0140_plate_f{PROXY_RES}_{n}.jpeg" for n in expected])
+        for number, content in expected.items():
+            with open(os.path.join(self.proxy_dir, f"gen63_48_0140_plate_f{PROXY_RES}_{number}.jpeg"), "rb") as f:
+                self.assertEqual(f.read().decode(), content)
+
+        # Each proxy is recorded against its renamed plate, with no records left under stale names.
+        graph = DerivativeGraph(self.proxy_dir)
+        self.assertEqual(sorted(graph.records), proxies)
+        for number in expected:
+            plate = os.path.join(self.plate_dir, f"gen63_48_0140_plate_f4448x3096_{number}.exr")
+            proxy = os.path.join(self.proxy_dir, f"gen63_48_0140_plate_f{PROXY_RES}_{number}.jpeg")
+            self.assertIsNone(graph.outdated(proxy, [file_identity(plate)], PARAMS))
+
+        # Nothing is rebuilt afterwards.
+        self.assertEqual(len(self.proxy_op.built), 3)
+        state.builder.copied_paths = [dst for _, (_, dst) in sorted(state.frames.items())]
+        state.builder.generate_proxies(proxy_fmt="jpeg", proxy_res_fmt="2K_DCP")
+        self.assertEqual(len(self.proxy_op.built), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()